@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlmodel import Session
+from app.models import Venda, Produto, MovimentoEstoque
+
+# Chave do cache: (função, inicio, fim, tipo_venda)
+Chave = Tuple[str, date, date, Optional[str]]
+
+class CacheRelatorios:
+    """
+    Cache LRU com validade (TTL) para os relatórios por período.
+    As entradas são invalidadas pelos meses que cobrem quando vendas ou
+    movimentos desses meses são gravados (ver os listeners abaixo).
+    O cache é por processo; com vários workers (ou o ETL rodando em outro
+    processo), o TTL limita o tempo em que um relatório desatualizado é servido.
+    """
+
+    def __init__(self, max_itens: int = 256, ttl_segundos: float = 300.0):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[Chave, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.max_itens > 0 and self.ttl_segundos > 0
+
+    @property
+    def geracao(self) -> int:
+        return self._geracao
+
+    def obter(self, chave: Chave) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.falhas += 1
+                return False, None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return True, item[1]
+
+    def gravar(self, chave: Chave, valor: Any, geracao: int) -> None:
+        """
+        Grava o valor calculado. Se houve invalidação desde `geracao` (início
+        do cálculo), o valor pode estar desatualizado e é descartado.
+        """
+        with self._lock:
+            if geracao != self._geracao:
+                return
+            self._itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar_meses(self, meses: Iterable[Tuple[int, int]]) -> int:
+        """
+        Remove as entradas cujo período [inicio, fim) cruza algum dos meses.
+        """
+        intervalos = [(date(a, m, 1), date(a + (m == 12), (m % 12) + 1, 1)) for a, m in meses]
+        if not intervalos:
+            return 0
+        with self._lock:
+            self._geracao += 1
+            removidas = [
+                chave for chave in self._itens
+                if any(chave[1] < fim_mes and inicio_mes < chave[2] for inicio_mes, fim_mes in intervalos)
+            ]
+            for chave in removidas:
+                del self._itens[chave]
+            self.invalidacoes += len(removidas)
+            return len(removidas)
+
+    def invalidar_funcao(self, funcao: str) -> int:
+        with self._lock:
+            self._geracao += 1
+            removidas = [chave for chave in self._itens if chave[0] == funcao]
+            for chave in removidas:
+                del self._itens[chave]
+            self.invalidacoes += len(removidas)
+            return len(removidas)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._itens.clear()
+            self.acertos = self.falhas = self.invalidacoes = 0
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+            }
+
+cache_relatorios = CacheRelatorios(
+    max_itens=int(os.getenv("RELATORIO_CACHE_TAMANHO", "256")),
+    ttl_segundos=float(os.getenv("RELATORIO_CACHE_TTL", "300")),
+)
+
+def em_cache(funcao_nome: str, periodo: Optional[Callable[..., Tuple[date, date]]] = None):
+    """
+    Decorador para funções de relatório com assinatura (inicio, fim, db, tipo_venda=None).
+    Funções com outra assinatura informam `periodo`, que recebe os mesmos
+    argumentos e devolve o (inicio, fim) coberto pelo resultado: é por ele
+    que a entrada é invalidada quando vendas do período são gravadas.
+    """
+    def decorador(funcao):
+        def calcular(chave: Chave, *args, **kwargs):
+            encontrado, valor = cache_relatorios.obter(chave)
+            if encontrado:
+                return valor
+            geracao = cache_relatorios.geracao
+            valor = funcao(*args, **kwargs)
+            cache_relatorios.gravar(chave, valor, geracao)
+            return valor
+
+        if periodo is not None:
+            @wraps(funcao)
+            def envolvida_por_periodo(*args, **kwargs):
+                if not cache_relatorios.ativo:
+                    return funcao(*args, **kwargs)
+                return calcular((funcao_nome, *periodo(*args, **kwargs), None), *args, **kwargs)
+            return envolvida_por_periodo
+
+        @wraps(funcao)
+        def envolvida(inicio: date, fim: date, db: Session, *args, **kwargs):
+            if not cache_relatorios.ativo:
+                return funcao(inicio, fim, db, *args, **kwargs)
+            tipo_venda = args[0] if args else kwargs.get("tipo_venda")
+            return calcular((funcao_nome, inicio, fim, tipo_venda), inicio, fim, db, *args, **kwargs)
+        return envolvida
+    return decorador
+
+# --- Invalidação a partir das gravações ---
+
+def marcar_meses_alterados(session: Session, datas: Iterable[date]) -> None:
+    """
+    Registra meses alterados por escritas que não passam pelo ORM (ex.: inserts
+    em lote do ETL). O cache é invalidado quando a transação for confirmada.
+    """
+    session.info.setdefault("meses_alterados", set()).update((d.year, d.month) for d in datas)
+
+@event.listens_for(Session, "after_flush")
+def _coletar_alteracoes(session: Session, flush_context) -> None:
+    meses: Set[Tuple[int, int]] = session.info.setdefault("meses_alterados", set())
+    alterados = (obj for obj in session.dirty if session.is_modified(obj))
+    for obj in chain(session.new, alterados, session.deleted):
+        if isinstance(obj, Venda) and obj.data is not None:
+            meses.add((obj.data.year, obj.data.month))
+            meses.update((d.year, d.month) for d in inspect(obj).attrs.data.history.deleted if d is not None)
+        elif isinstance(obj, MovimentoEstoque) and obj.data_movimento is not None:
+            meses.add((obj.data_movimento.year, obj.data_movimento.month))
+        elif isinstance(obj, Produto):
+            session.info["produtos_alterados"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_apos_commit(session: Session) -> None:
+    meses = session.info.pop("meses_alterados", None)
+    if meses:
+        cache_relatorios.invalidar_meses(meses)
+    if session.info.pop("produtos_alterados", False):
+        cache_relatorios.invalidar_funcao("lucro_por_produto")
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_apos_rollback(session: Session) -> None:
+    session.info.pop("meses_alterados", None)
+    session.info.pop("produtos_alterados", None)
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.datas import interpretar_mes_ano
+from app.metricas import Histograma
+
+logger = logging.getLogger("app.comandos")
+
+# --- Gramática dos argumentos ---
+
+class Argumento:
+    """
+    Um argumento de comando: o rótulo mostrado no uso/ajuda e a função que
+    consome as palavras da mensagem e devolve (valor, palavras restantes).
+    A função levanta ValueError quando o argumento está ausente ou inválido.
+    """
+
+    def __init__(self, rotulo: str, consumir: Callable[[List[str]], Tuple[Any, List[str]]]):
+        self.rotulo = rotulo
+        self.consumir = consumir
+
+def argumento_inteiro(rotulo: str, minimo: Optional[int] = None, maximo: Optional[int] = None) -> Argumento:
+    def consumir(palavras: List[str]) -> Tuple[int, List[str]]:
+        if not palavras:
+            raise ValueError(f"{rotulo} ausente")
+        valor = int(palavras[0])
+        if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+            raise ValueError(f"{rotulo} fora do intervalo")
+        return valor, palavras[1:]
+    return Argumento(f"<{rotulo}>", consumir)
+
+def argumento_mes(rotulo: str = "mês") -> Argumento:
+    return argumento_inteiro(rotulo, 1, 12)
+
+def argumento_ano(rotulo: str = "ano") -> Argumento:
+    return argumento_inteiro(rotulo, 1, 9999)
+
+def argumento_mes_ano() -> Argumento:
+    """
+    Mês e ano em texto livre ("5 2025", "maio 2025"); consome o resto da mensagem.
+    """
+    def consumir(palavras: List[str]) -> Tuple[Tuple[int, int], List[str]]:
+        valor = interpretar_mes_ano(" ".join(palavras)) if palavras else None
+        if valor is None:
+            raise ValueError("mês/ano não reconhecido")
+        return valor, []
+    return Argumento("<mês> <ano>", consumir)
+
+# --- Comandos ---
+
+class Comando:
+    """
+    Comando do WhatsApp: as palavras que o identificam, a gramática dos
+    argumentos, o texto de ajuda e a função que gera a resposta.
+    `executar(db, *valores)` devolve o texto da resposta. Comandos `demorado`s
+    podem ser gerados em segundo plano (ver app/tarefas.py).
+    """
+
+    def __init__(self, palavras: Sequence[str], executar: Callable[..., str], argumentos: Sequence[Argumento] = (),
+                 ajuda: str = "", mensagem_erro: Optional[str] = None, demorado: bool = False):
+        self.palavras = tuple(palavras)
+        self.executar = executar
+        self.argumentos = tuple(argumentos)
+        self.ajuda = ajuda
+        self.demorado = demorado
+        self.mensagem_erro = mensagem_erro
+        self.latencia = Histograma()
+        self.erros = 0
+        self.invalidos = 0
+
+    @property
+    def nome(self) -> str:
+        return " ".join(self.palavras)
+
+    @property
+    def uso(self) -> str:
+        return " ".join([self.nome, *(argumento.rotulo for argumento in self.argumentos)])
+
+    def interpretar(self, palavras: List[str]) -> List[Any]:
+        valores = []
+        for argumento in self.argumentos:
+            valor, palavras = argumento.consumir(palavras)
+            valores.append(valor)
+        return valores
+
+class RoteadorComandos:
+    """
+    Registro dos comandos do WhatsApp. A mensagem é roteada pela árvore de
+    palavras (o comando mais longo que casa com o início da mensagem), então o
+    custo do despacho não cresce com o número de comandos registrados.
+    Cada comando acumula seu histograma de latência e contadores de erro.
+    """
+
+    def __init__(self):
+        self._arvore: Dict[str, Dict] = {}
+        self._comandos: List[Comando] = []
+        self._lock = threading.Lock()
+        self.desconhecidos = 0
+
+    def registrar(self, comando: Comando) -> Comando:
+        no = self._arvore
+        for palavra in comando.palavras:
+            no = no.setdefault(palavra, {})
+        if None in no:
+            raise ValueError(f"Comando '{comando.nome}' já registrado.")
+        no[None] = comando  # a chave None marca o fim de um comando
+        self._comandos.append(comando)
+        return comando
+
+    def comando(self, palavras: str, argumentos: Sequence[Argumento] = (), ajuda: str = "",
+                mensagem_erro: Optional[str] = None, demorado: bool = False):
+        """
+        Decorador: registra a função como o comando `palavras` (ex.: "melhores dias").
+        """
+        def decorador(executar):
+            self.registrar(Comando(palavras.split(), executar, argumentos, ajuda, mensagem_erro, demorado))
+            return executar
+        return decorador
+
+    @property
+    def comandos(self) -> List[Comando]:
+        return list(self._comandos)
+
+    def localizar(self, palavras: List[str]) -> Tuple[Optional[Comando], List[str]]:
+        """
+        Comando mais longo que casa com o início da mensagem e as palavras restantes.
+        """
+        no, encontrado, consumidas = self._arvore, None, 0
+        for i, palavra in enumerate(palavras):
+            no = no.get(palavra)
+            if no is None:
+                break
+            if None in no:
+                encontrado, consumidas = no[None], i + 1
+        return encontrado, palavras[consumidas:]
+
+    @staticmethod
+    def _palavras(texto: str) -> List[str]:
+        return texto.strip().lower().replace('relatório', 'relatorio').split()
+
+    def identificar(self, texto: str) -> Optional[Comando]:
+        """
+        Comando que a mensagem aciona, sem executá-lo.
+        """
+        return self.localizar(self._palavras(texto))[0]
+
+    def argumentos_validos(self, texto: str) -> bool:
+        """
+        Indica se a mensagem aciona um comando com argumentos no formato certo,
+        sem executá-lo (e sem contar como inválido).
+        """
+        comando, restantes = self.localizar(self._palavras(texto))
+        if comando is None:
+            return False
+        try:
+            comando.interpretar(restantes)
+        except ValueError:
+            return False
+        return True
+
+    def despachar(self, texto: str, *contexto, propagar_erros: bool = False) -> str:
+        """
+        Interpreta a mensagem e executa o comando, devolvendo o texto da resposta.
+        `contexto` (ex.: a sessão do banco) é repassado ao comando. Com
+        `propagar_erros`, a exceção do comando é contada e relançada em vez de
+        virar texto (a fila de relatórios precisa dela para tentar de novo).
+        """
+        comando, restantes = self.localizar(self._palavras(texto))
+        if comando is None:
+            with self._lock:
+                self.desconhecidos += 1
+            return "Comando não reconhecido. Digite `ajuda` para ver as opções."
+
+        inicio = time.perf_counter()
+        try:
+            try:
+                valores = comando.interpretar(restantes)
+            except ValueError:
+                with self._lock:
+                    comando.invalidos += 1
+                return f"Formato inválido. Use: {comando.uso}"
+            try:
+                return comando.executar(*contexto, *valores)
+            except Exception as e:
+                with self._lock:
+                    comando.erros += 1
+                logger.exception("Erro no comando '%s'", comando.nome)
+                if propagar_erros:
+                    raise
+                return f"{comando.mensagem_erro or 'Erro ao executar o comando'}: {e}"
+        finally:
+            comando.latencia.observar((time.perf_counter() - inicio) * 1000)
+
+    def ajuda(self) -> str:
+        linhas = ["Comandos disponíveis:"]
+        for i, comando in enumerate(self._comandos, start=1):
+            linhas.append(f"{i}. `{comando.uso}`" + (f" - {comando.ajuda}" if comando.ajuda else ""))
+        return "\n".join(linhas)
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            por_comando = {
+                comando.nome: {"erros": comando.erros, "invalidos": comando.invalidos, **comando.latencia.como_dict()}
+                for comando in self._comandos
+            }
+            return {"comandos": por_comando, "desconhecidos": self.desconhecidos}
+
+roteador = RoteadorComandos()
@@ -0,0 +1,255 @@
+from typing import Dict, List, Optional, Tuple
+from datetime import date
+from sqlalchemy import Date, Integer, case, cast, distinct, extract
+from sqlmodel import Session, select, func
+from app.models import Venda, Produto, MovimentoEstoque, SaldoEstoque
+from app.logic import DIAS_DA_SEMANA, LucroProduto, montar_ranking_dias, montar_relatorio, ordenar_lucro_por_produto
+
+# Consultas agregadas executadas no próprio banco de dados.
+# Quando existe uma referência em Python puro em app/logic.py, a versão SQL
+# deve devolver exatamente o mesmo resultado (ver tests/test_consultas.py).
+
+def calcular_relatorio_geral_sql(db: Session, inicio: date, fim: date, tipo_venda: Optional[str] = None) -> Optional[Dict]:
+    """
+    Equivalente SQL de calcular_relatorio_geral: agrega as vendas do período
+    em uma única consulta (SUM/COUNT DISTINCT com CASE em tipo_venda), sem
+    carregar os objetos Venda para o Python.
+    """
+    nao_boleto = Venda.tipo_venda != "boleto"
+
+    query = select(
+        func.count(Venda.id),
+        func.sum(case((nao_boleto, func.coalesce(Venda.total, 0.0)), else_=0.0)),
+        func.sum(func.coalesce(Venda.custo_func, 0.0)),
+        func.sum(func.coalesce(Venda.custo_copos, 0.0)),
+        func.sum(func.coalesce(Venda.custo_boleto, 0.0)),
+        func.count(case((nao_boleto, Venda.id))),
+        func.count(distinct(case((nao_boleto, Venda.data)))),
+    ).where(Venda.data >= inicio, Venda.data < fim)
+    if tipo_venda:
+        query = query.where(Venda.tipo_venda == tipo_venda)
+
+    total_vendas, receita_bruta, gasto_func, gasto_copos, gasto_boleto, vendas_validas, dias = db.exec(query).one()
+    if not total_vendas:
+        return None
+
+    return montar_relatorio(
+        receita_bruta=float(receita_bruta or 0.0),
+        gasto_func=float(gasto_func or 0.0),
+        gasto_copos=float(gasto_copos or 0.0),
+        gasto_boleto=float(gasto_boleto or 0.0),
+        vendas_validas=vendas_validas,
+        dias_registrados=dias,
+    )
+
+def calcular_lucro_por_produto_sql(db: Session, inicio: date, fim: date) -> Optional[List[LucroProduto]]:
+    """
+    Equivalente SQL de calcular_lucro_por_produto: um JOIN com Produto e
+    GROUP BY produto_id devolve lucro, receita, barris, litros e custo de
+    barril de cada produto (exceto boletos) em uma única consulta.
+    """
+    barris = func.coalesce(Venda.quantidade_barris_vendidos, 0.0)
+    query = (
+        select(
+            Produto.id,
+            Produto.nome,
+            func.sum(func.coalesce(Venda.lucro, 0.0)),
+            func.sum(func.coalesce(Venda.total, 0.0)),
+            func.sum(barris),
+            func.sum(barris * Produto.volume_litros),
+            func.sum(func.coalesce(Venda.custo_total_venda, 0.0)),
+            func.count(Venda.id),
+        )
+        .join(Produto, Produto.id == Venda.produto_id)
+        .where(Venda.data >= inicio, Venda.data < fim, Venda.tipo_venda != "boleto")
+        .group_by(Produto.id, Produto.nome)
+    )
+    itens = [
+        LucroProduto(
+            produto_id=produto_id,
+            nome=nome,
+            lucro=float(lucro or 0.0),
+            receita=float(receita or 0.0),
+            barris_vendidos=float(barris_vendidos or 0.0),
+            litros=float(litros or 0.0),
+            custo_total_venda=float(custo or 0.0),
+            vendas=vendas,
+        )
+        for produto_id, nome, lucro, receita, barris_vendidos, litros, custo, vendas in db.exec(query)
+    ]
+    if not itens:
+        return None
+    return ordenar_lucro_por_produto(itens)
+
+def _soma_movimentos(tipo_movimento: str):
+    return func.coalesce(func.sum(case(
+        (MovimentoEstoque.tipo_movimento == tipo_movimento, MovimentoEstoque.quantidade),
+        else_=0.0,
+    )), 0.0)
+
+def movimentos_por_produto(db: Session, produto_ids: Optional[List[int]] = None) -> List:
+    """
+    Soma os movimentos de estoque de todos os produtos em uma única consulta.
+    Retorna uma linha por produto (inclusive sem movimentos) com o Produto e
+    os totais de entrada, saída manual, saída por venda e saída por barril.
+    """
+    query = (
+        select(
+            Produto,
+            _soma_movimentos("entrada"),
+            _soma_movimentos("saida_manual"),
+            _soma_movimentos("saida_venda"),
+            _soma_movimentos("saida_venda_barril"),
+        )
+        .outerjoin(MovimentoEstoque, MovimentoEstoque.produto_id == Produto.id)
+        .group_by(Produto.id)
+        .order_by(Produto.id)
+    )
+    if produto_ids is not None:
+        query = query.where(Produto.id.in_(produto_ids))
+    return db.exec(query).all()
+
+def saldos_por_produto(db: Session) -> List:
+    """
+    Lê o saldo materializado de cada produto (SaldoEstoque), sem percorrer o
+    histórico de movimentos. Produtos sem saldo materializado vêm com None.
+    """
+    query = (
+        select(Produto, SaldoEstoque)
+        .outerjoin(SaldoEstoque, SaldoEstoque.produto_id == Produto.id)
+        .order_by(Produto.id)
+    )
+    return db.exec(query).all()
+
+# --- Séries temporais ---
+
+INTERVALOS_SERIE = ("dia", "semana", "mes")
+AGRUPAMENTOS_SERIE = {"tipo_venda": Venda.tipo_venda, "produto_id": Venda.produto_id}
+
+def inicio_do_periodo(intervalo: str, coluna, dialeto: str):
+    """
+    Expressão SQL com o primeiro dia do período (dia, semana começando na
+    segunda-feira ou mês) que contém a data da coluna, no dialeto do banco.
+    """
+    if intervalo == "dia":
+        return coluna
+    if dialeto == "postgresql":
+        campo = {"semana": "week", "mes": "month"}[intervalo]
+        return cast(func.date_trunc(campo, coluna), Date)
+    if dialeto == "sqlite":
+        if intervalo == "semana":
+            # Vai ao domingo seguinte (ou fica, se já for domingo) e volta 6 dias
+            return func.date(coluna, "weekday 0", "-6 days")
+        return func.strftime("%Y-%m-01", coluna)
+    raise ValueError(f"Série por {intervalo} não suportada para o banco '{dialeto}'.")
+
+def serie_temporal(db: Session, inicio: date, fim: date, intervalo: str = "dia",
+                   por: Optional[str] = None) -> Dict[str, list]:
+    """
+    Receita, gastos e lucro por período em [inicio, fim), com uma consulta
+    agrupada (e, se `por` for informado, separados por tipo de venda ou
+    produto). O resultado é colunar: uma lista por campo, na ordem dos
+    períodos. Períodos sem venda não aparecem.
+    """
+    periodo = inicio_do_periodo(intervalo, Venda.data, db.get_bind().dialect.name).label("periodo")
+    chaves = [periodo] + ([AGRUPAMENTOS_SERIE[por].label(por)] if por else [])
+    nao_boleto = Venda.tipo_venda != "boleto"
+    query = (
+        select(
+            *chaves,
+            func.sum(case((nao_boleto, func.coalesce(Venda.total, 0.0)), else_=0.0)),
+            func.sum(func.coalesce(Venda.custo_func, 0.0)),
+            func.sum(func.coalesce(Venda.custo_copos, 0.0)),
+            func.sum(func.coalesce(Venda.custo_boleto, 0.0)),
+            func.sum(Venda.lucro),
+            func.count(Venda.id),
+        )
+        .where(Venda.data >= inicio, Venda.data < fim)
+        .group_by(*chaves)
+        .order_by(*chaves)
+    )
+
+    colunas = ["periodo"] + ([por] if por else []) + [
+        "receita_bruta", "receita_liquida", "gasto_funcionarios", "gasto_copos", "gasto_boleto", "lucro", "vendas"]
+    serie = {coluna: [] for coluna in colunas}
+    for linha in db.exec(query):
+        valor_periodo, *chave, receita, gasto_func, gasto_copos, gasto_boleto, lucro, vendas = linha
+        serie["periodo"].append(valor_periodo.isoformat() if isinstance(valor_periodo, date) else str(valor_periodo))
+        if por:
+            serie[por].append(chave[0])
+        receita, gasto_func, gasto_copos, gasto_boleto = (float(v or 0.0) for v in (receita, gasto_func, gasto_copos, gasto_boleto))
+        serie["receita_bruta"].append(round(receita, 2))
+        serie["receita_liquida"].append(round(receita - gasto_func - gasto_copos - gasto_boleto, 2))
+        serie["gasto_funcionarios"].append(round(gasto_func, 2))
+        serie["gasto_copos"].append(round(gasto_copos, 2))
+        serie["gasto_boleto"].append(round(gasto_boleto, 2))
+        serie["lucro"].append(round(float(lucro or 0.0), 2))
+        serie["vendas"].append(vendas)
+    return serie
+
+# --- Dias da semana ---
+
+def dia_da_semana(coluna):
+    """
+    Dia da semana da data no padrão de date.weekday() (segunda-feira = 0).
+    EXTRACT(dow) conta a partir do domingo tanto no PostgreSQL quanto no
+    SQLite (strftime('%w')).
+    """
+    return (cast(extract("dow", coluna), Integer) + 6) % 7
+
+def calcular_ranking_dias_sql(db: Session, inicio: date, fim: date) -> Optional[List[Dict]]:
+    """
+    Equivalente SQL de calcular_ranking_dias: faturamento, vendas e dias com
+    venda por dia da semana (calculado a partir de Venda.data), em uma consulta.
+    """
+    dia = dia_da_semana(Venda.data).label("dia")
+    query = (
+        select(dia, func.sum(func.coalesce(Venda.total, 0.0)), func.count(Venda.id), func.count(distinct(Venda.data)))
+        .where(Venda.data >= inicio, Venda.data < fim, Venda.tipo_venda != "boleto")
+        .group_by(dia)
+    )
+    totais = {int(d): (float(total or 0.0), vendas, dias) for d, total, vendas, dias in db.exec(query)}
+    if not totais:
+        return None
+    return montar_ranking_dias(totais)
+
+def _meses_do_intervalo(inicio: date, fim: date) -> List[Tuple[int, int]]:
+    meses = []
+    ano, mes = inicio.year, inicio.month
+    while date(ano, mes, 1) < fim:
+        meses.append((ano, mes))
+        ano, mes = ano + (mes == 12), (mes % 12) + 1
+    return meses
+
+def mapa_dias_por_mes(db: Session, inicio: date, fim: date) -> Optional[Dict]:
+    """
+    Matriz dia da semana x mês do faturamento em [inicio, fim), com uma
+    consulta agrupada. `total[d][m]` e `dias[d][m]` são o faturamento e os
+    dias com venda do dia da semana `d` (segunda = 0) no mês `meses[m]`.
+    """
+    dia = dia_da_semana(Venda.data).label("dia")
+    ano = extract("year", Venda.data).label("ano")
+    mes = extract("month", Venda.data).label("mes")
+    query = (
+        select(ano, mes, dia, func.sum(func.coalesce(Venda.total, 0.0)), func.count(distinct(Venda.data)))
+        .where(Venda.data >= inicio, Venda.data < fim, Venda.tipo_venda != "boleto")
+        .group_by(ano, mes, dia)
+    )
+    linhas = db.exec(query).all()
+    if not linhas:
+        return None
+
+    meses = _meses_do_intervalo(inicio, fim)
+    coluna = {chave: i for i, chave in enumerate(meses)}
+    total = [[0.0] * len(meses) for _ in DIAS_DA_SEMANA]
+    dias = [[0] * len(meses) for _ in DIAS_DA_SEMANA]
+    for a, m, d, faturamento, quantidade in linhas:
+        i = coluna[(int(a), int(m))]
+        total[int(d)][i] = round(float(faturamento or 0.0), 2)
+        dias[int(d)][i] = quantidade
+    return {
+        "meses": [f"{a}-{m:02d}" for a, m in meses],
+        "dias_semana": list(DIAS_DA_SEMANA),
+        "total": total,
+        "dias": dias,
+    }
@@ -1,36 +1,198 @@
 # app/database.py
 
-from typing import Generator
+import threading
+import time
+from typing import Dict, Generator, List
+from sqlalchemy import event, exc, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
 from sqlmodel import create_engine, SQLModel, Session
 import os
 
 _engine = None
 
+class EstatisticasPool:
+    """
+    Contadores do pool de conexões, alimentados pelos eventos do SQLAlchemy
+    (connect, checkout, checkin, invalidate) e pelo tempo de espera medido em
+    PoolMedido. São do processo inteiro, como o cache de relatórios.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self) -> None:
+        with self._lock:
+            self.conexoes_abertas = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidacoes = 0
+            self.esperas = 0
+            self.esgotamentos = 0
+            self.tempo_espera_total = 0.0
+            self.tempo_espera_max = 0.0
+
+    def contar(self, contador: str) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def registrar_espera(self, segundos: float, esgotado: bool = False) -> None:
+        with self._lock:
+            self.esperas += 1
+            if esgotado:
+                self.esgotamentos += 1
+            self.tempo_espera_total += segundos
+            self.tempo_espera_max = max(self.tempo_espera_max, segundos)
+
+    def como_dict(self, pool) -> Dict:
+        with self._lock:
+            dados = {
+                "conexoes_abertas": self.conexoes_abertas,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidacoes": self.invalidacoes,
+                "esgotamentos": self.esgotamentos,
+                "espera_media_ms": round(self.tempo_espera_total / self.esperas * 1000, 3) if self.esperas else 0.0,
+                "espera_max_ms": round(self.tempo_espera_max * 1000, 3),
+            }
+        dados["pool"] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            dados.update(
+                tamanho=pool.size(),
+                em_uso=pool.checkedout(),
+                ociosas=pool.checkedin(),
+                overflow=pool.overflow(),
+                timeout_segundos=pool.timeout(),
+            )
+        return dados
+
+estatisticas_pool = EstatisticasPool()
+
+class PoolMedido(QueuePool):
+    """
+    QueuePool que mede quanto tempo cada checkout espera por uma conexão livre
+    (o SQLAlchemy não tem evento para o início do checkout).
+    """
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except exc.TimeoutError:
+            estatisticas_pool.registrar_espera(time.perf_counter() - inicio, esgotado=True)
+            raise
+        estatisticas_pool.registrar_espera(time.perf_counter() - inicio)
+        return conexao
+
+def _banco_em_memoria(database_url: str) -> bool:
+    return database_url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:") or ":memory:" in database_url or "mode=memory" in database_url
+
+def opcoes_pool(database_url: str) -> Dict:
+    """
+    Parâmetros do pool a partir das variáveis de ambiente. O pre-ping testa a
+    conexão antes de usá-la (o Railway derruba conexões ociosas do Postgres) e
+    o recycle descarta conexões mais antigas que DB_POOL_RECYCLE segundos.
+    SQLite em memória usa o pool próprio do SQLAlchemy, sem fila.
+    """
+    opcoes = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "sim", "yes"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    if not _banco_em_memoria(database_url):
+        opcoes.update(
+            poolclass=PoolMedido,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return opcoes
+
+def criar_engine(database_url: str):
+    """
+    Cria o engine com o pool configurado e os eventos que alimentam estatisticas_pool.
+    """
+    kwargs = {"echo": False, **opcoes_pool(database_url)}
+    if database_url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+
+    engine = create_engine(database_url, **kwargs)
+    event.listen(engine, "connect", lambda conexao, registro: estatisticas_pool.contar("conexoes_abertas"))
+    event.listen(engine, "checkout", lambda conexao, registro, proxy: estatisticas_pool.contar("checkouts"))
+    event.listen(engine, "checkin", lambda conexao, registro: estatisticas_pool.contar("checkins"))
+    event.listen(engine, "invalidate", lambda conexao, registro, erro: estatisticas_pool.contar("invalidacoes"))
+    return engine
+
 def init_engine(database_url: str) -> None:
     global _engine
     if _engine is not None:
         return  # Evita recriar
 
-    kwargs = {"echo": False}
-    if database_url.startswith("sqlite"):
-        kwargs["connect_args"] = {"check_same_thread": False}
-
-    _engine = create_engine(database_url, **kwargs)
+    _engine = criar_engine(database_url)
 
 def get_engine():
     if _engine is None:
         raise RuntimeError("Engine não foi inicializado.")
     return _engine
 
+def relatorio_pool() -> Dict:
+    """
+    Estado atual do pool (em uso, ociosas, overflow) e os contadores acumulados.
+    """
+    return estatisticas_pool.como_dict(get_engine().pool)
+
 def get_session() -> Generator[Session, None, None]:
     engine = get_engine()
     with Session(engine) as session:
         yield session
 
+def insert_do_dialeto(dialeto: str):
+    """
+    insert() do dialeto (PostgreSQL ou SQLite), que tem on_conflict_do_update
+    para os upserts.
+    """
+    if dialeto == "postgresql":
+        return postgresql.insert
+    if dialeto == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Upsert não suportado para o banco '{dialeto}'.")
+
 def create_db_and_tables():
     engine = get_engine()
     SQLModel.metadata.create_all(engine)
 
+def create_missing_indexes(engine=None) -> List[str]:
+    """
+    Cria os índices declarados nos modelos que ainda não existem no banco.
+    create_all não adiciona índices a tabelas já existentes, então bancos
+    criados antes dos índices precisam desta migração. Pode ser executada
+    várias vezes; retorna os nomes dos índices criados.
+    """
+    engine = engine or get_engine()
+    inspector = inspect(engine)
+    tabelas = set(inspector.get_table_names())
+    criados = []
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in tabelas:
+            continue
+        existentes = {idx["name"] for idx in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existentes:
+                continue
+            # Um índice por transação: se um índice único falhar por dados
+            # duplicados, os já criados são mantidos.
+            try:
+                with engine.begin() as conn:
+                    index.create(conn)
+            except IntegrityError as e:
+                raise RuntimeError(
+                    f"Não foi possível criar o índice único {index.name}: existem registros duplicados "
+                    f"em {table.name}. Remova as duplicatas e execute a migração novamente."
+                ) from e
+            criados.append(index.name)
+    return criados
+
 def drop_db_and_tables():
     engine = get_engine()
     SQLModel.metadata.drop_all(engine)
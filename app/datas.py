@@ -0,0 +1,69 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Nomes e abreviações dos meses, já sem acento
+MESES = {
+    "janeiro": 1, "jan": 1,
+    "fevereiro": 2, "fev": 2,
+    "marco": 3, "mar": 3,
+    "abril": 4, "abr": 4,
+    "maio": 5, "mai": 5,
+    "junho": 6, "jun": 6,
+    "julho": 7, "jul": 7,
+    "agosto": 8, "ago": 8,
+    "setembro": 9, "set": 9,
+    "outubro": 10, "out": 10,
+    "novembro": 11, "nov": 11,
+    "dezembro": 12, "dez": 12,
+}
+
+# "5 2025", "05/2025", "5-2025", "05.2025"
+_MES_NUMERICO_ANO = re.compile(r"(\d{1,2})\s*[/.\-\s]\s*(\d{4})")
+# "2025-05", "2025/5"
+_ANO_MES_NUMERICO = re.compile(r"(\d{4})\s*[/\-]\s*(\d{1,2})")
+# "maio 2025", "mai/2025", "mai. 2025", "maio de 2025"
+_MES_NOME_ANO = re.compile(r"([a-z]+)\.?\s*(?:de\s+|/|-)?\s*(\d{4})")
+
+def _normalizar(texto: str) -> str:
+    sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", errors="ignore").decode("ascii")
+    return " ".join(sem_acento.lower().split())
+
+@lru_cache(maxsize=1024)
+def mes_ano_rapido(texto: str) -> Optional[Tuple[int, int]]:
+    """
+    Reconhece os formatos de mês/ano usados nas mensagens ("5 2025",
+    "05/2025", "maio 2025", "mar 2025", "março de 2025") sem o dateparser.
+    Retorna (mes, ano) ou None se o texto não estiver em nenhum desses formatos.
+    """
+    texto = _normalizar(texto)
+    encontrado = _MES_NUMERICO_ANO.fullmatch(texto)
+    if encontrado:
+        mes, ano = int(encontrado.group(1)), int(encontrado.group(2))
+    elif (encontrado := _ANO_MES_NUMERICO.fullmatch(texto)):
+        ano, mes = int(encontrado.group(1)), int(encontrado.group(2))
+    elif (encontrado := _MES_NOME_ANO.fullmatch(texto)) and encontrado.group(1) in MESES:
+        mes, ano = MESES[encontrado.group(1)], int(encontrado.group(2))
+    else:
+        return None
+    if not 1 <= mes <= 12:
+        return None
+    return mes, ano
+
+def interpretar_mes_ano(texto: str) -> Optional[Tuple[int, int]]:
+    """
+    Mês e ano de um comando do WhatsApp. Tenta o parser rápido e só recorre
+    ao dateparser (importado aqui, no primeiro uso) para os demais formatos.
+    O resultado do dateparser não vai para o cache: expressões relativas
+    ("mês passado") dependem do dia em que a mensagem chega.
+    """
+    mes_ano = mes_ano_rapido(texto)
+    if mes_ano:
+        return mes_ano
+
+    import dateparser
+    data = dateparser.parse(texto, languages=['pt'])
+    if data:
+        return data.month, data.year
+    return None
@@ -0,0 +1,253 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import case, event, update, inspect
+from sqlmodel import Session, select, func
+from app.models import Produto, MovimentoEstoque, SaldoEstoque, CustoMedioProduto
+from app.consultas import movimentos_por_produto
+from app.database import insert_do_dialeto
+
+# Sinal de cada tipo de movimento no saldo do produto
+SINAL_MOVIMENTO = {
+    "entrada": 1.0,
+    "saida_manual": -1.0,
+    "saida_venda": -1.0,
+    "saida_venda_barril": -1.0,
+}
+
+# Diferença mínima entre saldo materializado e razão para ser considerada divergência
+TOLERANCIA_DIVERGENCIA = 1e-6
+
+def _efeito(tipo_movimento: str, quantidade: float) -> float:
+    return SINAL_MOVIMENTO.get(tipo_movimento, 0.0) * (quantidade or 0.0)
+
+def _deltas_da_sessao(session: Session) -> Tuple[Dict[int, float], Set[int]]:
+    """
+    Soma, por produto, o efeito no saldo dos movimentos inseridos ou removidos
+    neste flush. Produtos com movimentos alterados são devolvidos à parte para
+    serem recalculados pelo razão, já que o valor anterior pode não estar carregado.
+    """
+    deltas = defaultdict(float)
+    recalcular = set()
+    for obj in session.new:
+        if isinstance(obj, MovimentoEstoque):
+            deltas[obj.produto_id] += _efeito(obj.tipo_movimento, obj.quantidade)
+        elif isinstance(obj, Produto):
+            deltas[obj.id] += 0.0  # produto novo já nasce com saldo zerado
+    for obj in session.dirty:
+        if isinstance(obj, MovimentoEstoque) and session.is_modified(obj):
+            recalcular.add(obj.produto_id)
+            recalcular.update(inspect(obj).attrs.produto_id.history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, MovimentoEstoque):
+            deltas[obj.produto_id] -= _efeito(obj.tipo_movimento, obj.quantidade)
+    return deltas, recalcular
+
+def _saldo_pelo_razao(conn, produto_id: int) -> float:
+    sinal = case(SINAL_MOVIMENTO, value=MovimentoEstoque.tipo_movimento, else_=0.0)
+    total = conn.execute(
+        select(func.sum(MovimentoEstoque.quantidade * sinal)).where(MovimentoEstoque.produto_id == produto_id)
+    ).scalar()
+    return float(total or 0.0)
+
+def _gravar_saldo_pelo_razao(conn, produto_id: int, delta: Optional[float] = None) -> None:
+    """
+    Grava o saldo do produto calculado pelo razão com INSERT ... ON CONFLICT:
+    se outra transação criou a linha ao mesmo tempo (o primeiro movimento do
+    produto gravado em paralelo), soma só o `delta` deste flush à linha dela,
+    ou, sem `delta`, sobrescreve com o valor do razão.
+    """
+    saldo = SaldoEstoque.__table__
+    quantidade = _saldo_pelo_razao(conn, produto_id)
+    volume_litros = conn.execute(select(Produto.volume_litros).where(Produto.id == produto_id)).scalar() or 0.0
+    inserir = insert_do_dialeto(conn.dialect.name)(saldo).values(
+        produto_id=produto_id, quantidade_barris=quantidade, volume_litros_total=quantidade * volume_litros)
+    novo_saldo = inserir.excluded.quantidade_barris if delta is None else saldo.c.quantidade_barris + delta
+    conn.execute(inserir.on_conflict_do_update(
+        index_elements=[saldo.c.produto_id],
+        set_={"quantidade_barris": novo_saldo, "volume_litros_total": novo_saldo * volume_litros},
+    ))
+
+@event.listens_for(Session, "after_flush")
+def _atualizar_saldos(session: Session, flush_context) -> None:
+    """
+    Mantém SaldoEstoque em dia na mesma transação em que o movimento é gravado.
+    O saldo é atualizado de forma atômica no banco (quantidade = quantidade + delta);
+    se o produto ainda não tem saldo materializado, ele é criado a partir do razão.
+    """
+    deltas, recalcular = _deltas_da_sessao(session)
+    if not deltas and not recalcular:
+        return
+
+    conn = session.connection()
+    saldo = SaldoEstoque.__table__
+    for produto_id, delta in deltas.items():
+        if produto_id in recalcular:
+            continue
+        volume = select(Produto.volume_litros).where(Produto.id == produto_id).scalar_subquery()
+        novo_saldo = saldo.c.quantidade_barris + delta
+        resultado = conn.execute(
+            update(saldo)
+            .where(saldo.c.produto_id == produto_id)
+            .values(quantidade_barris=novo_saldo, volume_litros_total=novo_saldo * func.coalesce(volume, 0.0))
+        )
+        if resultado.rowcount == 0:
+            # O razão já inclui os movimentos deste flush
+            _gravar_saldo_pelo_razao(conn, produto_id, delta)
+    for produto_id in recalcular:
+        _gravar_saldo_pelo_razao(conn, produto_id)
+
+def _acumulados_entrada(obj: MovimentoEstoque) -> Tuple[float, float]:
+    if obj.tipo_movimento != "entrada":
+        return 0.0, 0.0
+    quantidade = obj.quantidade or 0.0
+    custo = quantidade * obj.custo_unitario if obj.custo_unitario is not None else 0.0
+    return quantidade, custo
+
+def _acumulados_pelo_razao(conn, produto_ids: Optional[List[int]] = None) -> Dict[int, Tuple[float, float]]:
+    """
+    Quantidade e custo acumulados das entradas, por produto, lidos do razão.
+    """
+    query = (
+        select(
+            MovimentoEstoque.produto_id,
+            func.sum(MovimentoEstoque.quantidade),
+            func.sum(MovimentoEstoque.quantidade * MovimentoEstoque.custo_unitario),
+        )
+        .where(MovimentoEstoque.tipo_movimento == "entrada")
+        .group_by(MovimentoEstoque.produto_id)
+    )
+    if produto_ids is not None:
+        query = query.where(MovimentoEstoque.produto_id.in_(produto_ids))
+    return {
+        produto_id: (float(quantidade or 0.0), float(custo or 0.0))
+        for produto_id, quantidade, custo in conn.execute(query)
+    }
+
+def _gravar_custo_pelo_razao(conn, produto_id: int, delta: Optional[Tuple[float, float]] = None) -> None:
+    """
+    Grava o acumulado de entradas do produto pelo razão com INSERT ... ON
+    CONFLICT: se outra transação criou a linha ao mesmo tempo, soma só o
+    `delta` (quantidade, custo) deste flush; sem `delta`, sobrescreve.
+    """
+    custo_medio = CustoMedioProduto.__table__
+    quantidade, custo = _acumulados_pelo_razao(conn, [produto_id]).get(produto_id, (0.0, 0.0))
+    inserir = insert_do_dialeto(conn.dialect.name)(custo_medio).values(
+        produto_id=produto_id, quantidade_acumulada=quantidade, custo_acumulado=custo)
+    if delta is None:
+        valores = {"quantidade_acumulada": inserir.excluded.quantidade_acumulada, "custo_acumulado": inserir.excluded.custo_acumulado}
+    else:
+        valores = {"quantidade_acumulada": custo_medio.c.quantidade_acumulada + delta[0],
+                   "custo_acumulado": custo_medio.c.custo_acumulado + delta[1]}
+    conn.execute(inserir.on_conflict_do_update(index_elements=[custo_medio.c.produto_id], set_=valores))
+
+@event.listens_for(Session, "after_flush")
+def _atualizar_custo_medio(session: Session, flush_context) -> None:
+    """
+    Acumula quantidade e custo de cada entrada em CustoMedioProduto (O(1) por
+    entrada), na mesma transação do movimento. Assim a venda de barril lê o
+    custo médio direto, sem percorrer o histórico de compras.
+    """
+    deltas = defaultdict(lambda: [0.0, 0.0])
+    recalcular = set()
+    for obj in session.new:
+        if isinstance(obj, MovimentoEstoque) and obj.tipo_movimento == "entrada":
+            quantidade, custo = _acumulados_entrada(obj)
+            deltas[obj.produto_id][0] += quantidade
+            deltas[obj.produto_id][1] += custo
+    for obj in session.dirty:
+        if isinstance(obj, MovimentoEstoque) and session.is_modified(obj):
+            # Pode ter deixado de ser (ou passado a ser) uma entrada
+            recalcular.add(obj.produto_id)
+            recalcular.update(inspect(obj).attrs.produto_id.history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, MovimentoEstoque) and obj.tipo_movimento == "entrada":
+            quantidade, custo = _acumulados_entrada(obj)
+            deltas[obj.produto_id][0] -= quantidade
+            deltas[obj.produto_id][1] -= custo
+    if not deltas and not recalcular:
+        return
+
+    conn = session.connection()
+    custo_medio = CustoMedioProduto.__table__
+    for produto_id, (quantidade, custo) in deltas.items():
+        if produto_id in recalcular:
+            continue
+        resultado = conn.execute(
+            update(custo_medio)
+            .where(custo_medio.c.produto_id == produto_id)
+            .values(
+                quantidade_acumulada=custo_medio.c.quantidade_acumulada + quantidade,
+                custo_acumulado=custo_medio.c.custo_acumulado + custo,
+            )
+        )
+        if resultado.rowcount == 0:
+            _gravar_custo_pelo_razao(conn, produto_id, (quantidade, custo))
+    for produto_id in recalcular:
+        _gravar_custo_pelo_razao(conn, produto_id)
+
+def obter_custo_medio_barril(db: Session, produto_id: int) -> float:
+    """
+    Custo médio ponderado do barril do produto, lido do acumulado em
+    CustoMedioProduto. Se o produto ainda não tem acumulado (entradas
+    anteriores à tabela), ele é criado a partir do razão nesta transação.
+    """
+    acumulado = db.get(CustoMedioProduto, produto_id)
+    if acumulado is None:
+        _gravar_custo_pelo_razao(db.connection(), produto_id)
+        acumulado = db.get(CustoMedioProduto, produto_id)
+    return acumulado.custo_medio
+
+def reconstruir_custo_medio(db: Session) -> int:
+    """
+    Reconstrói CustoMedioProduto de todos os produtos a partir das entradas
+    já gravadas em MovimentoEstoque. Retorna quantos produtos foram gravados.
+    """
+    acumulados = _acumulados_pelo_razao(db.connection())
+    produto_ids = db.exec(select(Produto.id)).all()
+    for produto_id in produto_ids:
+        quantidade, custo = acumulados.get(produto_id, (0.0, 0.0))
+        registro = db.get(CustoMedioProduto, produto_id) or CustoMedioProduto(produto_id=produto_id)
+        registro.quantidade_acumulada = quantidade
+        registro.custo_acumulado = custo
+        db.add(registro)
+    db.commit()
+    return len(produto_ids)
+
+def reconciliar_saldos(db: Session, corrigir: bool = True) -> List[Dict]:
+    """
+    Recalcula o saldo de cada produto a partir do razão de movimentos e compara
+    com SaldoEstoque. Retorna as divergências encontradas e, se `corrigir` for
+    verdadeiro, regrava os saldos com os valores do razão.
+    """
+    saldos = {s.produto_id: s for s in db.exec(select(SaldoEstoque)).all()}
+    divergencias = []
+
+    for produto, entradas, saidas_manuais, saidas_venda, saidas_venda_barril in movimentos_por_produto(db):
+        quantidade_razao = entradas - saidas_manuais - saidas_venda - saidas_venda_barril
+        litros_razao = quantidade_razao * (produto.volume_litros or 0.0)
+        saldo = saldos.get(produto.id)
+
+        quantidade_registrada = saldo.quantidade_barris if saldo else None
+        litros_registrados = saldo.volume_litros_total if saldo else None
+        if (
+            saldo is None
+            or abs(quantidade_registrada - quantidade_razao) > TOLERANCIA_DIVERGENCIA
+            or abs(litros_registrados - litros_razao) > TOLERANCIA_DIVERGENCIA
+        ):
+            divergencias.append({
+                "produto_id": produto.id,
+                "produto": produto.nome,
+                "quantidade_registrada": quantidade_registrada,
+                "quantidade_razao": quantidade_razao,
+                "volume_litros_registrado": litros_registrados,
+                "volume_litros_razao": litros_razao,
+            })
+            if corrigir:
+                saldo = saldo or SaldoEstoque(produto_id=produto.id)
+                saldo.quantidade_barris = quantidade_razao
+                saldo.volume_litros_total = litros_razao
+                db.add(saldo)
+
+    if corrigir and divergencias:
+        db.commit()
+    return divergencias
@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+import os
+from datetime import date
+from typing import Iterator, List, Optional
+from sqlalchemy import Date, Float, Integer, select
+from sqlmodel import Session
+from app.database import get_engine
+from app.models import Venda, MovimentoEstoque
+
+# Exportação do histórico completo para a contabilidade. As linhas são lidas
+# do banco em lotes por um cursor do lado do servidor (stream_results/yield_per)
+# e escritas na resposta lote a lote: a memória usada não depende do período.
+
+# Linhas buscadas do banco por vez (e por row group no Parquet)
+TAMANHO_LOTE = int(os.getenv("EXPORTACAO_TAMANHO_LOTE", "5000"))
+
+# Tabela exportável -> (modelo, coluna de data usada no filtro)
+TABELAS = {
+    "vendas": (Venda, Venda.data),
+    "movimentos": (MovimentoEstoque, MovimentoEstoque.data_movimento),
+}
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def colunas(tabela: str) -> List[str]:
+    modelo, _ = TABELAS[tabela]
+    return [coluna.name for coluna in modelo.__table__.columns]
+
+def lotes(tabela: str, inicio: Optional[date] = None, fim: Optional[date] = None,
+          tamanho_lote: Optional[int] = None) -> Iterator[List[tuple]]:
+    """
+    Linhas da tabela no intervalo [inicio, fim), em ordem de data e id, em
+    lotes de `tamanho_lote`. Abre a própria sessão: o StreamingResponse
+    continua lendo depois que o endpoint (e a sessão da requisição) terminou.
+    """
+    modelo, coluna_data = TABELAS[tabela]
+    query = select(*modelo.__table__.columns).order_by(coluna_data, modelo.id)
+    if inicio is not None:
+        query = query.where(coluna_data >= inicio)
+    if fim is not None:
+        query = query.where(coluna_data < fim)
+
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE
+    with Session(get_engine()) as db:
+        resultado = db.execute(query.execution_options(stream_results=True, yield_per=tamanho_lote))
+        for lote in resultado.partitions():
+            yield [tuple(linha) for linha in lote]
+
+def _valor_json(valor):
+    return valor.isoformat() if isinstance(valor, date) else valor
+
+def em_csv(nomes: List[str], lotes_de_linhas: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(nomes)
+    for lote in lotes_de_linhas:
+        escritor.writerows(lote)  # datas saem em ISO (str(date)) e None como célula vazia
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def em_ndjson(nomes: List[str], lotes_de_linhas: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for lote in lotes_de_linhas:
+        yield "".join(
+            json.dumps(dict(zip(nomes, map(_valor_json, linha))), ensure_ascii=False) + "\n" for linha in lote
+        ).encode("utf-8")
+
+def _schema_parquet(tabela: str):
+    import pyarrow as pa
+    tipos = ((Integer, pa.int64()), (Float, pa.float64()), (Date, pa.date32()))
+    modelo, _ = TABELAS[tabela]
+    return pa.schema([
+        (coluna.name, next((tipo for sql, tipo in tipos if isinstance(coluna.type, sql)), pa.string()))
+        for coluna in modelo.__table__.columns
+    ])
+
+class _SaidaEmPartes:
+    """
+    Arquivo de escrita que guarda só os bytes ainda não enviados. A posição
+    (tell) continua contando o total escrito, que o Parquet usa nos offsets
+    dos row groups gravados no rodapé.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drenar(self) -> bytes:
+        dados, self._partes = b"".join(self._partes), []
+        return dados
+
+def em_parquet(tabela: str, lotes_de_linhas: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """
+    Um row group por lote lido do banco; os bytes de cada row group são
+    enviados assim que escritos. O rodapé do arquivo sai no fim.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema_parquet(tabela)
+    saida = _SaidaEmPartes()
+    with pq.ParquetWriter(saida, schema, compression="snappy") as escritor:
+        for lote in lotes_de_linhas:
+            colunas_do_lote = list(zip(*lote))
+            escritor.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas_do_lote, schema)], schema=schema))
+            yield saida.drenar()
+    yield saida.drenar()
+
+def parquet_disponivel() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def exportar(tabela: str, formato: str, inicio: Optional[date] = None, fim: Optional[date] = None) -> Iterator[bytes]:
+    """
+    Corpo da exportação em `formato` (csv, ndjson ou parquet), gerado sob demanda.
+    """
+    linhas = lotes(tabela, inicio, fim)
+    if formato == "csv":
+        return em_csv(colunas(tabela), linhas)
+    if formato == "ndjson":
+        return em_ndjson(colunas(tabela), linhas)
+    if formato == "parquet":
+        return em_parquet(tabela, linhas)
+    raise ValueError(f"Formato de exportação desconhecido: {formato}")
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+# Respostas do webhook guardadas pelo MessageSid do Twilio. Quando a consulta
+# demora, o Twilio reenvia a mesma mensagem; a nova tentativa recebe o TwiML
+# já gerado, sem consultar o banco nem responder duas vezes.
+
+class ArmazemMemoria:
+    """
+    Respostas em memória, limitadas por quantidade (LRU) e validade (TTL).
+    Vale só para o processo atual.
+    """
+
+    def __init__(self, max_itens: int = 1000, ttl_segundos: float = 300.0):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, message_sid: str) -> Optional[str]:
+        with self._lock:
+            item = self._itens.get(message_sid)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._itens[message_sid]
+                return None
+            self._itens.move_to_end(message_sid)
+            return item[1]
+
+    def gravar(self, message_sid: str, resposta: str) -> None:
+        with self._lock:
+            self._itens[message_sid] = (time.monotonic() + self.ttl_segundos, resposta)
+            self._itens.move_to_end(message_sid)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+class ArmazemSQLite:
+    """
+    Respostas em um arquivo SQLite local, compartilhado entre os workers da
+    mesma máquina. Usa o relógio do sistema (time.time) para o TTL, já que a
+    validade precisa valer entre processos.
+    """
+
+    def __init__(self, caminho: str, max_itens: int = 1000, ttl_segundos: float = 300.0):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        conn = self._conectar()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # leituras não esperam a escrita de outro worker
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS respostas_webhook ("
+                    " message_sid TEXT PRIMARY KEY, resposta TEXT NOT NULL, expira_em REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_respostas_webhook_expira_em ON respostas_webhook (expira_em)")
+        finally:
+            conn.close()
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.caminho, timeout=5)
+
+    def obter(self, message_sid: str) -> Optional[str]:
+        conn = self._conectar()
+        try:
+            linha = conn.execute(
+                "SELECT resposta FROM respostas_webhook WHERE message_sid = ? AND expira_em >= ?",
+                (message_sid, time.time()),
+            ).fetchone()
+        finally:
+            conn.close()
+        return linha[0] if linha else None
+
+    def gravar(self, message_sid: str, resposta: str) -> None:
+        conn = self._conectar()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO respostas_webhook (message_sid, resposta, expira_em) VALUES (?, ?, ?)",
+                    (message_sid, resposta, time.time() + self.ttl_segundos),
+                )
+                conn.execute("DELETE FROM respostas_webhook WHERE expira_em < ?", (time.time(),))
+                conn.execute(
+                    "DELETE FROM respostas_webhook WHERE message_sid NOT IN ("
+                    " SELECT message_sid FROM respostas_webhook ORDER BY expira_em DESC LIMIT ?)",
+                    (self.max_itens,),
+                )
+        finally:
+            conn.close()
+
+    def limpar(self) -> None:
+        conn = self._conectar()
+        try:
+            with conn:
+                conn.execute("DELETE FROM respostas_webhook")
+        finally:
+            conn.close()
+
+def criar_armazem():
+    """
+    Armazém configurado pelo ambiente: WEBHOOK_IDEMPOTENCIA_SQLITE (caminho do
+    arquivo) ativa o armazém compartilhado; sem ele, as respostas ficam em memória.
+    """
+    max_itens = int(os.getenv("WEBHOOK_IDEMPOTENCIA_TAMANHO", "1000"))
+    ttl_segundos = float(os.getenv("WEBHOOK_IDEMPOTENCIA_TTL", "300"))
+    caminho = os.getenv("WEBHOOK_IDEMPOTENCIA_SQLITE")
+    if caminho:
+        return ArmazemSQLite(caminho, max_itens, ttl_segundos)
+    return ArmazemMemoria(max_itens, ttl_segundos)
+
+armazem_respostas = criar_armazem()
+
+# Mensagens sendo respondidas neste processo; a tentativa repetida espera a original
+_em_andamento: Dict[str, "asyncio.Future[str]"] = {}
+
+async def responder_uma_vez(message_sid: Optional[str], gerar: Callable[[], Awaitable[str]]) -> str:
+    """
+    Gera a resposta da mensagem uma única vez por MessageSid. Se a mensagem já
+    foi respondida, devolve a resposta guardada; se ainda está sendo respondida
+    neste processo, espera por ela. Se a original falhar, a tentativa gera de novo.
+    """
+    if not message_sid:
+        return await gerar()
+
+    resposta = armazem_respostas.obter(message_sid)
+    if resposta is not None:
+        return resposta
+
+    original = _em_andamento.get(message_sid)
+    if original is not None:
+        await asyncio.wait([original])
+        if not original.cancelled() and original.exception() is None:
+            return original.result()
+
+    futuro = asyncio.get_running_loop().create_future()
+    # Marca a exceção como lida, mesmo que nenhuma tentativa esteja esperando
+    futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _em_andamento[message_sid] = futuro
+    try:
+        resposta = await gerar()
+        armazem_respostas.gravar(message_sid, resposta)
+        futuro.set_result(resposta)
+        return resposta
+    except Exception as e:
+        futuro.set_exception(e)
+        raise
+    except BaseException:
+        futuro.cancel()  # ex.: requisição cancelada
+        raise
+    finally:
+        if _em_andamento.get(message_sid) is futuro:
+            del _em_andamento[message_sid]
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.metricas import Histograma
+
+logger = logging.getLogger("app.requisicoes")
+
+# Requisições acima deste tempo (ms) vão para o log de requisições lentas
+LIMITE_REQUISICAO_LENTA_MS = float(os.getenv("REQUISICAO_LENTA_MS", "500"))
+
+# Intervalos do histograma de consultas SQL por requisição (quantidade, não ms)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+
+class ConsultasRequisicao:
+    """
+    Consultas SQL executadas durante uma requisição e o tempo gasto no banco.
+    """
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo_ms = 0.0
+
+# Contador da requisição em andamento. O FastAPI copia o contexto para o
+# threadpool, então as consultas dos endpoints síncronos também são contadas.
+_consultas_atuais: ContextVar[Optional[ConsultasRequisicao]] = ContextVar("consultas_atuais", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany) -> None:
+    inicio = conn.info["inicio_consultas"].pop()
+    consultas = _consultas_atuais.get()
+    if consultas is not None:
+        consultas.quantidade += 1
+        consultas.tempo_ms += (time.perf_counter() - inicio) * 1000
+
+@event.listens_for(Engine, "handle_error")
+def _consulta_com_erro(contexto_erro) -> None:
+    # Sem after_cursor_execute quando a consulta falha: descarta o início anotado
+    conexao = contexto_erro.connection
+    if conexao is not None and conexao.info.get("inicio_consultas"):
+        conexao.info["inicio_consultas"].pop()
+
+class MetricasRota:
+    def __init__(self):
+        self.latencia = Histograma()
+        self.consultas = Histograma(LIMITES_CONSULTAS)
+        self.tempo_banco_ms = 0.0
+        self.por_status: Dict[int, int] = {}
+
+class MetricasHttp:
+    """
+    Latência, status e consultas SQL por rota (o caminho declarado, ex.:
+    /estoque, para não criar uma série por URL).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rotas: Dict[Tuple[str, str], MetricasRota] = {}
+
+    def registrar(self, metodo: str, rota: str, status: int, duracao_ms: float, consultas: ConsultasRequisicao) -> None:
+        with self._lock:
+            metricas = self._rotas.setdefault((metodo, rota), MetricasRota())
+            metricas.por_status[status] = metricas.por_status.get(status, 0) + 1
+            metricas.tempo_banco_ms += consultas.tempo_ms
+        metricas.latencia.observar(duracao_ms)
+        metricas.consultas.observar(consultas.quantidade)
+
+    def rotas(self) -> List[Tuple[Tuple[str, str], MetricasRota]]:
+        with self._lock:
+            return list(self._rotas.items())
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._rotas.clear()
+
+metricas_http = MetricasHttp()
+
+def instrumentar(app: FastAPI) -> None:
+    """
+    Registra o middleware que mede cada requisição: latência, consultas SQL e
+    tempo no banco, por rota; requisições lentas vão para o log.
+    """
+    @app.middleware("http")
+    async def medir_requisicao(request: Request, call_next):
+        consultas = ConsultasRequisicao()
+        token = _consultas_atuais.set(consultas)
+        inicio = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            _consultas_atuais.reset(token)
+            rota = request.scope.get("route")
+            caminho = rota.path if rota is not None else "desconhecida"
+            metricas_http.registrar(request.method, caminho, status, duracao_ms, consultas)
+            if duracao_ms >= LIMITE_REQUISICAO_LENTA_MS:
+                logger.warning(
+                    "Requisição lenta: %s %s -> %s em %.0f ms, %d consultas SQL (%.0f ms no banco)",
+                    request.method, caminho, status, duracao_ms, consultas.quantidade, consultas.tempo_ms,
+                )
+
+# --- Formato Prometheus ---
+
+def _rotulos(**rotulos) -> str:
+    return ",".join(f'{chave}="{valor}"' for chave, valor in rotulos.items())
+
+def texto_prometheus(roteador=None, cache=None, pool: Optional[Dict] = None, fila=None) -> str:
+    """
+    Métricas no formato texto do Prometheus: HTTP por rota e, quando
+    informados, comandos do WhatsApp, cache de relatórios, pool e fila.
+    """
+    # As amostras de cada família ficam juntas, logo abaixo da sua linha TYPE
+    rotas = [({"metodo": metodo, "rota": rota}, metricas) for (metodo, rota), metricas in metricas_http.rotas()]
+    linhas = ["# TYPE chopp_http_latencia_ms histogram"]
+    for rotulos, metricas in rotas:
+        linhas.extend(metricas.latencia.prometheus("chopp_http_latencia_ms", rotulos))
+    linhas.append("# TYPE chopp_http_consultas_sql histogram")
+    for rotulos, metricas in rotas:
+        linhas.extend(metricas.consultas.prometheus("chopp_http_consultas_sql", rotulos))
+    linhas.append("# TYPE chopp_http_tempo_banco_ms_total counter")
+    for rotulos, metricas in rotas:
+        linhas.append(f"chopp_http_tempo_banco_ms_total{{{_rotulos(**rotulos)}}} {metricas.tempo_banco_ms}")
+    linhas.append("# TYPE chopp_http_requisicoes_total counter")
+    for rotulos, metricas in rotas:
+        for status, quantidade in sorted(metricas.por_status.items()):
+            linhas.append(f"chopp_http_requisicoes_total{{{_rotulos(**rotulos, status=status)}}} {quantidade}")
+
+    if roteador is not None:
+        linhas.append("# TYPE chopp_comando_latencia_ms histogram")
+        for comando in roteador.comandos:
+            linhas.extend(comando.latencia.prometheus("chopp_comando_latencia_ms", {"comando": comando.nome}))
+        linhas.append("# TYPE chopp_comando_erros_total counter")
+        for comando in roteador.comandos:
+            linhas.append(f"chopp_comando_erros_total{{{_rotulos(comando=comando.nome)}}} {comando.erros}")
+
+    if cache is not None:
+        estatisticas = cache.estatisticas()
+        linhas.append("# TYPE chopp_cache_relatorios_acertos_total counter")
+        linhas.append(f"chopp_cache_relatorios_acertos_total {estatisticas['acertos']}")
+        linhas.append("# TYPE chopp_cache_relatorios_falhas_total counter")
+        linhas.append(f"chopp_cache_relatorios_falhas_total {estatisticas['falhas']}")
+        linhas.append("# TYPE chopp_cache_relatorios_itens gauge")
+        linhas.append(f"chopp_cache_relatorios_itens {estatisticas['itens']}")
+
+    if pool is not None:
+        for chave in ("em_uso", "ociosas", "overflow"):
+            if chave in pool:
+                linhas.append(f"# TYPE chopp_pool_{chave} gauge")
+                linhas.append(f"chopp_pool_{chave} {pool[chave]}")
+        linhas.append("# TYPE chopp_pool_esgotamentos_total counter")
+        linhas.append(f"chopp_pool_esgotamentos_total {pool['esgotamentos']}")
+
+    if fila is not None:
+        estatisticas = fila.estatisticas()
+        linhas.append("# TYPE chopp_fila_profundidade gauge")
+        linhas.append(f"chopp_fila_profundidade {estatisticas['profundidade']}")
+        linhas.append("# TYPE chopp_fila_falhas_total counter")
+        linhas.append(f"chopp_fila_falhas_total {estatisticas['falhas']}")
+        linhas.append("# TYPE chopp_fila_duracao_ms histogram")
+        linhas.extend(fila.duracao.prometheus("chopp_fila_duracao_ms", {}))
+
+    return "\n".join(linhas) + "\n"
@@ -1,7 +1,8 @@
 from typing import List, Dict, Optional
 from app.models import Venda, Produto, MovimentoEstoque
 from datetime import date
-from collections import Counter
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 
 def calcular_relatorio_geral(vendas: List[Venda]) -> Optional[Dict]:
     """
@@ -16,13 +17,29 @@ def calcular_relatorio_geral(vendas: List[Venda]) -> Optional[Dict]:
     gasto_copos = sum(float(v.custo_copos or 0.0) for v in vendas)
     gasto_boleto = sum(float(v.custo_boleto or 0.0) for v in vendas)
     
+    vendas_validas_para_media = [v for v in vendas if v.tipo_venda != 'boleto']
+
+    return montar_relatorio(
+        receita_bruta=receita_bruta,
+        gasto_func=gasto_func,
+        gasto_copos=gasto_copos,
+        gasto_boleto=gasto_boleto,
+        vendas_validas=len(vendas_validas_para_media),
+        dias_registrados=len(set(v.data for v in vendas_validas_para_media)),
+    )
+
+def montar_relatorio(receita_bruta: float, gasto_func: float, gasto_copos: float, gasto_boleto: float,
+                     vendas_validas: int, dias_registrados: int) -> Dict:
+    """
+    Monta o dicionário do relatório a partir dos totais já agregados.
+    Usada tanto pelo cálculo em Python quanto pela agregação feita no banco.
+    """
     gasto_total = gasto_func + gasto_copos + gasto_boleto
     receita_liquida = receita_bruta - gasto_total
     
-    vendas_validas_para_media = [v for v in vendas if v.tipo_venda != 'boleto']
     media_vendas = 0.0
-    if len(vendas_validas_para_media) > 0:
-        media_vendas = receita_bruta / len(vendas_validas_para_media)
+    if vendas_validas > 0:
+        media_vendas = receita_bruta / vendas_validas
 
     return {
         "receita_bruta": round(receita_bruta, 2),
@@ -31,35 +48,109 @@ def calcular_relatorio_geral(vendas: List[Venda]) -> Optional[Dict]:
         "gasto_funcionarios": round(gasto_func, 2),
         "gasto_copos": round(gasto_copos, 2),
         "gasto_boleto": round(gasto_boleto, 2),
-        "dias_registrados": len(set(v.data for v in vendas if v.tipo_venda != 'boleto')),
+        "dias_registrados": dias_registrados,
     }
 
+# Nomes dos dias da semana na ordem de date.weekday() (segunda-feira = 0)
+DIAS_DA_SEMANA = ("Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo")
+
+def montar_ranking_dias(totais: Dict[int, tuple]) -> list:
+    """
+    Monta o ranking a partir de {dia da semana: (faturamento, vendas, dias)},
+    do maior faturamento para o menor. Usada pelo cálculo em Python e pelo SQL.
+    """
+    ranking = [
+        {
+            "dia_semana": dia,
+            "nome": DIAS_DA_SEMANA[dia],
+            "total": round(total, 2),
+            "vendas": vendas,
+            "dias": dias,
+            "media_por_dia": round(total / dias, 2) if dias else 0.0,
+        }
+        for dia, (total, vendas, dias) in totais.items()
+    ]
+    return sorted(ranking, key=lambda item: (-item["total"], item["dia_semana"]))
+
 def calcular_ranking_dias(vendas: List[Venda]) -> Optional[list]:
     """
     Calcula os dias da semana mais lucrativos com base em uma lista de vendas.
+    O dia da semana vem da data da venda (não do texto gravado em dia_semana,
+    que depende do locale e vem incompleto do ETL); boletos não contam.
     """
-    if not vendas:
+    faturamento_por_dia = defaultdict(float)
+    vendas_por_dia = Counter()
+    datas_por_dia = defaultdict(set)
+    for venda in vendas:
+        if venda.tipo_venda == "boleto":
+            continue
+        dia = venda.data.weekday()
+        faturamento_por_dia[dia] += float(venda.total or 0.0)
+        vendas_por_dia[dia] += 1
+        datas_por_dia[dia].add(venda.data)
+    if not faturamento_por_dia:
         return None
 
-    faturamento_por_dia = Counter()
-    for venda in vendas:
-        if venda.dia_semana and venda.total is not None:
-            faturamento_por_dia[venda.dia_semana] += venda.total
-    
-    return faturamento_por_dia.most_common()
+    return montar_ranking_dias({
+        dia: (faturamento_por_dia[dia], vendas_por_dia[dia], len(datas_por_dia[dia])) for dia in faturamento_por_dia
+    })
+
+@dataclass(frozen=True)
+class LucroProduto:
+    """
+    Totais das vendas (exceto boletos) de um produto no período.
+    """
+    produto_id: int
+    nome: str
+    lucro: float
+    receita: float
+    barris_vendidos: float
+    litros: float
+    custo_total_venda: float
+    vendas: int
+
+    @property
+    def margem(self) -> Optional[float]:
+        # Lucro sobre a receita, em %; None quando não houve receita
+        return self.lucro / self.receita * 100 if self.receita else None
 
-def calcular_lucro_por_produto(vendas: List[Venda], produtos: List[Produto]) -> Optional[list]:
+def ordenar_lucro_por_produto(itens: List[LucroProduto]) -> List[LucroProduto]:
+    # Maior lucro primeiro; empates pelo nome, para a ordem não depender do banco
+    return sorted(itens, key=lambda item: (-item.lucro, item.nome))
+
+def calcular_lucro_por_produto(vendas: List[Venda], produtos: List[Produto]) -> Optional[List[LucroProduto]]:
     """
-    Calcula o lucro por produto com base em listas de vendas e produtos.
+    Calcula lucro, receita, barris, litros e custo de barril por produto com
+    base em listas de vendas e produtos (referência em Python da consulta
+    agrupada calcular_lucro_por_produto_sql).
     """
     if not vendas:
         return None
 
-    produto_map = {p.id: p.nome for p in produtos}
-    lucro_por_produto = Counter()
+    produto_map = {p.id: p for p in produtos}
+    totais = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0, 0])
     for venda in vendas:
-        if venda.produto_id and venda.lucro is not None and venda.tipo_venda != "boleto":
-            if venda.produto_id in produto_map:
-                lucro_por_produto[produto_map[venda.produto_id]] += venda.lucro
+        if venda.tipo_venda == "boleto" or venda.produto_id not in produto_map:
+            continue
+        item = totais[venda.produto_id]
+        item[0] += venda.lucro or 0.0
+        item[1] += venda.total or 0.0
+        item[2] += venda.quantidade_barris_vendidos or 0.0
+        item[3] += venda.custo_total_venda or 0.0
+        item[4] += 1
+    if not totais:
+        return None
 
-    return lucro_por_produto.most_common()
+    return ordenar_lucro_por_produto([
+        LucroProduto(
+            produto_id=produto_id,
+            nome=produto_map[produto_id].nome,
+            lucro=lucro,
+            receita=receita,
+            barris_vendidos=barris,
+            litros=barris * produto_map[produto_id].volume_litros,
+            custo_total_venda=custo,
+            vendas=quantidade,
+        )
+        for produto_id, (lucro, receita, barris, custo, quantidade) in totais.items()
+    ])
@@ -1,25 +1,40 @@
+import csv
+import json
+import logging
 import os
 import secrets
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query, Request, Form, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import Response, HTMLResponse
+from fastapi.responses import Response, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-from app.database import get_session, init_engine, create_db_and_tables
-from app.models import Venda, Produto, MovimentoEstoque
-from datetime import date, datetime
+from app.database import get_session, get_engine, init_engine, create_db_and_tables, create_missing_indexes, relatorio_pool
+from app import estoque  # registra os listeners que mantêm SaldoEstoque e CustoMedioProduto
+from app import resumo  # registra o listener que mantém ResumoMensal
+from app.cache import cache_relatorios, em_cache
+from app.models import Produto, MovimentoEstoque
+from app.consultas import calcular_relatorio_geral_sql, calcular_lucro_por_produto_sql, movimentos_por_produto, saldos_por_produto
+from app.consultas import AGRUPAMENTOS_SERIE, INTERVALOS_SERIE, serie_temporal, calcular_ranking_dias_sql, mapa_dias_por_mes
+from app.idempotencia import responder_uma_vez
+from app.tarefas import Tarefa, fila_relatorios, relatorios_em_segundo_plano
+from app.instrumentacao import instrumentar, texto_prometheus
+from app.paginas import formulario, resposta_com_etag
+from app import exportacao
+from app.vendas import DadosVenda, ErroVenda, linhas_do_csv, montar_venda, registrar_lote, venda_de_feira_duplicada
+from app.comandos import roteador, argumento_inteiro, argumento_mes, argumento_ano, argumento_mes_ano
+from datetime import date
 from typing import Optional
-from collections import Counter
-from twilio.twiml.messaging_response import MessagingResponse
-from twilio.request_validator import RequestValidator
-import dateparser
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# DEBUG: Confirma se as variáveis de ambiente do formulário foram carregadas
-print(f"--> Usuário do .env: {os.getenv('FORM_USER')}")
-print(f"--> Senha do .env: {os.getenv('FORM_PASSWORD')}")
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("app")
+
+# Confirma se as variáveis de ambiente do formulário foram carregadas (sem expor a senha)
+logger.debug("Usuário do formulário: %s; senha definida: %s", os.getenv('FORM_USER'), bool(os.getenv('FORM_PASSWORD')))
 
 from contextlib import asynccontextmanager
 
@@ -31,15 +46,40 @@ async def lifespan(app: FastAPI):
     
     init_engine(DATABASE_URL)
     create_db_and_tables()
+    # create_all não cria índices em tabelas existentes; o 409 de venda de feira
+    # repetida e o upsert do ETL dependem de uq_venda_feira_data_produto
+    try:
+        criados = create_missing_indexes()
+        if criados:
+            logger.info("Índices criados: %s", ", ".join(criados))
+    except RuntimeError as e:
+        logger.error("%s", e)  # dados duplicados: o app sobe, mas a migração precisa ser refeita
+    with Session(get_engine()) as session:
+        resumo.garantir_resumo_mensal(session)
+    formulario.carregar()  # a página do formulário fica em memória (ver app/paginas.py)
     yield
+    fila_relatorios.parar()
 
 app = FastAPI(title="API Trailer de Chopp", lifespan=lifespan)
+instrumentar(app)  # latência, consultas SQL por requisição e log de requisições lentas
 
 # --- Configuração de Segurança ---
 
 # Obtém o Auth Token do Twilio das variáveis de ambiente
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
-validator = RequestValidator(TWILIO_AUTH_TOKEN)
+_validator = None
+
+# O SDK do Twilio é importado só no primeiro webhook, para não pesar na subida
+# do app (ver _get_validator e _processar_comando).
+def _get_validator():
+    """
+    Validador de assinatura do Twilio, criado no primeiro uso.
+    """
+    global _validator
+    if _validator is None:
+        from twilio.request_validator import RequestValidator
+        _validator = RequestValidator(TWILIO_AUTH_TOKEN)
+    return _validator
 
 # Credenciais para o formulário web
 security = HTTPBasic()
@@ -61,20 +101,34 @@ def get_current_username(credentials: HTTPBasicCredentials = Depends(security))
     return credentials.username
 
 # --- Endpoints do Formulário Web ---
+# Endpoints que usam a Session síncrona são `def` (não `async def`): o FastAPI
+# os executa no threadpool, e uma consulta lenta não bloqueia o event loop.
 
 @app.get("/", response_class=HTMLResponse)
-async def get_registration_form(username: str = Depends(get_current_username)):
+def get_registration_form(request: Request, username: str = Depends(get_current_username)):
     """
     Serve a página HTML com o formulário de registro (protegido por senha).
+    A página fica em memória (FORM_RECARREGAR=true relê o arquivo quando ele muda)
+    e responde 304 ao navegador que já tem a versão atual.
     """
     try:
-        with open("app/templates/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
+        pagina = formulario.atual()
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Arquivo de formulário não encontrado.")
+    return resposta_com_etag(request, pagina.conteudo, "text/html; charset=utf-8", pagina.etag, pagina.comprimido)
+
+def _erro_de_integridade(erro: IntegrityError):
+    """
+    Venda de feira repetida (índice único) vira 409; qualquer outra violação
+    é um erro de dados de verdade e segue adiante (500, com o log).
+    """
+    if venda_de_feira_duplicada(erro):
+        raise HTTPException(status_code=409, detail="Já existe uma venda de feira registrada para este produto nesta data.")
+    logger.error("Erro de integridade ao gravar venda: %s", erro.orig)
+    raise erro
 
 @app.post("/registrar_venda", response_class=HTMLResponse)
-async def register_venda(
+def register_venda(
     db: Session = Depends(get_session),
     data: date = Form(...),
     produto_id: int = Form(...),
@@ -91,99 +145,79 @@ async def register_venda(
 ):
     """
     Recebe os dados do formulário e salva no banco de dados (protegido por senha).
+    As regras de cada tipo de venda ficam em app/vendas.py.
     """
     produto = db.exec(select(Produto).where(Produto.id == produto_id)).first()
     if not produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado.")
 
-    lucro = 0.0
-    barris_baixados = 0.0
-    venda_total_calculada = 0.0
-
-    if tipo_venda == "feira":
-        if total is None: raise HTTPException(status_code=400, detail="Total da venda é obrigatório para vendas de feira.")
-        venda_total_calculada = total
-        lucro = total - (custo_func or 0.0) - (custo_copos or 0.0) - (custo_boleto or 0.0)
-        litros_vendidos = total / produto.preco_venda_litro
-        barris_baixados = litros_vendidos / produto.volume_litros
-            
-        # Registra o movimento de saída por venda de feira
-        movimento_saida_venda = MovimentoEstoque(
-            produto_id=produto_id,
-            tipo_movimento="saida_venda",
-            quantidade=barris_baixados,
-            custo_unitario=None,
-            data_movimento=data
-        )
-        db.add(movimento_saida_venda)
-
-    elif tipo_venda == "barril_festas":
-        if quantidade_barris_vendidos is None: raise HTTPException(status_code=400, detail="Quantidade de barris vendidos é obrigatória para vendas de barril_festas.")
-            
-        venda_total_calculada = quantidade_barris_vendidos * (produto.preco_venda_barril_fechado or 0.0)
-        barris_baixados = quantidade_barris_vendidos
-
-        # Calcular o custo médio do barril para o lucro
-        entradas_produto = db.exec(
-            select(MovimentoEstoque.quantidade, MovimentoEstoque.custo_unitario)
-            .where(MovimentoEstoque.produto_id == produto.id, MovimentoEstoque.tipo_movimento == "entrada")
-        ).all()
+    dados = DadosVenda(
+        data=data, produto_id=produto_id, tipo_venda=tipo_venda, total=total, cartao=cartao,
+        dinheiro=dinheiro, pix=pix, custo_func=custo_func, custo_copos=custo_copos,
+        custo_boleto=custo_boleto, quantidade_barris_vendidos=quantidade_barris_vendidos,
+    )
+    # Custo médio do barril para o lucro, mantido a cada entrada de estoque
+    custo_medio_barril = estoque.obter_custo_medio_barril(db, produto.id) if tipo_venda == "barril_festas" else 0.0
+    try:
+        nova_venda, movimento = montar_venda(dados, produto, custo_medio_barril)
+    except ErroVenda as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        total_custo_entradas = sum(e[0] * e[1] for e in entradas_produto if e[1] is not None)
-        total_quantidade_entradas = sum(e[0] for e in entradas_produto)
-            
-        custo_medio_barril = 0.0
-        if total_quantidade_entradas > 0:
-            custo_medio_barril = total_custo_entradas / total_quantidade_entradas
-            
-        custo_total_venda_barril = barris_baixados * custo_medio_barril
-        lucro = venda_total_calculada - custo_total_venda_barril
-
-        # Registra o movimento de saída por venda de barril_festas
-        movimento_saida_barril = MovimentoEstoque(
-            produto_id=produto_id,
-            tipo_movimento="saida_venda_barril",
-            quantidade=barris_baixados,
-            custo_unitario=custo_medio_barril, # Opcional: registrar o custo médio da baixa
-            data_movimento=data
-        )
-        db.add(movimento_saida_barril)
+    if movimento is not None:
+        db.add(movimento)
+    db.add(nova_venda)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        _erro_de_integridade(e)
+    db.refresh(nova_venda)
 
-    elif tipo_venda == "boleto":
-        venda_total_calculada = 0.0
-        barris_baixados = 0.0
-        lucro = -(custo_boleto or 0.0) # Lucro é o negativo do custo do boleto
+    return HTMLResponse(content="<h1>Registro salvo com sucesso!</h1><p><a href='/'>Registrar outra venda</a></p>")
 
+@app.post("/vendas/lote")
+async def register_vendas_lote(
+    request: Request,
+    db: Session = Depends(get_session),
+    username: str = Depends(get_current_username)
+):
+    """
+    Registra várias vendas de uma vez, com as mesmas regras de /registrar_venda.
+    Aceita JSON (lista de vendas ou {"vendas": [...]}) ou CSV com cabeçalho
+    (Content-Type text/csv). Se alguma linha for inválida, nada é gravado e a
+    resposta (422) indica o erro de cada linha.
+    """
+    corpo = await request.body()
+    if "csv" in request.headers.get("content-type", ""):
+        try:
+            linhas = linhas_do_csv(corpo.decode("utf-8"))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"CSV inválido: {e}")
     else:
-        raise HTTPException(status_code=400, detail="Tipo de venda inválido. Use 'feira', 'barril_festas' ou 'boleto'.")
+        try:
+            conteudo = json.loads(corpo)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido.")
+        linhas = conteudo.get("vendas") if isinstance(conteudo, dict) else conteudo
+        if not isinstance(linhas, list):
+            raise HTTPException(status_code=400, detail="Envie uma lista de vendas ou {\"vendas\": [...]}.")
+    if not linhas:
+        raise HTTPException(status_code=400, detail="Nenhuma venda no lote.")
 
-    nova_venda = Venda(
-        data=data,
-        produto_id=produto_id,
-        tipo_venda=tipo_venda,
-        total=venda_total_calculada,
-        cartao=cartao,
-        dinheiro=dinheiro,
-        pix=pix,
-        custo_func=custo_func,
-        custo_copos=custo_copos,
-        custo_boleto=custo_boleto,
-        lucro=lucro,
-        dia_semana=data.strftime('%A'),
-        quantidade_barris_vendidos=barris_baixados,
-        preco_venda_litro_registrado=produto.preco_venda_litro if tipo_venda == "feira" else None,
-        custo_total_venda=custo_total_venda_barril if tipo_venda == "barril_festas" else None
+    try:
+        gravou, resultados = await run_in_threadpool(registrar_lote, db, linhas)
+    except IntegrityError as e:
+        db.rollback()
+        _erro_de_integridade(e)
+    return JSONResponse(
+        content={"gravadas": len(resultados) if gravou else 0, "resultados": resultados},
+        status_code=200 if gravou else 422,
     )
-    db.add(nova_venda)
-    db.commit()
-    db.refresh(nova_venda)
-
-    return HTMLResponse(content="<h1>Registro salvo com sucesso!</h1><p><a href='/'>Registrar outra venda</a></p>")
 
 # --- Endpoints de Produtos ---
 
 @app.post("/produtos", response_class=HTMLResponse)
-async def create_produto(
+def create_produto(
     db: Session = Depends(get_session),
     nome: str = Form(...),
     preco_venda_barril_fechado: float = Form(...),
@@ -202,15 +236,17 @@ async def create_produto(
     return HTMLResponse(content=f"<h1>Produto '{produto.nome}' cadastrado com sucesso!</h1><p><a href='/'>Voltar</a></p>")
 
 @app.get("/produtos", response_model=list[Produto])
-async def get_produtos(db: Session = Depends(get_session), username: str = Depends(get_current_username)):
+def get_produtos(request: Request, db: Session = Depends(get_session), username: str = Depends(get_current_username)):
     produtos = db.exec(select(Produto)).all()
-    print(f"DEBUG: Produtos retornados para selectbox: {[p.nome for p in produtos]}") # DEBUG
-    return produtos
+    logger.debug("Produtos retornados para selectbox: %s", [p.nome for p in produtos])
+    # Lista com ETag: o formulário recebe 304 enquanto nenhum produto mudar
+    conteudo = json.dumps([p.model_dump() for p in produtos], ensure_ascii=False, separators=(",", ":")).encode()
+    return resposta_com_etag(request, conteudo, "application/json")
 
 # --- Endpoints de Estoque ---
 
 @app.post("/estoque/entrada", response_class=HTMLResponse)
-async def register_entrada_estoque(
+def register_entrada_estoque(
     db: Session = Depends(get_session),
     produto_id: int = Form(...),
     quantidade: int = Form(...),
@@ -231,7 +267,7 @@ async def register_entrada_estoque(
     return HTMLResponse(content=f"<h1>Entrada de {quantidade} barril(is) registrada com sucesso!</h1><p><a href='/'>Voltar</a></p>")
 
 @app.post("/estoque/saida_manual", response_class=HTMLResponse)
-async def register_saida_manual_estoque(
+def register_saida_manual_estoque(
     db: Session = Depends(get_session),
     produto_id: int = Form(...),
     quantidade: int = Form(...),
@@ -255,49 +291,40 @@ def _get_estoque_logic(db: Session) -> dict:
     Lógica de negócio para calcular o estoque atual.
     Esta função é síncrona e pode ser chamada por qualquer parte do app.
     """
-    produtos = db.exec(select(Produto)).all()
     estoque_info = {}
+    linhas = saldos_por_produto(db)
 
-    for produto in produtos:
+    # Produtos sem saldo materializado (anteriores ao SaldoEstoque) são
+    # calculados pelo razão; `python reconcile.py` materializa esses saldos.
+    sem_saldo = [produto.id for produto, saldo in linhas if saldo is None]
+    razao = {}
+    if sem_saldo:
+        for produto, entradas, saidas_manuais, saidas_venda, saidas_venda_barril in movimentos_por_produto(db, sem_saldo):
+            razao[produto.id] = entradas - saidas_manuais - saidas_venda - saidas_venda_barril
+
+    for produto, saldo in linhas:
         try:
-            entradas = db.exec(
-                select(MovimentoEstoque.quantidade)
-                .where(MovimentoEstoque.produto_id == produto.id, MovimentoEstoque.tipo_movimento == "entrada")
-            ).all()
-            saidas_manuais = db.exec(
-                select(MovimentoEstoque.quantidade)
-                .where(MovimentoEstoque.produto_id == produto.id, MovimentoEstoque.tipo_movimento == "saida_manual")
-            ).all()
-            saidas_venda = db.exec(
-                select(MovimentoEstoque.quantidade)
-                .where(MovimentoEstoque.produto_id == produto.id, MovimentoEstoque.tipo_movimento == "saida_venda")
-            ).all()
-            saidas_venda_barril = db.exec(
-                select(MovimentoEstoque.quantidade)
-                .where(MovimentoEstoque.produto_id == produto.id, MovimentoEstoque.tipo_movimento == "saida_venda_barril")
-            ).all()
-            
-            total_entradas = sum(q for q in entradas if q is not None)
-            total_saidas_manuais = sum(q for q in saidas_manuais if q is not None)
-            total_saidas_venda = sum(q for q in saidas_venda if q is not None)
-            total_saidas_venda_barril = sum(q for q in saidas_venda_barril if q is not None)
-            
-            estoque_atual = total_entradas - total_saidas_manuais - total_saidas_venda - total_saidas_venda_barril
+            if saldo is not None:
+                estoque_atual = saldo.quantidade_barris
+                volume_litros_total = saldo.volume_litros_total
+            else:
+                estoque_atual = razao[produto.id]
+                volume_litros_total = estoque_atual * (produto.volume_litros or 0.0)
             
             estoque_info[produto.nome] = {
                 "quantidade_barris": estoque_atual,
-                "volume_litros_total": estoque_atual * (produto.volume_litros or 0.0),
+                "volume_litros_total": volume_litros_total,
                 "preco_venda_litro": (produto.preco_venda_litro or 0.0),
                 "preco_venda_barril_fechado": (produto.preco_venda_barril_fechado or 0.0)
             }
         except Exception as e:
-            print(f"Erro ao processar produto {produto.nome} (ID: {produto.id}) para estoque: {e}")
+            logger.error("Erro ao processar produto %s (ID: %s) para estoque: %s", produto.nome, produto.id, e)
             estoque_info[f"{produto.nome} (Erro)"] = {"quantidade_barris": "N/A", "volume_litros_total": "N/A", "error": str(e)}
             continue
     return estoque_info
 
 @app.get("/estoque", response_model=dict)
-async def get_estoque_atual(
+def get_estoque_atual(
     db: Session = Depends(get_session),
     username: str = Depends(get_current_username)
 ):
@@ -306,36 +333,172 @@ async def get_estoque_atual(
     """
     return _get_estoque_logic(db)
 
-from app.logic import calcular_relatorio_geral, calcular_ranking_dias, calcular_lucro_por_produto
-
 # --- Lógica de Relatórios ---
 
+@em_cache("relatorio")
 def get_report_data(inicio: date, fim: date, db: Session, tipo_venda: Optional[str] = None):
     """
-    Busca os dados de vendas e chama a função de cálculo para gerar o relatório.
+    Gera o relatório do período agregando as vendas direto no banco.
+    Períodos de meses inteiros são lidos do ResumoMensal (uma linha por mês).
+    O resultado é o mesmo de calcular_relatorio_geral (referência em Python).
     """
-    query = select(Venda).where(Venda.data >= inicio, Venda.data < fim)
-    if tipo_venda:
-        query = query.where(Venda.tipo_venda == tipo_venda)
-    
-    vendas = db.exec(query).all()
-    
-    return calcular_relatorio_geral(vendas)
+    if resumo.eh_intervalo_mensal(inicio, fim):
+        return resumo.relatorio_do_resumo(db, inicio, fim, tipo_venda)
+    return calcular_relatorio_geral_sql(db, inicio, fim, tipo_venda)
 
+@em_cache("dias_movimento")
 def get_dias_movimento(inicio: date, fim: date, db: Session):
     """
-    Busca os dados de vendas e chama a função de cálculo para o ranking de dias.
+    Ranking dos dias da semana do período, agrupado no banco pela data da venda.
     """
-    vendas = db.exec(select(Venda).where(Venda.data >= inicio, Venda.data < fim)).all()
-    return calcular_ranking_dias(vendas)
+    return calcular_ranking_dias_sql(db, inicio, fim)
 
+@em_cache("mapa_dias")
+def get_mapa_dias(inicio: date, fim: date, db: Session):
+    """
+    Faturamento por dia da semana e mês (matriz 7 x meses) em uma consulta.
+    """
+    return mapa_dias_por_mes(db, inicio, fim)
+
+def _periodo_do_relatorio_anual(ano: int, db: Session):
+    # O relatório compara com o ano anterior: vendas de qualquer um dos dois o invalidam
+    return date(ano - 1, 1, 1), date(ano + 1, 1, 1)
+
+@em_cache("relatorio_anual", periodo=_periodo_do_relatorio_anual)
+def get_relatorio_anual(ano: int, db: Session):
+    """
+    Totais do ano, os 12 meses e a variação sobre o ano anterior, a partir
+    de uma consulta ao ResumoMensal.
+    """
+    return resumo.relatorio_anual(db, ano)
+
+@em_cache("lucro_por_produto")
 def get_lucro_por_produto(inicio: date, fim: date, db: Session):
     """
-    Busca dados e chama a função de cálculo para o lucro por produto.
+    Lucro, receita, barris e litros por produto (LucroProduto), do maior
+    lucro para o menor, agrupados no banco em uma consulta.
     """
-    vendas = db.exec(select(Venda).where(Venda.data >= inicio, Venda.data < fim, Venda.tipo_venda != "boleto")).all()
-    produtos = db.exec(select(Produto)).all()
-    return calcular_lucro_por_produto(vendas, produtos)
+    return calcular_lucro_por_produto_sql(db, inicio, fim)
+
+# --- Séries para dashboards ---
+
+@app.get("/series", response_model=dict)
+def get_series(
+    inicio: date = Query(..., description="Data inicial (inclusive)"),
+    fim: date = Query(..., description="Data final (exclusive)"),
+    intervalo: str = Query("dia", description="dia, semana ou mes"),
+    por: Optional[str] = Query(None, description="tipo_venda ou produto_id"),
+    db: Session = Depends(get_session),
+    username: str = Depends(get_current_username)
+):
+    """
+    Receita, gastos e lucro por dia, semana ou mês, em formato colunar
+    (uma lista por campo), calculados com uma única consulta agrupada.
+    """
+    if intervalo not in INTERVALOS_SERIE:
+        raise HTTPException(status_code=400, detail=f"Intervalo inválido. Use: {', '.join(INTERVALOS_SERIE)}.")
+    if por is not None and por not in AGRUPAMENTOS_SERIE:
+        raise HTTPException(status_code=400, detail=f"Agrupamento inválido. Use: {', '.join(AGRUPAMENTOS_SERIE)}.")
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="A data final deve ser posterior à inicial.")
+    return {"inicio": inicio, "fim": fim, "intervalo": intervalo, "por": por,
+            **serie_temporal(db, inicio, fim, intervalo, por)}
+
+@app.get("/dias_semana", response_model=dict)
+def get_dias_semana(
+    inicio: date = Query(..., description="Data inicial (inclusive)"),
+    fim: date = Query(..., description="Data final (exclusive)"),
+    db: Session = Depends(get_session),
+    username: str = Depends(get_current_username)
+):
+    """
+    Ranking dos dias da semana e a matriz dia da semana x mês do período
+    (um trimestre, um ano...), cada um calculado com uma consulta agrupada.
+    """
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="A data final deve ser posterior à inicial.")
+    return {"inicio": inicio, "fim": fim, "ranking": get_dias_movimento(inicio, fim, db), "mapa": get_mapa_dias(inicio, fim, db)}
+
+@app.get("/relatorio_anual/{ano}", response_model=dict)
+def get_relatorio_anual_endpoint(
+    ano: int,
+    db: Session = Depends(get_session),
+    username: str = Depends(get_current_username)
+):
+    """
+    Relatório anual com os totais, os 12 meses e a variação sobre o ano anterior.
+    """
+    relatorio = get_relatorio_anual(ano, db)
+    if relatorio is None:
+        raise HTTPException(status_code=404, detail=f"Nenhum registro para o ano {ano}.")
+    return relatorio
+
+# --- Exportação ---
+
+@app.get("/exportar/{tabela}")
+def exportar_tabela(
+    tabela: str,
+    formato: str = Query("csv", description="csv, ndjson ou parquet"),
+    inicio: Optional[date] = Query(None, description="Data inicial (inclusive)"),
+    fim: Optional[date] = Query(None, description="Data final (exclusive)"),
+    username: str = Depends(get_current_username)
+):
+    """
+    Exporta vendas ou movimentos de estoque (histórico completo ou o período
+    pedido) como um arquivo gerado aos poucos, sem montar tudo em memória.
+    """
+    if tabela not in exportacao.TABELAS:
+        raise HTTPException(status_code=404, detail=f"Tabela desconhecida. Use: {', '.join(exportacao.TABELAS)}.")
+    if formato not in exportacao.FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido. Use: {', '.join(exportacao.FORMATOS)}.")
+    if formato == "parquet" and not exportacao.parquet_disponivel():
+        raise HTTPException(status_code=501, detail="Exportação em Parquet requer o pacote pyarrow.")
+
+    periodo = f"_{inicio or 'inicio'}_{fim or 'hoje'}" if inicio or fim else ""
+    return StreamingResponse(
+        exportacao.exportar(tabela, formato, inicio, fim),
+        media_type=exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{tabela}{periodo}.{formato}"'},
+    )
+
+@app.get("/debug/cache", response_model=dict)
+async def get_cache_stats(username: str = Depends(get_current_username)):
+    """
+    Acertos, falhas e invalidações do cache de relatórios.
+    """
+    return cache_relatorios.estatisticas()
+
+@app.get("/debug/pool", response_model=dict)
+async def get_pool_stats(username: str = Depends(get_current_username)):
+    """
+    Conexões em uso, overflow e tempo de espera do pool de conexões do banco.
+    """
+    return relatorio_pool()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(username: str = Depends(get_current_username)):
+    """
+    Métricas no formato do Prometheus (latência e consultas SQL por rota,
+    comandos do WhatsApp, cache, pool de conexões e fila de relatórios).
+    """
+    return PlainTextResponse(
+        texto_prometheus(roteador=roteador, cache=cache_relatorios, pool=relatorio_pool(), fila=fila_relatorios),
+        media_type="text/plain; version=0.0.4",
+    )
+
+@app.get("/debug/fila", response_model=dict)
+async def get_fila_stats(username: str = Depends(get_current_username)):
+    """
+    Profundidade, duração e falhas da fila de relatórios em segundo plano.
+    """
+    return fila_relatorios.estatisticas()
+
+@app.get("/debug/comandos", response_model=dict)
+async def get_comandos_stats(username: str = Depends(get_current_username)):
+    """
+    Latência (histograma) e erros de cada comando do WhatsApp.
+    """
+    return roteador.estatisticas()
 
 # --- Webhook do WhatsApp ---
 
@@ -355,9 +518,7 @@ async def whatsapp_webhook(request: Request, body: str = Form(..., alias="Body")
     url = f"{original_protocol}://{original_host}{request.url.path}"
     form_params = await request.form()
     
-    # DEBUG: Loga a URL e os parâmetros recebidos
-    print(f"DEBUG: Webhook URL recebida: {url}")
-    print(f"DEBUG: Webhook Form Params recebidos: {form_params}")
+    logger.debug("Webhook URL recebida: %s; parâmetros: %s", url, form_params)
 
     # Converte os ImmutableMultiDict para um dicionário simples
     form_params_dict = {key: value for key, value in form_params.items()}
@@ -365,256 +526,238 @@ async def whatsapp_webhook(request: Request, body: str = Form(..., alias="Body")
     # Obtém a assinatura do Twilio do cabeçalho da requisição
     twilio_signature = request.headers.get('X-Twilio-Signature', '')
 
-    if not validator.validate(url, form_params_dict, twilio_signature):
+    if not _get_validator().validate(url, form_params_dict, twilio_signature):
         # Se a validação falhar, retorna um erro 403 Forbidden
         raise HTTPException(status_code=403, detail="Assinatura Twilio inválida.")
 
-    print(f"DEBUG: Entrou no whatsapp_webhook.")
-    text = body.strip().lower().replace('relatório', 'relatorio')
-    parts = text.split()
-    print(f"DEBUG: Mensagem processada: text='{text}', parts={parts})")
-    
-    resp = MessagingResponse()
 
-    # Lógica de reconhecimento de comandos
-    if not parts:
-        print(f"DEBUG: Mensagem vazia ou não reconhecida.")
-        resp.message("Comando não reconhecido. Digite `ajuda` para ver as opções.")
-        return Response(content=str(resp), media_type="application/xml")
-
-    # Lógica de reconhecimento de comandos
-    command = parts[0]
-    # Verifica se o comando é composto (duas palavras) e se é um dos comandos conhecidos
-    if len(parts) > 1:
-        potential_command = f"{parts[0]} {parts[1]}"
-        if potential_command in ["relatorio anual", "melhores dias", "relatorio barril"]:
-            command = potential_command
-    print(f"DEBUG: Comando identificado: '{command}'")
-
-    if command == "relatorio":
-        print(f"DEBUG: Executando comando 'relatorio'.")
-        try:
-            date_str = " ".join(parts[1:])
-            parsed_date = dateparser.parse(date_str, languages=['pt'])
-            if parsed_date:
-                mes, ano = parsed_date.month, parsed_date.year
-                
-                # Busca relatório do mês atual
-                inicio_atual = date(ano, mes, 1)
-                fim_atual = date(ano + (mes == 12), (mes % 12) + 1, 1)
-                report = get_report_data(inicio_atual, fim_atual, db)
-
-                if not report:
-                    resp.message(f"Nenhum registro de vendas encontrado para {mes}/{ano}.")
-                    return Response(content=str(resp), media_type="application/xml")
-
-                # Lógica para tendência
-                mes_anterior = mes - 1 if mes > 1 else 12
-                ano_anterior = ano if mes > 1 else ano - 1
-                inicio_anterior = date(ano_anterior, mes_anterior, 1)
-                report_anterior = get_report_data(inicio_anterior, inicio_atual, db)
-
-                tendencia_str = ""
-                if report_anterior:
-                    rec_liq_atual = report['receita_liquida']
-                    rec_liq_anterior = report_anterior['receita_liquida']
-                    if rec_liq_anterior > 0:
-                        variacao = (rec_liq_atual / rec_liq_anterior) - 1
-                        tendencia_str = f"\n📈 Tendência: {variacao:.2%} em relação ao mês anterior."
-                    else:
-                        tendencia_str = "\n📈 Tendência: N/A (mês anterior sem receita)."
-                else:
-                    tendencia_str = "\n📈 Tendência: N/A (sem dados do mês anterior)."
-
-                gastos_totais = report['gasto_funcionarios'] + report['gasto_copos'] + report['gasto_boleto']
-                text_reply = (
-                    f"🧾 Relatório {mes}/{ano}\n"
-                    f"--------------------------\n"
-                    f"Receita bruta: R$ {report['receita_bruta']:.2f}\n"
-                    f"Receita líquida: R$ {report['receita_liquida']:.2f}\n"
-                    f"Média por dia: R$ {report['media_vendas']:.2f}\n"
-                    f"--------------------------\n"
-                    f"Gastos Detalhados:\n"
-                    f"  - Funcionários: R$ {report['gasto_funcionarios']:.2f}\n"
-                    f"  - Copos: R$ {report['gasto_copos']:.2f}\n"
-                    f"  - Boleto: R$ {report['gasto_boleto']:.2f}\n"
-                    f"Total de Gastos: R$ {gastos_totais:.2f}\n"
-                    f"--------------------------\n"
-                    f"Dias registrados: {report['dias_registrados']}"
-                    f"{tendencia_str}"
-                )
-                resp.message(text_reply)
+    async def gerar_resposta() -> str:
+        # Os comandos consultam o banco com a Session síncrona: rodam no threadpool
+        # para não travar o event loop enquanto outro webhook é atendido
+        return str(await run_in_threadpool(_processar_comando, body, db, form_params_dict.get("From")))
 
-            else:
-                resp.message("Formato inválido. Use: relatorio <mês> <ano>")
-        except (ValueError, IndexError) as e:
-            print(f"DEBUG: Erro no comando 'relatorio': {e}")
-            resp.message("Formato inválido. Use: relatorio <mês> <ano>")
-        except HTTPException as e:
-            print(f"DEBUG: HTTPException no comando 'relatorio': {e.detail}")
-            resp.message(e.detail)
-
-    elif command == "relatorio anual":
-        print(f"DEBUG: Executando comando 'relatorio anual'.")
-        try:
-            # O comando é "relatorio anual", então o ano está em parts[2]
-            ano = int(parts[2])
-            inicio = date(ano, 1, 1)
-            fim = date(ano + 1, 1, 1)
-            report = get_report_data(inicio, fim, db)
-
-            if not report:
-                raise HTTPException(status_code=404, detail=f"Nenhum registro para o ano {ano}")
-
-            text_reply = (
-                f"🗓️ Relatório Anual {ano}\n"
-                f"--------------------------\n"
-
-                f"Receita bruta: R$ {report['receita_bruta']:.2f}\n"
-                f"Receita líquida: R$ {report['receita_liquida']:.2f}\n"
-                f"Média por dia: R$ {report['media_vendas']:.2f}\n"
-                f"Dias registrados: {report['dias_registrados']}"
-            )
-            resp.message(text_reply)
-        except (ValueError, IndexError) as e:
-            print(f"DEBUG: Erro no comando 'relatorio anual': {e}")
-            resp.message("Formato inválido. Use: relatorio anual <ano>")
-        except HTTPException as e:
-            print(f"DEBUG: HTTPException no comando 'relatorio anual': {e.detail}")
-            resp.message(e.detail)
-
-    elif command == "comparar":
-        print(f"DEBUG: Executando comando 'comparar'.")
-        try:
-            mes1, ano1 = int(parts[1]), int(parts[2])
-            mes2, ano2 = int(parts[3]), int(parts[4])
-
-            inicio1 = date(ano1, mes1, 1)
-            fim1 = date(ano1 + (mes1 == 12), (mes1 % 12) + 1, 1)
-            report1 = get_report_data(inicio1, fim1, db)
+    # Reenvios do Twilio (mesmo MessageSid) recebem a resposta já gerada
+    resposta = await responder_uma_vez(form_params_dict.get("MessageSid"), gerar_resposta)
+    return Response(content=resposta, media_type="application/xml")
 
-            inicio2 = date(ano2, mes2, 1)
-            fim2 = date(ano2 + (mes2 == 12), (mes2 % 12) + 1, 1)
-            report2 = get_report_data(inicio2, fim2, db)
-
-            if not report1:
-                resp.message(f"Não há dados para o primeiro período ({mes1}/{ano1}) para comparar.")
-            elif not report2:
-                resp.message(f"Não há dados para o segundo período ({mes2}/{ano2}) para comparar.")
-            else:
-                rec_liq1, rec_liq2 = report1['receita_liquida'], report2['receita_liquida']
-                variacao = f"{((rec_liq2 / rec_liq1) - 1):.2%}" if rec_liq1 > 0 else "N/A"
-                
-                text_reply = (
-                    f"📊 Comparativo: {mes1}/{ano1} vs {mes2}/{ano2}\n"
-                    f"--------------------------\n"
-                    f"Receita Líquida:\n"
-                    f"  - {mes1}/{ano1}: R$ {rec_liq1:.2f}\n"
-                    f"  - {mes2}/{ano2}: R$ {rec_liq2:.2f}\n"
-                    f"  - Variação: {variacao}"
-                )
-                resp.message(text_reply)
-        except (ValueError, IndexError) as e:
-            print(f"DEBUG: Erro no comando 'comparar': {e}")
-            resp.message("Formato inválido. Use: comparar <m1> <a1> <m2> <a2>")
-
-    elif command == "melhores dias":
-        print(f"DEBUG: Executando comando 'melhores dias'.")
-        try:
-            # O comando é "melhores dias", então os args começam em parts[2]
-            mes, ano = int(parts[2]), int(parts[3])
-            inicio = date(ano, mes, 1)
-            fim = date(ano + (mes == 12), (mes % 12) + 1, 1)
-            ranking = get_dias_movimento(inicio, fim, db)
-
-            if not ranking:
-                resp.message(f"Não há dados de vendas para {mes}/{ano}.")
-            else:
-                traducao_dias = {
-                    'Monday': 'Segunda-feira', 'Tuesday': 'Terça-feira',
-                    'Wednesday': 'Quarta-feira', 'Thursday': 'Quinta-feira',
-                    'Friday': 'Sexta-feira', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-                }
-                reply_lines = [f"🏆 Melhores Dias de {mes}/{ano} 🏆"]
-                for i, (dia, total) in enumerate(ranking):
-                    dia_traduzido = traducao_dias.get(dia.capitalize(), dia)
-                    reply_lines.append(f"{i+1}. {dia_traduzido}: R$ {total:.2f}")
-                resp.message("\n".join(reply_lines))
-        except (ValueError, IndexError) as e:
-            print(f"DEBUG: Erro no comando 'melhores dias': {e}")
-            resp.message("Formato inválido. Use: melhores dias <mês> <ano>")
-
-    elif command == "estoque":
-        print(f"DEBUG: Executando comando 'estoque'.")
-        try:
-            estoque_info = _get_estoque_logic(db)
-            if not estoque_info:
-                resp.message("Nenhum produto encontrado ou erro ao carregar estoque.")
-            else:
-                reply_lines = ["📦 Estoque Atual 📦"]
-                for produto_nome, info in estoque_info.items():
-                    if "error" in info:
-                        reply_lines.append(f"- {produto_nome}: Erro ao carregar ({info['error']})")
-                    else:
-                        reply_lines.append(f"- {produto_nome}: {info.get('quantidade_barris', 0):.2f} barris ({info.get('volume_litros_total', 0):.2f} L)")
-                resp.message("\n".join(reply_lines))
-        except Exception as e:
-            print(f"DEBUG: Erro no comando 'estoque': {e}")
-            resp.message(f"Erro ao consultar estoque: {e}")
+def _processar_comando(body: str, db: Session, remetente: Optional[str] = None):
+    """
+    Roteia o comando recebido pelo WhatsApp e monta a resposta do Twilio
+    (MessagingResponse). Função síncrona (acessa o banco); o webhook a executa
+    no threadpool. Com RELATORIOS_EM_SEGUNDO_PLANO ativo, comandos demorados
+    são enfileirados e a resposta apenas avisa que o relatório está sendo gerado.
+    """
+    from twilio.twiml.messaging_response import MessagingResponse
+    resp = MessagingResponse()
 
-    elif command == "relatorio barril":
-        print(f"DEBUG: Executando comando 'relatorio barril'.")
-        try:
-            # O comando é "relatorio barril", então os args começam em parts[2]
-            date_str = " ".join(parts[2:])
-            parsed_date = dateparser.parse(date_str, languages=['pt'])
-            if parsed_date:
-                mes, ano = parsed_date.month, parsed_date.year
-                inicio = date(ano, mes, 1)
-                fim = date(ano + (mes == 12), (mes % 12) + 1, 1)
-                
-                lucro_por_produto = get_lucro_por_produto(inicio, fim, db)
-
-                if not lucro_por_produto:
-                    resp.message(f"Nenhum registro de vendas de barril encontrado para {mes}/{ano}.")
-                else:
-                    reply_lines = [f"📊 Relatório de Barris {mes}/{ano} 📊"]
-                    total_lucro_barril = 0.0
-                    total_barris_vendidos = 0.0
-                    for produto_nome, dados in lucro_por_produto.items():
-                        reply_lines.append(f"- {produto_nome}:")
-                        reply_lines.append(f"  Lucro: R$ {dados['lucro']:.2f}")
-                        reply_lines.append(f"  Barris Vendidos: {dados['quantidade_barris_vendidos']:.2f}")
-                        total_lucro_barril += dados['lucro']
-                        total_barris_vendidos += dados['quantidade_barris_vendidos']
-                    reply_lines.append(f"\nTotal Lucro Barris: R$ {total_lucro_barril:.2f}")
-                    reply_lines.append(f"Total Barris Vendidos: {total_barris_vendidos:.2f}")
-                    resp.message("\n".join(reply_lines))
-            else:
-                resp.message("Formato inválido. Use: relatorio barril <mês> <ano>")
-        except (ValueError, IndexError) as e:
-            print(f"DEBUG: Erro no comando 'relatorio barril': {e}")
-            resp.message("Formato inválido. Use: relatorio barril <mês> <ano>")
-        except Exception as e:
-            print(f"DEBUG: Erro inesperado no comando 'relatorio barril': {e}")
-            resp.message(f"Erro ao consultar relatório de barris: {e}")
-
-    elif command == "ajuda":
-        print(f"DEBUG: Executando comando 'ajuda'.")
-        text_reply = (
-            "Comandos disponíveis:\n"
-            "1. `relatorio <mês> <ano>`\n"
-            "2. `relatorio anual <ano>`\n"
-            "3. `comparar <m1> <a1> <m2> <a2>`\n"
-            "4. `melhores dias <mês> <ano>`\n"
-            "5. `estoque`\n"
-            "6. `relatorio barril <mês> <ano>`\n"
-            "7. `ajuda`"
-        )
-        resp.message(text_reply)
+    comando = roteador.identificar(body)
+    # Argumentos inválidos são respondidos na hora, sem passar pela fila
+    if (remetente and comando is not None and comando.demorado and relatorios_em_segundo_plano()
+            and roteador.argumentos_validos(body)):
+        mensagem_falha = f"{comando.mensagem_erro or 'Erro ao gerar o relatório'}. Tente novamente mais tarde."
+        fila_relatorios.enfileirar(Tarefa(comando.nome, lambda: _despachar_em_nova_sessao(body), remetente, mensagem_falha))
+        resp.message("⏳ Gerando relatório... a resposta chega em instantes.")
+    else:
+        resp.message(roteador.despachar(body, db))
+    return resp
+
+def _despachar_em_nova_sessao(body: str) -> str:
+    # A sessão da requisição já foi fechada quando o worker roda a tarefa. Os
+    # erros do comando chegam à fila, que tenta de novo e conta as falhas.
+    with Session(get_engine()) as db:
+        return roteador.despachar(body, db, propagar_erros=True)
+
+# --- Comandos do WhatsApp ---
+# Cada comando declara suas palavras e argumentos; a ordem de registro é a da ajuda.
+
+def _intervalo_do_mes(mes: int, ano: int):
+    return date(ano, mes, 1), date(ano + (mes == 12), (mes % 12) + 1, 1)
+
+@roteador.comando("relatorio", argumentos=[argumento_mes_ano()], ajuda="receita e gastos do mês")
+def _comando_relatorio(db: Session, mes_ano_informado) -> str:
+    mes, ano = mes_ano_informado
+
+    # Busca relatório do mês atual
+    inicio_atual, fim_atual = _intervalo_do_mes(mes, ano)
+    report = get_report_data(inicio_atual, fim_atual, db)
+    if not report:
+        return f"Nenhum registro de vendas encontrado para {mes}/{ano}."
+
+    # Lógica para tendência
+    mes_anterior = mes - 1 if mes > 1 else 12
+    ano_anterior = ano if mes > 1 else ano - 1
+    inicio_anterior = date(ano_anterior, mes_anterior, 1)
+    report_anterior = get_report_data(inicio_anterior, inicio_atual, db)
+
+    tendencia_str = ""
+    if report_anterior:
+        rec_liq_atual = report['receita_liquida']
+        rec_liq_anterior = report_anterior['receita_liquida']
+        if rec_liq_anterior > 0:
+            variacao = (rec_liq_atual / rec_liq_anterior) - 1
+            tendencia_str = f"\n📈 Tendência: {variacao:.2%} em relação ao mês anterior."
+        else:
+            tendencia_str = "\n📈 Tendência: N/A (mês anterior sem receita)."
+    else:
+        tendencia_str = "\n📈 Tendência: N/A (sem dados do mês anterior)."
+
+    gastos_totais = report['gasto_funcionarios'] + report['gasto_copos'] + report['gasto_boleto']
+    return (
+        f"🧾 Relatório {mes}/{ano}\n"
+        f"--------------------------\n"
+        f"Receita bruta: R$ {report['receita_bruta']:.2f}\n"
+        f"Receita líquida: R$ {report['receita_liquida']:.2f}\n"
+        f"Média por dia: R$ {report['media_vendas']:.2f}\n"
+        f"--------------------------\n"
+        f"Gastos Detalhados:\n"
+        f"  - Funcionários: R$ {report['gasto_funcionarios']:.2f}\n"
+        f"  - Copos: R$ {report['gasto_copos']:.2f}\n"
+        f"  - Boleto: R$ {report['gasto_boleto']:.2f}\n"
+        f"Total de Gastos: R$ {gastos_totais:.2f}\n"
+        f"--------------------------\n"
+        f"Dias registrados: {report['dias_registrados']}"
+        f"{tendencia_str}"
+    )
 
+@roteador.comando("relatorio anual", argumentos=[argumento_ano()], ajuda="resumo do ano", demorado=True)
+def _comando_relatorio_anual(db: Session, ano: int) -> str:
+    relatorio = get_relatorio_anual(ano, db)
+    if not relatorio:
+        return f"Nenhum registro para o ano {ano}"
+
+    report = relatorio["total"]
+    linhas = [
+        f"🗓️ Relatório Anual {ano}",
+        "--------------------------",
+        f"Receita bruta: R$ {report['receita_bruta']:.2f}",
+        f"Receita líquida: R$ {report['receita_liquida']:.2f}",
+        f"Total de Gastos: R$ {report['gastos']:.2f}",
+        f"Média por dia: R$ {report['media_vendas']:.2f}",
+        f"Dias registrados: {report['dias_registrados']}",
+        "--------------------------",
+        "Mês: bruta / líquida (dias)",
+    ]
+    for item in relatorio["meses"]:
+        if item["dias_registrados"] or item["receita_bruta"] or item["gastos"]:
+            linhas.append(f"{item['mes']:02d}: R$ {item['receita_bruta']:.2f} / R$ {item['receita_liquida']:.2f} ({item['dias_registrados']})")
+
+    variacao = relatorio["variacao"]
+    linhas.append("--------------------------")
+    if variacao:
+        def percentual(campo: str) -> str:
+            valor = variacao[campo]["percentual"]
+            return f"{valor:+.2f}%" if valor is not None else "N/A"
+        linhas.append(f"📈 Em relação a {ano - 1}:")
+        linhas.append(f"  - Receita bruta: {percentual('receita_bruta')}")
+        linhas.append(f"  - Receita líquida: {percentual('receita_liquida')}")
+        linhas.append(f"  - Gastos: {percentual('gastos')}")
+        linhas.append(f"  - Dias registrados: {variacao['dias_registrados']['absoluta']:+d}")
     else:
-        print(f"DEBUG: Comando '{command}' não reconhecido.")
-        resp.message("Comando não reconhecido. Digite `ajuda` para ver as opções.")
+        linhas.append(f"📈 Em relação a {ano - 1}: N/A (sem dados do ano anterior).")
+    return "\n".join(linhas)
+
+@roteador.comando("comparar", argumentos=[argumento_mes("m1"), argumento_ano("a1"), argumento_mes("m2"), argumento_ano("a2")],
+                  ajuda="receita líquida de dois meses", demorado=True)
+def _comando_comparar(db: Session, mes1: int, ano1: int, mes2: int, ano2: int) -> str:
+    report1 = get_report_data(*_intervalo_do_mes(mes1, ano1), db)
+    report2 = get_report_data(*_intervalo_do_mes(mes2, ano2), db)
+
+    if not report1:
+        return f"Não há dados para o primeiro período ({mes1}/{ano1}) para comparar."
+    if not report2:
+        return f"Não há dados para o segundo período ({mes2}/{ano2}) para comparar."
+
+    rec_liq1, rec_liq2 = report1['receita_liquida'], report2['receita_liquida']
+    variacao = f"{((rec_liq2 / rec_liq1) - 1):.2%}" if rec_liq1 > 0 else "N/A"
+    return (
+        f"📊 Comparativo: {mes1}/{ano1} vs {mes2}/{ano2}\n"
+        f"--------------------------\n"
+        f"Receita Líquida:\n"
+        f"  - {mes1}/{ano1}: R$ {rec_liq1:.2f}\n"
+        f"  - {mes2}/{ano2}: R$ {rec_liq2:.2f}\n"
+        f"  - Variação: {variacao}"
+    )
 
-    return Response(content=str(resp), media_type="application/xml")
+@roteador.comando("melhores dias", argumentos=[argumento_mes(), argumento_ano()], ajuda="faturamento por dia da semana")
+def _comando_melhores_dias(db: Session, mes: int, ano: int) -> str:
+    ranking = get_dias_movimento(*_intervalo_do_mes(mes, ano), db)
+    if not ranking:
+        return f"Não há dados de vendas para {mes}/{ano}."
+
+    reply_lines = [f"🏆 Melhores Dias de {mes}/{ano} 🏆"]
+    for i, dia in enumerate(ranking):
+        reply_lines.append(
+            f"{i+1}. {dia['nome']}: R$ {dia['total']:.2f} "
+            f"({dia['dias']} dia(s), média R$ {dia['media_por_dia']:.2f})"
+        )
+    return "\n".join(reply_lines)
+
+def _valor_compacto(valor: float) -> str:
+    if not valor:
+        return "-"
+    return f"{valor / 1000:.1f}k" if valor >= 1000 else f"{valor:.0f}"
+
+def _mapa_dias_texto(db: Session, inicio: date, fim: date, titulo: str) -> str:
+    mapa = get_mapa_dias(inicio, fim, db)
+    if not mapa:
+        return f"Não há dados de vendas para {titulo}."
+
+    # Tabela em bloco monoespaçado: uma linha por dia da semana, uma coluna por mês
+    linhas = [f"🗓️ Faturamento por dia da semana - {titulo}", "```",
+              "    " + " ".join(f"{mes[5:]:>5}" for mes in mapa["meses"])]
+    for nome, valores in zip(mapa["dias_semana"], mapa["total"]):
+        linhas.append(f"{nome[:3]} " + " ".join(f"{_valor_compacto(v):>5}" for v in valores))
+    linhas.append("```")
+    totais = [sum(valores) for valores in mapa["total"]]
+    melhor = max(range(len(totais)), key=totais.__getitem__)
+    linhas.append(f"Melhor dia: {mapa['dias_semana'][melhor]} (R$ {totais[melhor]:.2f})")
+    return "\n".join(linhas)
+
+@roteador.comando("mapa dias", argumentos=[argumento_ano()], ajuda="faturamento por dia da semana em cada mês do ano")
+def _comando_mapa_dias(db: Session, ano: int) -> str:
+    return _mapa_dias_texto(db, date(ano, 1, 1), date(ano + 1, 1, 1), str(ano))
+
+@roteador.comando("mapa dias trimestre", argumentos=[argumento_inteiro("trimestre", 1, 4), argumento_ano()],
+                  ajuda="faturamento por dia da semana nos meses do trimestre")
+def _comando_mapa_dias_trimestre(db: Session, trimestre: int, ano: int) -> str:
+    inicio = date(ano, 3 * trimestre - 2, 1)
+    fim = date(ano + (trimestre == 4), (3 * trimestre) % 12 + 1, 1)
+    return _mapa_dias_texto(db, inicio, fim, f"{trimestre}º trimestre de {ano}")
+
+@roteador.comando("estoque", ajuda="barris e litros em estoque", mensagem_erro="Erro ao consultar estoque")
+def _comando_estoque(db: Session) -> str:
+    estoque_info = _get_estoque_logic(db)
+    if not estoque_info:
+        return "Nenhum produto encontrado ou erro ao carregar estoque."
+
+    reply_lines = ["📦 Estoque Atual 📦"]
+    for produto_nome, info in estoque_info.items():
+        if "error" in info:
+            reply_lines.append(f"- {produto_nome}: Erro ao carregar ({info['error']})")
+        else:
+            reply_lines.append(f"- {produto_nome}: {info.get('quantidade_barris', 0):.2f} barris ({info.get('volume_litros_total', 0):.2f} L)")
+    return "\n".join(reply_lines)
+
+@roteador.comando("relatorio barril", argumentos=[argumento_mes_ano()], ajuda="lucro das vendas de barril",
+                  mensagem_erro="Erro ao consultar relatório de barris")
+def _comando_relatorio_barril(db: Session, mes_ano_informado) -> str:
+    mes, ano = mes_ano_informado
+    lucro_por_produto = get_lucro_por_produto(*_intervalo_do_mes(mes, ano), db)
+    if not lucro_por_produto:
+        return f"Nenhum registro de vendas de barril encontrado para {mes}/{ano}."
+
+    reply_lines = [f"📊 Relatório de Barris {mes}/{ano} 📊"]
+    for item in lucro_por_produto:
+        reply_lines.append(f"- {item.nome}:")
+        reply_lines.append(f"  Lucro: R$ {item.lucro:.2f}" + (f" (margem {item.margem:.1f}%)" if item.margem is not None else ""))
+        reply_lines.append(f"  Receita: R$ {item.receita:.2f}")
+        reply_lines.append(f"  Barris Vendidos: {item.barris_vendidos:.2f} ({item.litros:.1f} L)")
+        if item.custo_total_venda:
+            reply_lines.append(f"  Custo dos Barris Fechados: R$ {item.custo_total_venda:.2f}")
+    reply_lines.append(f"\nTotal Lucro Barris: R$ {sum(item.lucro for item in lucro_por_produto):.2f}")
+    reply_lines.append(f"Total Barris Vendidos: {sum(item.barris_vendidos for item in lucro_por_produto):.2f}")
+    return "\n".join(reply_lines)
+
+@roteador.comando("ajuda", ajuda="esta lista")
+def _comando_ajuda(db: Session) -> str:
+    return roteador.ajuda()
@@ -0,0 +1,73 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+# Limites superiores (ms) dos intervalos do histograma de latência
+LIMITES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class Histograma:
+    """
+    Histograma de latência com intervalos fixos (em ms), seguro entre threads.
+    Guarda contagem, soma e máximo para a média e o pior caso.
+    """
+
+    def __init__(self, limites_ms: Sequence[float] = LIMITES_MS):
+        self.limites_ms = tuple(limites_ms)
+        self._lock = threading.Lock()
+        self._contagens = [0] * (len(self.limites_ms) + 1)  # o último é o +Inf
+        self.quantidade = 0
+        self.soma_ms = 0.0
+        self.max_ms = 0.0
+
+    def observar(self, duracao_ms: float) -> None:
+        with self._lock:
+            self._contagens[bisect_left(self.limites_ms, duracao_ms)] += 1
+            self.quantidade += 1
+            self.soma_ms += duracao_ms
+            self.max_ms = max(self.max_ms, duracao_ms)
+
+    def percentil(self, p: float) -> float:
+        """
+        Limite superior do intervalo onde cai o percentil `p` (0-100).
+        """
+        with self._lock:
+            if not self.quantidade:
+                return 0.0
+            alvo = self.quantidade * p / 100
+            acumulado = 0
+            for limite, contagem in zip(self.limites_ms, self._contagens):
+                acumulado += contagem
+                if acumulado >= alvo:
+                    return float(limite)
+            return self.max_ms
+
+    def como_dict(self) -> Dict:
+        with self._lock:
+            intervalos = {f"<= {limite} ms": contagem for limite, contagem in zip(self.limites_ms, self._contagens)}
+            intervalos[f"> {self.limites_ms[-1]} ms"] = self._contagens[-1]
+            dados = {
+                "quantidade": self.quantidade,
+                "media_ms": round(self.soma_ms / self.quantidade, 3) if self.quantidade else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "intervalos": intervalos,
+            }
+        dados["p50_ms"] = self.percentil(50)
+        dados["p95_ms"] = self.percentil(95)
+        return dados
+
+    def prometheus(self, nome: str, rotulos: Dict[str, str]) -> List[str]:
+        """
+        Linhas do histograma no formato texto do Prometheus (intervalos acumulados).
+        """
+        with self._lock:
+            contagens, quantidade, soma = list(self._contagens), self.quantidade, self.soma_ms
+        base = ",".join(f'{chave}="{valor}"' for chave, valor in rotulos.items())
+        separador = "," if base else ""
+        linhas, acumulado = [], 0
+        for limite, contagem in zip((*self.limites_ms, "+Inf"), contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{{base}{separador}le="{limite}"}} {acumulado}')
+        sufixo = f"{{{base}}}" if base else ""
+        linhas.append(f"{nome}_sum{sufixo} {soma}")
+        linhas.append(f"{nome}_count{sufixo} {quantidade}")
+        return linhas
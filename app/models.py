@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from datetime import date
 from typing import List, Optional
 
@@ -14,6 +15,11 @@ class Produto(SQLModel, table=True):
     vendas: List["Venda"] = Relationship(back_populates="produto")
 
 class MovimentoEstoque(SQLModel, table=True):
+    # Saldo, custo médio e reconciliação filtram por produto e tipo de movimento
+    __table_args__ = (
+        Index("ix_movimentoestoque_produto_tipo_data", "produto_id", "tipo_movimento", "data_movimento"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     tipo_movimento: str  # 'entrada', 'saida_manual', 'saida_venda', 'saida_venda_barril'
     quantidade: float      # Número de barris (pode ser float para vendas parciais)
@@ -24,6 +30,19 @@ class MovimentoEstoque(SQLModel, table=True):
     produto: Produto = Relationship(back_populates="movimentos")
 
 class Venda(SQLModel, table=True):
+    # Relatórios filtram por período (e tipo de venda); lucro por produto, por produto e período
+    __table_args__ = (
+        Index("ix_venda_data_tipo_venda", "data", "tipo_venda"),
+        Index("ix_venda_produto_id_data", "produto_id", "data"),
+        # Chave das vendas de feira (uma por dia e produto), usada no upsert do ETL.
+        # Parcial: barril_festas e boleto podem ter mais de um registro no mesmo dia.
+        Index(
+            "uq_venda_feira_data_produto", "data", "produto_id", "tipo_venda", unique=True,
+            postgresql_where=text("tipo_venda = 'feira'"),
+            sqlite_where=text("tipo_venda = 'feira'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     data: date
     dia_semana: str
@@ -42,4 +61,36 @@ class Venda(SQLModel, table=True):
     custo_total_venda: Optional[float] = None # Custo total dos produtos vendidos (ex: custo do barril)
 
     produto_id: Optional[int] = Field(default=None, foreign_key="produto.id")
-    produto: Optional[Produto] = Relationship(back_populates="vendas")
\ No newline at end of file
+    produto: Optional[Produto] = Relationship(back_populates="vendas")
+
+class SaldoEstoque(SQLModel, table=True):
+    # Saldo materializado por produto, mantido a cada movimento (ver app/estoque.py)
+    produto_id: int = Field(foreign_key="produto.id", primary_key=True)
+    quantidade_barris: float = 0.0
+    volume_litros_total: float = 0.0
+
+class CustoMedioProduto(SQLModel, table=True):
+    # Acumulados das entradas de estoque para o custo médio ponderado do barril
+    produto_id: int = Field(foreign_key="produto.id", primary_key=True)
+    quantidade_acumulada: float = 0.0 # Soma das quantidades de todas as entradas
+    custo_acumulado: float = 0.0      # Soma de quantidade * custo_unitario das entradas com custo
+
+    @property
+    def custo_medio(self) -> float:
+        if self.quantidade_acumulada > 0:
+            return self.custo_acumulado / self.quantidade_acumulada
+        return 0.0
+
+class ResumoMensal(SQLModel, table=True):
+    # Totais de vendas por mês e tipo de venda, mantidos a cada gravação de Venda
+    # (ver app/resumo.py). A linha com tipo_venda 'todos' agrega o mês inteiro.
+    ano: int = Field(primary_key=True)
+    mes: int = Field(primary_key=True)
+    tipo_venda: str = Field(primary_key=True)
+    receita_bruta: float = 0.0
+    gasto_funcionarios: float = 0.0
+    gasto_copos: float = 0.0
+    gasto_boleto: float = 0.0
+    quantidade_vendas: int = 0 # Registros de venda no mês (inclui boleto)
+    vendas_validas: int = 0    # Registros que não são boleto, base da média por venda
+    dias_registrados: int = 0  # Dias distintos com venda que não é boleto
@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from fastapi import Request, Response
+
+# O formulário é recarregado a cada uso do celular no trailer, muitas vezes em
+# dados móveis: a página fica em memória (já comprimida) e as respostas levam
+# ETag, para que o navegador só baixe de novo quando o conteúdo mudar.
+
+TEMPLATES = Path(__file__).resolve().parent / "templates"
+
+# Respostas menores que isso não compensam o gzip
+TAMANHO_MINIMO_GZIP = 1024
+
+def modo_desenvolvimento() -> bool:
+    return os.getenv("FORM_RECARREGAR", "false").lower() in ("1", "true", "sim", "yes")
+
+def calcular_etag(conteudo: bytes) -> str:
+    return '"' + hashlib.sha256(conteudo).hexdigest()[:32] + '"'
+
+def comprimir(conteudo: bytes) -> Optional[bytes]:
+    # mtime=0: o mesmo conteúdo gera sempre os mesmos bytes
+    if len(conteudo) < TAMANHO_MINIMO_GZIP:
+        return None
+    return gzip.compress(conteudo, compresslevel=9, mtime=0)
+
+class Pagina:
+    """
+    Arquivo lido uma vez e guardado em memória com o ETag e a versão gzip.
+    Com `recarregar`, confere a data de modificação a cada uso e relê o
+    arquivo quando ele muda (desenvolvimento).
+    """
+
+    def __init__(self, caminho: Path, recarregar: bool = False):
+        self.caminho = Path(caminho)
+        self.recarregar = recarregar
+        self._lock = threading.Lock()
+        self._modificado_em: Optional[float] = None
+        self.conteudo = b""
+        self.etag = ""
+        self.comprimido: Optional[bytes] = None
+
+    def carregar(self) -> None:
+        with self._lock:
+            modificado_em = self.caminho.stat().st_mtime
+            if modificado_em == self._modificado_em:
+                return
+            conteudo = self.caminho.read_bytes()
+            self.conteudo, self.etag, self.comprimido = conteudo, calcular_etag(conteudo), comprimir(conteudo)
+            self._modificado_em = modificado_em
+
+    def atual(self) -> "Pagina":
+        if self._modificado_em is None or self.recarregar:
+            self.carregar()
+        return self
+
+def _etag_confere(request: Request, etag: str) -> bool:
+    enviado = request.headers.get("if-none-match")
+    if not enviado:
+        return False
+    if enviado.strip() == "*":
+        return True
+    # Também aceita o ETag marcado como fraco (W/"...") por proxies que recomprimem
+    return etag in (valor.strip().removeprefix("W/") for valor in enviado.split(","))
+
+def _aceita_gzip(request: Request) -> bool:
+    for codificacao in request.headers.get("accept-encoding", "").split(","):
+        nome, *parametros = [parte.strip() for parte in codificacao.split(";")]
+        if nome in ("gzip", "*"):
+            pesos = [parametro[2:] for parametro in parametros if parametro.startswith("q=")]
+            try:
+                return not pesos or float(pesos[0]) > 0  # "gzip;q=0" recusa o gzip
+            except ValueError:
+                return False
+    return False
+
+def resposta_com_etag(request: Request, conteudo: bytes, media_type: str, etag: Optional[str] = None,
+                      comprimido: Optional[bytes] = None) -> Response:
+    """
+    Responde 304 quando o If-None-Match confere com o ETag; senão envia o
+    conteúdo (comprimido, se o cliente aceitar gzip). `no-cache` faz o navegador
+    revalidar a cada uso, o que custa só o 304 enquanto nada muda; `private`
+    porque as páginas são protegidas por senha.
+    """
+    etag = etag or calcular_etag(conteudo)
+    cabecalhos = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if _etag_confere(request, etag):
+        return Response(status_code=304, headers=cabecalhos)
+
+    if comprimido is None:
+        comprimido = comprimir(conteudo)
+    if comprimido is not None and _aceita_gzip(request):
+        cabecalhos["Content-Encoding"] = "gzip"
+        conteudo = comprimido
+    return Response(content=conteudo, media_type=media_type, headers=cabecalhos)
+
+formulario = Pagina(TEMPLATES / "index.html", recarregar=modo_desenvolvimento())
@@ -0,0 +1,205 @@
+from datetime import date
+from itertools import chain
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import and_, case, delete, distinct, event, extract, insert, inspect, literal, or_
+from sqlmodel import Session, select, func
+from app.models import Venda, ResumoMensal
+from app.logic import montar_relatorio
+
+# Valor de tipo_venda da linha que agrega todos os tipos de venda do mês
+TODOS_OS_TIPOS = "todos"
+
+def _proximo_mes(ano: int, mes: int) -> date:
+    return date(ano + (mes == 12), (mes % 12) + 1, 1)
+
+def eh_intervalo_mensal(inicio: date, fim: date) -> bool:
+    """
+    Indica se [inicio, fim) cobre meses inteiros e pode ser lido do ResumoMensal.
+    """
+    return inicio.day == 1 and fim.day == 1 and fim > inicio
+
+def _meses_da_sessao(session: Session) -> Set[Tuple[int, int]]:
+    """
+    Meses (ano, mes) afetados pelas vendas inseridas, alteradas ou removidas neste flush.
+    """
+    meses = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Venda) and obj.data is not None:
+            meses.add((obj.data.year, obj.data.month))
+    for obj in session.dirty:
+        if isinstance(obj, Venda) and session.is_modified(obj):
+            meses.add((obj.data.year, obj.data.month))
+            # Se a data mudou, o mês antigo também precisa ser refeito
+            meses.update((d.year, d.month) for d in inspect(obj).attrs.data.history.deleted if d is not None)
+    return meses
+
+def recalcular_meses(conn, meses: Iterable[Tuple[int, int]]) -> None:
+    """
+    Refaz as linhas de ResumoMensal dos meses informados a partir das vendas,
+    com uma consulta agrupada por tipo de venda e outra para o mês inteiro.
+    Usa a conexão recebida, então participa da transação de quem chamou.
+    """
+    meses = set(meses)
+    if not meses:
+        return
+
+    # Só as vendas dos meses tocados: o custo acompanha os meses alterados,
+    # não a distância entre o mais antigo e o mais novo
+    periodo = or_(*(and_(Venda.data >= date(a, m, 1), Venda.data < _proximo_mes(a, m)) for a, m in sorted(meses)))
+    ano = extract("year", Venda.data)
+    mes = extract("month", Venda.data)
+    nao_boleto = Venda.tipo_venda != "boleto"
+    agregados = (
+        func.sum(case((nao_boleto, func.coalesce(Venda.total, 0.0)), else_=0.0)),
+        func.sum(func.coalesce(Venda.custo_func, 0.0)),
+        func.sum(func.coalesce(Venda.custo_copos, 0.0)),
+        func.sum(func.coalesce(Venda.custo_boleto, 0.0)),
+        func.count(Venda.id),
+        func.count(case((nao_boleto, Venda.id))),
+        func.count(distinct(case((nao_boleto, Venda.data)))),
+    )
+    por_tipo = select(ano, mes, Venda.tipo_venda, *agregados).where(periodo).group_by(ano, mes, Venda.tipo_venda)
+    mes_inteiro = select(ano, mes, literal(TODOS_OS_TIPOS), *agregados).where(periodo).group_by(ano, mes)
+
+    linhas = []
+    for a, m, tipo, receita, gasto_func, copos, boleto, quantidade, validas, dias in chain(conn.execute(por_tipo), conn.execute(mes_inteiro)):
+        linhas.append({
+            "ano": int(a), "mes": int(m), "tipo_venda": tipo,
+            "receita_bruta": float(receita or 0.0),
+            "gasto_funcionarios": float(gasto_func or 0.0),
+            "gasto_copos": float(copos or 0.0),
+            "gasto_boleto": float(boleto or 0.0),
+            "quantidade_vendas": quantidade,
+            "vendas_validas": validas,
+            "dias_registrados": dias,
+        })
+
+    tabela = ResumoMensal.__table__
+    conn.execute(delete(tabela).where(or_(*(and_(tabela.c.ano == a, tabela.c.mes == m) for a, m in meses))))
+    if linhas:
+        conn.execute(insert(tabela), linhas)
+
+@event.listens_for(Session, "after_flush")
+def _atualizar_resumo_mensal(session: Session, flush_context) -> None:
+    """
+    Mantém ResumoMensal em dia na mesma transação em que as vendas são gravadas,
+    refazendo apenas os meses tocados pelo flush.
+    """
+    meses = _meses_da_sessao(session)
+    if meses:
+        recalcular_meses(session.connection(), meses)
+
+def relatorio_do_resumo(db: Session, inicio: date, fim: date, tipo_venda: Optional[str] = None) -> Optional[Dict]:
+    """
+    Relatório de meses inteiros lido do ResumoMensal: uma linha por mês
+    (12 linhas para um ano), com o mesmo resultado de calcular_relatorio_geral.
+    """
+    chave = ResumoMensal.ano * 12 + ResumoMensal.mes
+    query = select(
+        func.sum(ResumoMensal.receita_bruta),
+        func.sum(ResumoMensal.gasto_funcionarios),
+        func.sum(ResumoMensal.gasto_copos),
+        func.sum(ResumoMensal.gasto_boleto),
+        func.sum(ResumoMensal.quantidade_vendas),
+        func.sum(ResumoMensal.vendas_validas),
+        func.sum(ResumoMensal.dias_registrados),
+    ).where(
+        ResumoMensal.tipo_venda == (tipo_venda or TODOS_OS_TIPOS),
+        chave >= inicio.year * 12 + inicio.month,
+        chave < fim.year * 12 + fim.month,
+    )
+    receita_bruta, gasto_func, gasto_copos, gasto_boleto, quantidade, validas, dias = db.exec(query).one()
+    if not quantidade:
+        return None
+
+    return montar_relatorio(
+        receita_bruta=float(receita_bruta or 0.0),
+        gasto_func=float(gasto_func or 0.0),
+        gasto_copos=float(gasto_copos or 0.0),
+        gasto_boleto=float(gasto_boleto or 0.0),
+        vendas_validas=int(validas),
+        dias_registrados=int(dias),
+    )
+
+def _variacao(atual: float, anterior: float) -> Dict:
+    return {
+        "absoluta": round(atual - anterior, 2),
+        "percentual": round((atual / anterior - 1) * 100, 2) if anterior > 0 else None,
+    }
+
+def relatorio_anual(db: Session, ano: int) -> Optional[Dict]:
+    """
+    Totais do ano, os 12 meses (receita bruta e líquida, gastos e dias
+    registrados) e a variação em relação ao ano anterior, com uma consulta
+    ao ResumoMensal que traz as linhas mensais dos dois anos (até 24 linhas).
+    """
+    query = select(
+        ResumoMensal.ano,
+        ResumoMensal.mes,
+        ResumoMensal.receita_bruta,
+        ResumoMensal.gasto_funcionarios,
+        ResumoMensal.gasto_copos,
+        ResumoMensal.gasto_boleto,
+        ResumoMensal.vendas_validas,
+        ResumoMensal.dias_registrados,
+    ).where(ResumoMensal.tipo_venda == TODOS_OS_TIPOS, ResumoMensal.ano.in_([ano - 1, ano]))
+
+    # (ano, mes) -> [receita, funcionários, copos, boleto, vendas válidas, dias]
+    linhas = {(a, m): valores for a, m, *valores in db.exec(query)}
+    if not any(a == ano for a, _ in linhas):
+        return None
+
+    def relatorio(valores) -> Dict:
+        receita, gasto_func, gasto_copos, gasto_boleto, validas, dias = valores
+        return montar_relatorio(receita_bruta=receita, gasto_func=gasto_func, gasto_copos=gasto_copos,
+                                gasto_boleto=gasto_boleto, vendas_validas=validas, dias_registrados=dias)
+
+    def total_do_ano(a: int) -> Optional[Dict]:
+        meses = [valores for (b, _), valores in linhas.items() if b == a]
+        if not meses:
+            return None
+        total = relatorio([sum(coluna) for coluna in zip(*meses)])
+        total["gastos"] = round(total["gasto_funcionarios"] + total["gasto_copos"] + total["gasto_boleto"], 2)
+        return total
+
+    meses = []
+    for mes in range(1, 13):
+        item = relatorio(linhas.get((ano, mes), (0.0, 0.0, 0.0, 0.0, 0, 0)))
+        anterior = linhas.get((ano - 1, mes))
+        meses.append({
+            "mes": mes,
+            "receita_bruta": item["receita_bruta"],
+            "receita_liquida": item["receita_liquida"],
+            "gastos": round(item["gasto_funcionarios"] + item["gasto_copos"] + item["gasto_boleto"], 2),
+            "dias_registrados": item["dias_registrados"],
+            "receita_liquida_ano_anterior": relatorio(anterior)["receita_liquida"] if anterior else None,
+        })
+
+    total, total_anterior = total_do_ano(ano), total_do_ano(ano - 1)
+    variacao = None
+    if total_anterior:
+        variacao = {campo: _variacao(total[campo], total_anterior[campo])
+                    for campo in ("receita_bruta", "receita_liquida", "gastos", "dias_registrados")}
+    return {"ano": ano, "total": total, "meses": meses, "ano_anterior": total_anterior, "variacao": variacao}
+
+def reconstruir_resumo_mensal(db: Session) -> int:
+    """
+    Refaz todo o ResumoMensal a partir das vendas. Retorna quantos meses foram gravados.
+    """
+    conn = db.connection()
+    meses = {
+        (int(a), int(m))
+        for a, m in conn.execute(select(extract("year", Venda.data), extract("month", Venda.data)).distinct())
+    }
+    conn.execute(delete(ResumoMensal.__table__))
+    recalcular_meses(conn, meses)
+    db.commit()
+    return len(meses)
+
+def garantir_resumo_mensal(db: Session) -> None:
+    """
+    Na primeira subida com a tabela vazia (banco anterior ao ResumoMensal),
+    monta o resumo a partir das vendas já gravadas.
+    """
+    if db.exec(select(ResumoMensal.ano).limit(1)).first() is None and db.exec(select(Venda.id).limit(1)).first() is not None:
+        reconstruir_resumo_mensal(db)
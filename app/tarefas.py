@@ -0,0 +1,214 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from app.metricas import Histograma
+
+logger = logging.getLogger("app.tarefas")
+
+# Relatórios pesados (anual, comparativo) podem passar do tempo de resposta do
+# webhook do Twilio. Com RELATORIOS_EM_SEGUNDO_PLANO ativo, o webhook responde na
+# hora e um worker deste processo gera o relatório e o envia por mensagem ativa.
+
+# --- Envio de mensagens ---
+
+class EnviadorTwilio:
+    """
+    Envia a resposta pela API REST do Twilio (mensagem iniciada pelo servidor).
+    O SDK é carregado no primeiro envio.
+    """
+
+    def __init__(self, account_sid: Optional[str] = None, auth_token: Optional[str] = None, remetente: Optional[str] = None):
+        self.account_sid = account_sid or os.getenv("TWILIO_ACCOUNT_SID")
+        self.auth_token = auth_token or os.getenv("TWILIO_AUTH_TOKEN")
+        self.remetente = remetente or os.getenv("TWILIO_WHATSAPP_FROM")
+        self._cliente = None
+
+    def enviar(self, destinatario: str, texto: str) -> None:
+        if self._cliente is None:
+            from twilio.rest import Client
+            self._cliente = Client(self.account_sid, self.auth_token)
+        self._cliente.messages.create(from_=self.remetente, to=destinatario, body=texto)
+
+class EnviadorFalso:
+    """
+    Guarda as mensagens em memória no lugar de enviá-las (testes e desenvolvimento).
+    """
+
+    def __init__(self):
+        self.enviadas: List[Tuple[str, str]] = []
+
+    def enviar(self, destinatario: str, texto: str) -> None:
+        self.enviadas.append((destinatario, texto))
+
+# --- Fila de relatórios ---
+
+class Tarefa:
+    """
+    Relatório a gerar e enviar. `mensagem_falha` é enviada ao destinatário
+    quando todas as tentativas falham.
+    """
+
+    def __init__(self, nome: str, gerar: Callable[[], str], destinatario: str, mensagem_falha: Optional[str] = None):
+        self.nome = nome
+        self.gerar = gerar
+        self.destinatario = destinatario
+        self.mensagem_falha = mensagem_falha
+        self.tentativas = 0
+
+class FilaRelatorios:
+    """
+    Fila em memória com um pool de threads que gera cada relatório e envia o
+    resultado pelo `enviador`. Falhas (na geração ou no envio) são tentadas de
+    novo até `max_tentativas`, com espera crescente entre as tentativas.
+    Os workers sobem no primeiro enfileiramento; `parar` cancela as novas
+    tentativas ainda agendadas e as conta como falhas.
+    """
+
+    def __init__(self, enviador=None, workers: int = 2, max_tentativas: int = 3, atraso_base: float = 1.0):
+        self.enviador = enviador
+        self.workers = workers
+        self.max_tentativas = max_tentativas
+        self.atraso_base = atraso_base
+        self.duracao = Histograma()
+        self._fila: "queue.Queue[Optional[Tarefa]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._agendadas: Dict[Tarefa, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._ociosa = threading.Condition(self._lock)
+        self.pendentes = 0
+        self.em_execucao = 0
+        self.concluidas = 0
+        self.falhas = 0
+        self.novas_tentativas = 0
+
+    def _iniciar(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._trabalhar, name=f"fila-relatorios-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enfileirar(self, tarefa: Tarefa) -> None:
+        self._iniciar()
+        with self._lock:
+            self.pendentes += 1
+        self._fila.put(tarefa)
+
+    def _trabalhar(self) -> None:
+        while True:
+            tarefa = self._fila.get()
+            if tarefa is None:
+                return
+            self._executar(tarefa)
+
+    def _executar(self, tarefa: Tarefa) -> None:
+        with self._lock:
+            self.em_execucao += 1
+        tarefa.tentativas += 1
+        inicio = time.perf_counter()
+        try:
+            texto = tarefa.gerar()
+            self.enviador.enviar(tarefa.destinatario, texto)
+        except Exception as e:
+            logger.warning("Falha na tarefa '%s' (tentativa %d): %s", tarefa.nome, tarefa.tentativas, e)
+            if tarefa.tentativas < self.max_tentativas and self._agendar(tarefa):
+                return
+            self._avisar_falha(tarefa)
+            self._finalizar(falhou=True)
+        else:
+            self._finalizar(falhou=False)
+        finally:
+            self.duracao.observar((time.perf_counter() - inicio) * 1000)
+
+    def _avisar_falha(self, tarefa: Tarefa) -> None:
+        if tarefa.mensagem_falha is None:
+            return
+        try:
+            self.enviador.enviar(tarefa.destinatario, tarefa.mensagem_falha)
+        except Exception as e:
+            logger.warning("Não foi possível avisar a falha da tarefa '%s': %s", tarefa.nome, e)
+
+    def _agendar(self, tarefa: Tarefa) -> bool:
+        """
+        Agenda a nova tentativa da tarefa; devolve False se a fila já foi parada.
+        """
+        atraso = self.atraso_base * 2 ** (tarefa.tentativas - 1)
+        timer = threading.Timer(atraso, self._retomar, args=(tarefa,))
+        timer.daemon = True  # não segura o encerramento do processo
+        with self._lock:
+            if not self._threads:
+                return False
+            self.novas_tentativas += 1
+            self.em_execucao -= 1
+            self._agendadas[tarefa] = timer
+        timer.start()
+        return True
+
+    def _retomar(self, tarefa: Tarefa) -> None:
+        with self._lock:
+            if self._agendadas.pop(tarefa, None) is None:
+                return  # cancelada por parar()
+            if self._threads:
+                self._fila.put(tarefa)
+                return
+        self._finalizar(falhou=True, em_execucao=False)
+
+    def _finalizar(self, falhou: bool, em_execucao: bool = True) -> None:
+        with self._lock:
+            if em_execucao:
+                self.em_execucao -= 1
+            self.pendentes -= 1
+            if falhou:
+                self.falhas += 1
+            else:
+                self.concluidas += 1
+            if not self.pendentes:
+                self._ociosa.notify_all()
+
+    def aguardar(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera todas as tarefas terminarem (inclusive as novas tentativas).
+        """
+        with self._lock:
+            return self._ociosa.wait_for(lambda: not self.pendentes, timeout)
+
+    def parar(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+            agendadas, self._agendadas = self._agendadas, {}
+        for tarefa, timer in agendadas.items():
+            timer.cancel()
+            logger.warning("Nova tentativa da tarefa '%s' cancelada: fila parada", tarefa.nome)
+            self._finalizar(falhou=True, em_execucao=False)
+        for _ in threads:
+            self._fila.put(None)
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def estatisticas(self) -> Dict:
+        with self._lock:
+            dados = {
+                "profundidade": self._fila.qsize(),
+                "pendentes": self.pendentes,
+                "em_execucao": self.em_execucao,
+                "concluidas": self.concluidas,
+                "falhas": self.falhas,
+                "novas_tentativas": self.novas_tentativas,
+                "workers": len(self._threads),
+            }
+        dados["duracao"] = self.duracao.como_dict()
+        return dados
+
+def relatorios_em_segundo_plano() -> bool:
+    return os.getenv("RELATORIOS_EM_SEGUNDO_PLANO", "false").lower() in ("1", "true", "sim", "yes")
+
+fila_relatorios = FilaRelatorios(
+    enviador=EnviadorTwilio(),
+    workers=int(os.getenv("FILA_RELATORIOS_WORKERS", "2")),
+    max_tentativas=int(os.getenv("FILA_RELATORIOS_TENTATIVAS", "3")),
+)
@@ -0,0 +1,222 @@
+import csv
+import io
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, select
+from app.models import Venda, Produto, MovimentoEstoque, CustoMedioProduto
+from app import estoque
+
+# Regras de registro de venda (feira, barril_festas e boleto), usadas pelo
+# formulário (/registrar_venda) e pelo registro em lote (/vendas/lote).
+
+class ErroVenda(ValueError):
+    """
+    Dados de venda inválidos; a mensagem vai para quem registrou a venda.
+    """
+
+class DadosVenda(SQLModel):
+    # Campos como chegam do formulário ou de uma linha do lote
+    data: date
+    produto_id: int
+    tipo_venda: str
+    total: Optional[float] = None # Total pode ser None para barril_festas
+    cartao: Optional[float] = None
+    dinheiro: Optional[float] = None
+    pix: Optional[float] = None
+    custo_func: Optional[float] = None
+    custo_copos: Optional[float] = None
+    custo_boleto: Optional[float] = None
+    quantidade_barris_vendidos: Optional[float] = None # Para barril_festas
+
+# Índice único parcial das vendas de feira (uma por dia e produto), ver app/models.py
+INDICE_FEIRA = "uq_venda_feira_data_produto"
+
+def venda_de_feira_duplicada(erro: IntegrityError) -> bool:
+    """
+    Indica se a violação de integridade veio do índice único das vendas de
+    feira, e não de outra restrição (chave estrangeira, NOT NULL...). O
+    PostgreSQL informa o nome do índice; o SQLite, as colunas dele.
+    """
+    restricao = getattr(getattr(erro.orig, "diag", None), "constraint_name", None)
+    if restricao is not None:
+        return restricao == INDICE_FEIRA
+    mensagem = str(erro.orig)
+    return INDICE_FEIRA in mensagem or "UNIQUE constraint failed: venda.data, venda.produto_id, venda.tipo_venda" in mensagem
+
+def montar_venda(dados: DadosVenda, produto: Produto, custo_medio_barril: float = 0.0) -> Tuple[Venda, Optional[MovimentoEstoque]]:
+    """
+    Calcula lucro e baixa de estoque da venda e devolve a Venda e o movimento
+    de saída (None para boleto), sem gravar nada. `custo_medio_barril` só é
+    usado em barril_festas. Levanta ErroVenda se faltarem dados.
+    """
+    tipo_venda = dados.tipo_venda
+    movimento = None
+    custo_total_venda_barril = None
+
+    if tipo_venda == "feira":
+        if dados.total is None: raise ErroVenda("Total da venda é obrigatório para vendas de feira.")
+        venda_total_calculada = dados.total
+        lucro = dados.total - (dados.custo_func or 0.0) - (dados.custo_copos or 0.0) - (dados.custo_boleto or 0.0)
+        litros_vendidos = dados.total / produto.preco_venda_litro
+        barris_baixados = litros_vendidos / produto.volume_litros
+
+        # Movimento de saída por venda de feira
+        movimento = MovimentoEstoque(
+            produto_id=produto.id,
+            tipo_movimento="saida_venda",
+            quantidade=barris_baixados,
+            custo_unitario=None,
+            data_movimento=dados.data
+        )
+
+    elif tipo_venda == "barril_festas":
+        if dados.quantidade_barris_vendidos is None: raise ErroVenda("Quantidade de barris vendidos é obrigatória para vendas de barril_festas.")
+
+        venda_total_calculada = dados.quantidade_barris_vendidos * (produto.preco_venda_barril_fechado or 0.0)
+        barris_baixados = dados.quantidade_barris_vendidos
+
+        custo_total_venda_barril = barris_baixados * custo_medio_barril
+        lucro = venda_total_calculada - custo_total_venda_barril
+
+        # Movimento de saída por venda de barril_festas
+        movimento = MovimentoEstoque(
+            produto_id=produto.id,
+            tipo_movimento="saida_venda_barril",
+            quantidade=barris_baixados,
+            custo_unitario=custo_medio_barril, # Opcional: registrar o custo médio da baixa
+            data_movimento=dados.data
+        )
+
+    elif tipo_venda == "boleto":
+        venda_total_calculada = 0.0
+        barris_baixados = 0.0
+        lucro = -(dados.custo_boleto or 0.0) # Lucro é o negativo do custo do boleto
+
+    else:
+        raise ErroVenda("Tipo de venda inválido. Use 'feira', 'barril_festas' ou 'boleto'.")
+
+    venda = Venda(
+        data=dados.data,
+        produto_id=produto.id,
+        tipo_venda=tipo_venda,
+        total=venda_total_calculada,
+        cartao=dados.cartao,
+        dinheiro=dados.dinheiro,
+        pix=dados.pix,
+        custo_func=dados.custo_func,
+        custo_copos=dados.custo_copos,
+        custo_boleto=dados.custo_boleto,
+        lucro=lucro,
+        dia_semana=dados.data.strftime('%A'),
+        quantidade_barris_vendidos=barris_baixados,
+        preco_venda_litro_registrado=produto.preco_venda_litro if tipo_venda == "feira" else None,
+        custo_total_venda=custo_total_venda_barril
+    )
+    return venda, movimento
+
+# --- Registro em lote ---
+
+def linhas_do_csv(texto: str) -> List[Dict]:
+    """
+    Linhas do CSV com cabeçalho (mesmos nomes de campo do JSON). Células
+    vazias viram None; números no formato brasileiro ("1.250,50") são aceitos.
+    """
+    linhas = []
+    for linha in csv.DictReader(io.StringIO(texto.lstrip("\ufeff"))):
+        registro = {}
+        for campo, valor in linha.items():
+            if campo is None:
+                continue
+            valor = (valor or "").strip()
+            if campo not in ("data", "tipo_venda") and "," in valor:
+                valor = valor.replace(".", "").replace(",", ".")  # "1.250,50" -> "1250.50"
+            registro[campo.strip()] = valor or None
+        linhas.append(registro)
+    return linhas
+
+def _mensagem_validacao(erro: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in erro.errors())
+
+def _custos_medios(db: Session, produto_ids: List[int]) -> Dict[int, float]:
+    # Uma consulta para todos; produtos ainda sem acumulado são criados pelo razão
+    if not produto_ids:
+        return {}
+    custos = {c.produto_id: c.custo_medio for c in db.exec(
+        select(CustoMedioProduto).where(CustoMedioProduto.produto_id.in_(produto_ids))).all()}
+    for produto_id in set(produto_ids) - set(custos):
+        custos[produto_id] = estoque.obter_custo_medio_barril(db, produto_id)
+    return custos
+
+def _feiras_existentes(db: Session, chaves: List[Tuple[date, int]]) -> set:
+    if not chaves:
+        return set()
+    datas = {d for d, _ in chaves}
+    produtos = {p for _, p in chaves}
+    existentes = db.exec(
+        select(Venda.data, Venda.produto_id).where(
+            Venda.tipo_venda == "feira", Venda.data.in_(datas), Venda.produto_id.in_(produtos))
+    ).all()
+    return {(d, p) for d, p in existentes}
+
+def registrar_lote(db: Session, linhas: List[Dict]) -> Tuple[bool, List[Dict]]:
+    """
+    Valida todas as linhas antes de gravar qualquer uma e, se nenhuma tiver
+    erro, grava vendas e movimentos em uma única transação (um flush com os
+    INSERTs em lote, passando pelos listeners de saldo, resumo e cache).
+    Os produtos, custos médios e vendas de feira já existentes são lidos com
+    uma consulta cada. Devolve (gravou, resultado por linha).
+    """
+    resultados: List[Dict] = [{"linha": i} for i in range(1, len(linhas) + 1)]
+    dados: List[Optional[DadosVenda]] = []
+    for resultado, linha in zip(resultados, linhas):
+        try:
+            dados.append(DadosVenda.model_validate(linha))
+        except ValidationError as e:
+            dados.append(None)
+            resultado["erro"] = _mensagem_validacao(e)
+
+    validos = [d for d in dados if d is not None]
+    produto_ids = sorted({d.produto_id for d in validos})
+    produtos = {p.id: p for p in db.exec(select(Produto).where(Produto.id.in_(produto_ids))).all()} if produto_ids else {}
+    custos = _custos_medios(db, sorted({d.produto_id for d in validos if d.tipo_venda == "barril_festas" and d.produto_id in produtos}))
+    chaves_feira = [(d.data, d.produto_id) for d in validos if d.tipo_venda == "feira"]
+    existentes = _feiras_existentes(db, chaves_feira)
+
+    vendas: List[Tuple[Dict, Venda]] = []
+    movimentos: List[MovimentoEstoque] = []
+    feiras_no_lote = set()
+    for resultado, item in zip(resultados, dados):
+        if item is None:
+            continue
+        produto = produtos.get(item.produto_id)
+        if produto is None:
+            resultado["erro"] = "Produto não encontrado."
+            continue
+        if item.tipo_venda == "feira":
+            chave = (item.data, item.produto_id)
+            if chave in existentes or chave in feiras_no_lote:
+                resultado["erro"] = "Já existe uma venda de feira registrada para este produto nesta data."
+                continue
+            feiras_no_lote.add(chave)
+        try:
+            venda, movimento = montar_venda(item, produto, custos.get(item.produto_id, 0.0))
+        except ErroVenda as e:
+            resultado["erro"] = str(e)
+            continue
+        vendas.append((resultado, venda))
+        if movimento is not None:
+            movimentos.append(movimento)
+
+    if any("erro" in r for r in resultados):
+        for resultado in resultados:
+            resultado["ok"] = "erro" not in resultado
+        return False, resultados
+
+    db.add_all([venda for _, venda in vendas] + movimentos)
+    db.flush()
+    for resultado, venda in vendas:
+        resultado.update(ok=True, venda_id=venda.id, tipo_venda=venda.tipo_venda, total=venda.total, lucro=venda.lucro)
+    db.commit()
+    return True, resultados
@@ -0,0 +1,43 @@
+"""
+Latência por mensagem para interpretar o mês/ano dos comandos do WhatsApp:
+dateparser.parse x parser rápido (sem cache e com cache).
+
+Uso: python benchmarks/bench_datas.py [repeticoes]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.datas import mes_ano_rapido, interpretar_mes_ano
+
+MENSAGENS = ["5 2025", "maio 2025", "05/2025", "março 2025", "dez 2024", "julho de 2025", "11/2024", "fev 2025"]
+
+def por_mensagem_us(funcao, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for mensagem in MENSAGENS:
+            funcao(mensagem)
+    return (time.perf_counter() - inicio) / (repeticoes * len(MENSAGENS)) * 1e6
+
+def sem_cache(mensagem):
+    mes_ano_rapido.cache_clear()
+    return interpretar_mes_ano(mensagem)
+
+def main(repeticoes: int = 200) -> None:
+    inicio = time.perf_counter()
+    import dateparser
+    dateparser.parse("maio 2025", languages=['pt'])  # carrega os dados de idioma
+    print(f"import + primeira chamada do dateparser: {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    resultados = {
+        "dateparser.parse": por_mensagem_us(lambda m: dateparser.parse(m, languages=['pt']), repeticoes),
+        "parser rápido (sem cache)": por_mensagem_us(sem_cache, repeticoes),
+        "parser rápido (com cache)": por_mensagem_us(interpretar_mes_ano, repeticoes),
+    }
+    base = resultados["dateparser.parse"]
+    for nome, us in resultados.items():
+        print(f"{nome:28s} {us:10.1f} µs/mensagem  ({base / us:.0f}x)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
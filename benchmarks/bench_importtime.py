@@ -0,0 +1,55 @@
+"""
+Tempo de importação do app.main medido com `python -X importtime`, em um
+processo novo a cada rodada (como na subida de um container no Railway).
+Mostra o tempo total e os módulos de primeiro nível mais pesados.
+
+Uso: python benchmarks/bench_importtime.py [rodadas] [modulo]
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from statistics import median
+from typing import Dict
+
+RAIZ = Path(__file__).resolve().parent.parent
+# "import time:  self [us] | cumulative | imported package"
+_LINHA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+def importtime(modulo: str) -> Dict[str, int]:
+    """
+    Tempo acumulado (µs) do módulo e de cada import feito diretamente por ele.
+    """
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, env=os.environ.copy(), capture_output=True, text=True, check=True,
+    ).stderr
+    tempos, filhos = {}, {}
+    for linha in saida.splitlines():
+        encontrado = _LINHA.match(linha)
+        if not encontrado:
+            continue
+        nivel, nome, acumulado = len(encontrado.group(3)), encontrado.group(4), int(encontrado.group(2))
+        # A saída lista os filhos (três espaços) antes do pai (um espaço)
+        if nivel == 3:
+            filhos[nome] = acumulado
+        elif nivel == 1:
+            if nome == modulo:
+                tempos = {nome: acumulado, **filhos}
+            filhos = {}
+    return tempos
+
+def main(rodadas: int = 5, modulo: str = "app.main") -> None:
+    medicoes = [importtime(modulo) for _ in range(rodadas)]
+    totais = [m[modulo] for m in medicoes]
+    print(f"import {modulo}: mediana {median(totais) / 1000:.0f} ms, melhor {min(totais) / 1000:.0f} ms ({rodadas} rodadas)")
+
+    # Os imports mais pesados feitos pelo módulo (a partir da melhor rodada)
+    melhor = medicoes[totais.index(min(totais))]
+    print("Mais pesados (acumulado):")
+    for nome, micros in sorted(melhor.items(), key=lambda item: -item[1])[1:11]:
+        print(f"  {nome:40s} {micros / 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5, sys.argv[2] if len(sys.argv) > 2 else "app.main")
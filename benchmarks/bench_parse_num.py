@@ -0,0 +1,77 @@
+"""
+Compara a conversão das colunas de dinheiro do clean_master:
+apply(parse_num) célula a célula x parse_num_vetorizado.
+
+Uso: python benchmarks/bench_parse_num.py [linhas]
+"""
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from etl.clean_data import parse_num, parse_num_vetorizado
+
+def _formato_brasileiro(valor: float) -> str:
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def coluna_numerica(linhas: int, rng) -> pd.Series:
+    """
+    Coluna que o read_excel já entrega como float64 (só números e vazios).
+    """
+    valores = rng.uniform(0, 20000, linhas).round(2)
+    valores[rng.random(linhas) < 0.08] = np.nan
+    return pd.Series(valores)
+
+def coluna_planilha(linhas: int, rng, distintos: bool = False) -> pd.Series:
+    """
+    Coluna object como a da planilha: textos "1.234,56", números nativos,
+    células vazias e um pouco de lixo digitado à mão. Os valores de venda são
+    múltiplos do preço do copo (R$ 12,50); com `distintos`, cada célula tem um
+    valor diferente (pior caso para o agrupamento por valor).
+    """
+    if distintos:
+        valores = rng.uniform(0, 20000, linhas).round(2)
+    else:
+        valores = rng.integers(0, 1600, linhas) * 12.5
+    tipo = rng.choice(["texto", "numero", "vazio", "lixo"], size=linhas, p=[0.6, 0.3, 0.08, 0.02])
+    celulas = []
+    for valor, t in zip(valores, tipo):
+        if t == "texto":
+            celulas.append(_formato_brasileiro(valor))
+        elif t == "numero":
+            celulas.append(float(valor))
+        elif t == "vazio":
+            celulas.append(None)
+        else:
+            celulas.append("R$ -")
+    return pd.Series(celulas, dtype=object)
+
+def cronometrar(funcao, repeticoes: int = 5) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+def main(linhas: int = 100_000) -> None:
+    rng = np.random.default_rng(42)
+    cenarios = {
+        "coluna numérica (float64)": coluna_numerica(linhas, rng),
+        "coluna da planilha (texto misto)": coluna_planilha(linhas, rng),
+        "texto misto, todos distintos": coluna_planilha(linhas, rng, distintos=True),
+    }
+    print(f"{linhas} linhas (melhor de 5)")
+    for nome, coluna in cenarios.items():
+        assert coluna.apply(parse_num).tolist() == parse_num_vetorizado(coluna).tolist()
+        tempo_apply = cronometrar(lambda: coluna.apply(parse_num))
+        tempo_vetorizado = cronometrar(lambda: parse_num_vetorizado(coluna))
+        print(f"- {nome}")
+        print(f"    apply(parse_num):     {tempo_apply * 1000:8.1f} ms")
+        print(f"    parse_num_vetorizado: {tempo_vetorizado * 1000:8.1f} ms")
+        print(f"    ganho: {tempo_apply / tempo_vetorizado:.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
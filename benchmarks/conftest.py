@@ -0,0 +1,42 @@
+# benchmarks/conftest.py
+#
+# Suíte de desempenho (pytest-benchmark). Roda à parte dos testes funcionais:
+#   python -m pytest benchmarks --benchmark-autosave
+# O banco é um SQLite temporário preenchido por gerar_dados.gerar_historico;
+# BENCH_ANOS (ex.: "2019-2024") controla o tamanho do histórico.
+
+import os
+import tempfile
+import pytest
+from sqlmodel import Session, SQLModel
+
+_banco_temporario = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_banco_temporario.name}")
+for variavel in ("TWILIO_AUTH_TOKEN", "FORM_USER", "FORM_PASSWORD"):
+    os.environ.setdefault(variavel, "benchmark")
+
+from app.database import create_missing_indexes, get_engine, init_engine
+from benchmarks.gerar_dados import gerar_historico
+
+def _anos():
+    inicial, _, final = os.getenv("BENCH_ANOS", "2022-2023").partition("-")
+    return int(inicial), int(final or inicial)
+
+@pytest.fixture(scope="session")
+def anos():
+    return _anos()
+
+@pytest.fixture(scope="session")
+def engine(anos):
+    init_engine(os.environ["DATABASE_URL"])
+    engine = get_engine()
+    SQLModel.metadata.create_all(engine)
+    create_missing_indexes(engine)
+    with Session(engine) as session:
+        gerar_historico(session, *anos)
+    return engine
+
+@pytest.fixture
+def db(engine):
+    with Session(engine) as session:
+        yield session
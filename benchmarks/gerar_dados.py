@@ -0,0 +1,194 @@
+"""
+Gera um histórico sintético de vendas e estoque (Produto, MovimentoEstoque e
+Venda) para testes de desempenho, seguindo as mesmas regras do formulário:
+feiras de quinta a domingo com baixa de estoque, barris fechados para festas,
+boleto mensal e reposições semanais. Também monta planilhas no formato do
+Google Sheets (para o clean_master) e um master.csv (para o load).
+
+Uso: python benchmarks/gerar_dados.py DATABASE_URL [ano_inicial] [ano_final]
+"""
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+import pandas as pd
+from sqlmodel import Session, SQLModel, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.models import MovimentoEstoque, Produto, Venda
+from app import estoque  # mantém SaldoEstoque e CustoMedioProduto durante a carga
+from app import resumo  # mantém o ResumoMensal durante a carga
+
+# (nome, preço do litro, preço do barril fechado, volume em litros, custo do barril)
+PRODUTOS = [
+    ("Chopp Pilsen 50L", 20.0, 500.0, 50.0, 280.0),
+    ("Chopp Pilsen 30L", 20.0, 320.0, 30.0, 180.0),
+    ("Chopp IPA 30L", 28.0, 450.0, 30.0, 260.0),
+    ("Chopp Vinho 30L", 25.0, 400.0, 30.0, 230.0),
+    ("Chopp Black 50L", 26.0, 650.0, 50.0, 340.0),
+]
+
+# Chance de ter feira em cada dia da semana (segunda = 0)
+CHANCE_FEIRA = {0: 0.0, 1: 0.05, 2: 0.1, 3: 0.6, 4: 0.9, 5: 0.95, 6: 0.9}
+
+def _formato_brasileiro(valor: float) -> str:
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _dias(ano_inicial: int, ano_final: int):
+    dia = date(ano_inicial, 1, 1)
+    while dia.year <= ano_final:
+        yield dia
+        dia += timedelta(days=1)
+
+def _cadastrar_produtos(session: Session) -> List[Produto]:
+    produtos = []
+    for nome, preco_litro, preco_barril, volume, _ in PRODUTOS:
+        produto = session.exec(select(Produto).where(Produto.nome == nome)).first()
+        if produto is None:
+            produto = Produto(nome=nome, preco_venda_litro=preco_litro,
+                              preco_venda_barril_fechado=preco_barril, volume_litros=volume)
+            session.add(produto)
+        produtos.append(produto)
+    session.commit()
+    return produtos
+
+def _venda_feira(rng: random.Random, dia: date, produto: Produto) -> Tuple[Venda, MovimentoEstoque]:
+    # Sábado e domingo vendem mais; o verão (dez-fev) também
+    fator = (1.4 if dia.weekday() >= 5 else 1.0) * (1.3 if dia.month in (12, 1, 2) else 1.0)
+    total = round(rng.uniform(600, 2500) * fator / 12.5) * 12.5
+    cartao = round(total * rng.uniform(0.3, 0.6), 2)
+    pix = round(total * rng.uniform(0.1, 0.4), 2)
+    dinheiro = round(total - cartao - pix, 2)
+    custo_func = rng.choice([150.0, 200.0, 300.0])
+    custo_copos = round(total / 12.5 * 0.35, 2)
+    venda = Venda(
+        data=dia, produto_id=produto.id, tipo_venda="feira", dia_semana=dia.strftime('%A'),
+        total=total, cartao=cartao, dinheiro=dinheiro, pix=pix,
+        custo_func=custo_func, custo_copos=custo_copos,
+        lucro=total - custo_func - custo_copos,
+        quantidade_barris_vendidos=total / produto.preco_venda_litro / produto.volume_litros,
+        preco_venda_litro_registrado=produto.preco_venda_litro,
+    )
+    saida = MovimentoEstoque(produto_id=produto.id, tipo_movimento="saida_venda",
+                             quantidade=venda.quantidade_barris_vendidos, data_movimento=dia)
+    return venda, saida
+
+def gerar_historico(session: Session, ano_inicial: int = 2022, ano_final: int = 2023,
+                    produtos_por_feira: int = 2, semente: int = 42) -> Dict[str, int]:
+    """
+    Grava o histórico sintético de `ano_inicial` a `ano_final` (inclusive) e
+    devolve quantos registros de cada tipo foram criados. Os dados dependem só
+    da semente. Grava pelo ORM, um commit por mês, para que os listeners mantenham
+    as tabelas materializadas como em produção.
+    """
+    rng = random.Random(semente)
+    produtos = _cadastrar_produtos(session)
+    custos = {p.id: custo for p, (*_, custo) in zip(produtos, PRODUTOS)}
+    contagem = {"produtos": len(produtos), "vendas": 0, "movimentos": 0}
+
+    for dia in _dias(ano_inicial, ano_final):
+        registros = []
+        # Reposição toda segunda-feira
+        if dia.weekday() == 0:
+            for produto in produtos:
+                registros.append(MovimentoEstoque(
+                    produto_id=produto.id, tipo_movimento="entrada", quantidade=float(rng.randint(2, 6)),
+                    custo_unitario=round(custos[produto.id] * rng.uniform(0.95, 1.1), 2), data_movimento=dia,
+                ))
+        if rng.random() < CHANCE_FEIRA[dia.weekday()]:
+            for produto in rng.sample(produtos, produtos_por_feira):
+                registros.extend(_venda_feira(rng, dia, produto))
+        if rng.random() < 0.1:
+            produto = rng.choice(produtos)
+            barris = float(rng.randint(1, 3))
+            custo = barris * custos[produto.id]
+            total = barris * produto.preco_venda_barril_fechado
+            registros.append(Venda(
+                data=dia, produto_id=produto.id, tipo_venda="barril_festas", dia_semana=dia.strftime('%A'),
+                total=total, pix=total, lucro=total - custo,
+                quantidade_barris_vendidos=barris, custo_total_venda=custo,
+            ))
+            registros.append(MovimentoEstoque(produto_id=produto.id, tipo_movimento="saida_venda_barril",
+                                              quantidade=barris, custo_unitario=custos[produto.id], data_movimento=dia))
+        if dia.day == 10:
+            registros.append(Venda(
+                data=dia, produto_id=produtos[0].id, tipo_venda="boleto", dia_semana=dia.strftime('%A'),
+                total=0.0, custo_boleto=350.0, lucro=-350.0, quantidade_barris_vendidos=0.0,
+            ))
+        if dia.day == 20 and rng.random() < 0.3:
+            registros.append(MovimentoEstoque(produto_id=rng.choice(produtos).id, tipo_movimento="saida_manual",
+                                              quantidade=0.5, data_movimento=dia))
+
+        session.add_all(registros)
+        contagem["vendas"] += sum(isinstance(r, Venda) for r in registros)
+        contagem["movimentos"] += sum(isinstance(r, MovimentoEstoque) for r in registros)
+        if (dia + timedelta(days=1)).day == 1:
+            session.commit()
+    session.commit()
+    return contagem
+
+def planilhas_sheets(linhas: int = 1000, abas: int = 3, semente: int = 42) -> Dict[str, pd.DataFrame]:
+    """
+    Abas como o pd.read_excel entrega a planilha do Google Sheets: cabeçalhos
+    com acento e espaços, datas dd/mm/aaaa e valores misturando texto
+    "1.234,56", números e células vazias. Inclui uma aba que não é de registros.
+    """
+    rng = random.Random(semente)
+    planilhas = {"Resumo": pd.DataFrame({"Mês": ["Janeiro"], "Total": [0.0]})}
+    inicio = date(2020, 1, 1)
+    for aba in range(abas):
+        colunas: Dict[str, list] = {nome: [] for nome in (
+            "Data", "Dia da Semana", "Vendas Total Feira", "Cartão Feira", "Dinheiro Feira", "Pix Feira",
+            "Custo Funcionários", "Custo Copos", "Boleto Klaro", "Lucro Feira")}
+        for i in range(linhas):
+            dia = inicio + timedelta(days=aba * linhas + i)
+            total = round(rng.uniform(600, 2500) / 12.5) * 12.5
+            valores = [total, total * 0.5, total * 0.2, total * 0.3, 200.0, total * 0.03, 0.0, total * 0.8]
+            celulas = []
+            for valor in valores:
+                sorteio = rng.random()
+                if sorteio < 0.6:
+                    celulas.append(_formato_brasileiro(valor))
+                elif sorteio < 0.92:
+                    celulas.append(round(valor, 2))
+                else:
+                    celulas.append(None)
+            colunas["Data"].append(dia.strftime("%d/%m/%Y"))
+            colunas["Dia da Semana"].append(dia.strftime('%A'))
+            for nome, celula in zip(list(colunas)[2:], celulas):
+                colunas[nome].append(celula)
+        planilhas[f"Registros_{2020 + aba}"] = pd.DataFrame(colunas)
+    return planilhas
+
+def master_csv(caminho: Path, linhas: int = 1000, semente: int = 42) -> Path:
+    """
+    Grava um master.csv já limpo (saída do clean_master) com `linhas` dias.
+    """
+    rng = random.Random(semente)
+    registros = []
+    for i in range(linhas):
+        total = round(rng.uniform(600, 2500) / 12.5) * 12.5
+        registros.append({
+            "data": (date(2020, 1, 1) + timedelta(days=i)).isoformat(),
+            "total": total, "cartao": total * 0.5, "dinheiro": total * 0.2, "pix": total * 0.3,
+            "custo_func": 200.0, "custo_copos": round(total * 0.03, 2), "custo_boleto": 0.0,
+            "lucro": round(total * 0.8, 2),
+        })
+    pd.DataFrame(registros).to_csv(caminho, index=False)
+    return caminho
+
+def main(database_url: str, ano_inicial: int = 2022, ano_final: int = 2023) -> None:
+    from app.database import create_missing_indexes, get_engine, init_engine
+    init_engine(database_url)
+    SQLModel.metadata.create_all(get_engine())
+    create_missing_indexes()
+    with Session(get_engine()) as session:
+        contagem = gerar_historico(session, ano_inicial, ano_final)
+    print(f"{contagem['produtos']} produtos, {contagem['vendas']} vendas e "
+          f"{contagem['movimentos']} movimentos de {ano_inicial} a {ano_final}.")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1], *(int(a) for a in sys.argv[2:4]))
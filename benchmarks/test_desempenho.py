@@ -0,0 +1,79 @@
+from datetime import date
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from app.cache import cache_relatorios
+from app.consultas import serie_temporal
+from app.logic import calcular_relatorio_geral
+from app.main import app, get_report_data, _get_estoque_logic
+from app.models import Venda
+from etl import clean_data, load_to_db
+from benchmarks.gerar_dados import master_csv, planilhas_sheets
+
+# Relatórios medidos sem cache: o cache é limpo antes de cada rodada
+def _sem_cache(benchmark, funcao, *args, rodadas: int = 30):
+    return benchmark.pedantic(funcao, args=args, setup=cache_relatorios.limpar, rounds=rodadas, iterations=1)
+
+def test_calcular_relatorio_geral(benchmark, db: Session, anos):
+    ano = anos[1]
+    vendas = db.exec(select(Venda).where(Venda.data >= date(ano, 1, 1), Venda.data < date(ano + 1, 1, 1))).all()
+    relatorio = benchmark(calcular_relatorio_geral, vendas)
+    assert relatorio["receita_bruta"] > 0
+
+@pytest.mark.parametrize("periodo", ["mes", "ano", "intervalo"])
+def test_get_report_data(benchmark, db: Session, anos, periodo):
+    ano = anos[1]
+    inicio, fim = {
+        "mes": (date(ano, 7, 1), date(ano, 8, 1)),
+        "ano": (date(ano, 1, 1), date(ano + 1, 1, 1)),
+        "intervalo": (date(ano, 3, 15), date(ano, 9, 15)),  # fora do ResumoMensal: agrega as vendas
+    }[periodo]
+    relatorio = _sem_cache(benchmark, get_report_data, inicio, fim, db)
+    assert relatorio["receita_bruta"] > 0
+
+def test_get_estoque_logic(benchmark, db: Session):
+    estoque = benchmark(_get_estoque_logic, db)
+    assert "Chopp Pilsen 50L" in estoque
+
+@pytest.mark.parametrize("intervalo", ["dia", "semana", "mes"])
+def test_serie_temporal(benchmark, db: Session, anos, intervalo):
+    # Todo o histórico gerado em uma consulta
+    serie = benchmark(serie_temporal, db, date(anos[0], 1, 1), date(anos[1] + 1, 1, 1), intervalo, "tipo_venda")
+    assert serie["periodo"]
+
+COMANDOS = [
+    "relatorio julho {ano}",
+    "relatorio anual {ano}",
+    "comparar 6 {ano} 7 {ano}",
+    "melhores dias 7 {ano}",
+    "estoque",
+    "relatorio barril julho {ano}",
+    "ajuda",
+]
+
+@pytest.fixture(scope="module")
+def cliente(engine):
+    with patch("twilio.request_validator.RequestValidator.validate", return_value=True):
+        with TestClient(app) as cliente:
+            yield cliente
+
+@pytest.mark.parametrize("comando", COMANDOS, ids=lambda c: c.replace(" {ano}", ""))
+def test_webhook(benchmark, cliente: TestClient, anos, comando):
+    # Sem MessageSid: cada chamada passa por validação, roteamento, consulta e TwiML
+    dados = {"Body": comando.format(ano=anos[1]), "From": "whatsapp:+5511999990000"}
+    resposta = _sem_cache(benchmark, lambda: cliente.post("/whatsapp/webhook", data=dados))
+    assert resposta.status_code == 200
+
+def test_clean_master(benchmark, monkeypatch, tmp_path):
+    planilhas = planilhas_sheets(linhas=2000, abas=3)
+    # Cada rodada recebe cópias: o clean_master renomeia as colunas no lugar
+    monkeypatch.setattr(clean_data.pd, "read_excel", lambda *args, **kwargs: {aba: df.copy() for aba, df in planilhas.items()})
+    saida = tmp_path / "master.csv"
+    benchmark(clean_data.clean_master, str(saida))
+    assert saida.exists()
+
+def test_load(benchmark, engine, tmp_path):
+    # Primeira rodada insere; as seguintes exercitam o caminho de atualização do upsert
+    csv = master_csv(tmp_path / "master.csv", linhas=2000)
+    benchmark.pedantic(load_to_db.load, args=(csv,), rounds=5, iterations=1)
@@ -1,9 +1,40 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 SHEETS_XLSX_URL = (
     "https://docs.google.com/spreadsheets/d/10n60nd4cLS5iRk3gz31q6UG80OWJSvYeDC0JW6wLDpc/export?format=xlsx")
 
+def parse_num(s):
+    # se for NaN do pandas, já zera
+    if pd.isna(s):
+        return 0.0
+    # se for int ou float _não_ NaN, retorna direto
+    if isinstance(s, (int, float)):
+        return float(s)
+    # senão, é string: remove milhar e ajusta vírgula
+    s = str(s).strip().replace(".", "").replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+def parse_num_vetorizado(serie: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de parse_num para uma coluna inteira: mesmo resultado
+    célula a célula ("1.234,56" -> 1234.56, números nativos mantidos, NaN -> 0.0).
+    Colunas numéricas são convertidas direto com astype. Colunas de texto são
+    agrupadas por valor distinto (pd.factorize): parse_num roda uma vez por valor
+    e o resultado é espalhado de volta pelos códigos.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float).fillna(0.0)
+
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+    valores = np.fromiter((parse_num(v) for v in unicos), dtype=float, count=len(unicos))
+    # Código -1 (célula vazia/NaN) aponta para o 0.0 acrescentado no fim
+    return pd.Series(np.append(valores, 0.0)[codigos], index=serie.index, dtype=float)
+
 def clean_master(output_path="master.csv"):
     # Le todas as abas do sheets
     all_sheets: dict[str, pd.DataFrame] = pd.read_excel(
@@ -63,23 +94,8 @@ def clean_master(output_path="master.csv"):
         "custo_func", "custo_copos", "custo_boleto"
     ]
 
-    def parse_num(s):
-        # se for NaN do pandas, já zera
-        if pd.isna(s):
-            return 0.0
-        # se for int ou float _não_ NaN, retorna direto
-        if isinstance(s, (int, float)):
-            return float(s)
-        # senão, é string: remove milhar e ajusta vírgula
-        s = str(s).strip().replace(".", "").replace(",", ".")
-        try:
-            return float(s)
-        except ValueError:
-            return 0.0
-        
-
     for col in campos_num:
-        master[col] = master[col].apply(parse_num)
+        master[col] = parse_num_vetorizado(master[col])
 
     # exporta o csv limpo
     out = Path(__file__).parent.parent / output_path
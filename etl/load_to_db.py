@@ -1,17 +1,96 @@
+import os
 from pathlib import Path
+from typing import Tuple
 import pandas as pd
-from sqlalchemy import delete
+from dotenv import load_dotenv
 from sqlmodel import Session, select
-from app.database import engine, init_db
+from app.database import init_engine, get_engine, create_db_and_tables, create_missing_indexes, insert_do_dialeto
 from app.models import Venda, Produto # Importa Produto
+from app import resumo  # mantém o ResumoMensal dos meses carregados
+from app import cache  # invalida os meses alterados no cache de relatórios deste processo
 
 # Caminho para o CSV mestre
 BASE_DIR = Path(__file__).resolve().parent.parent
 MASTER_CSV = BASE_DIR / "master.csv"
 
-def load():
+# Linhas por comando INSERT ... ON CONFLICT (cada linha usa ~13 parâmetros)
+TAMANHO_LOTE = 1000
+
+# Campos numéricos vindos da planilha; ausentes ou vazios viram 0.0
+CAMPOS_NUMERICOS = ["total", "cartao", "dinheiro", "pix", "custo_func", "custo_copos", "custo_boleto", "lucro"]
+
+# Campos regravados quando a venda de feira do dia já existe
+CAMPOS_ATUALIZADOS = ["dia_semana", *CAMPOS_NUMERICOS, "observacoes"]
+
+def _registros_de_feira(df: pd.DataFrame, produto_id: int) -> list:
+    """
+    Converte o master.csv nos registros de Venda de 'feira', já com os valores
+    padrão do ETL. Datas repetidas ficam com a última linha, como no upsert linha a linha.
+    """
+    df = df.dropna(subset=["data"]).drop_duplicates(subset=["data"], keep="last")
+    registros = pd.DataFrame({"data": df["data"]})
+    for campo in CAMPOS_NUMERICOS:
+        registros[campo] = df[campo].fillna(0.0).astype(float) if campo in df else 0.0
+    # Sem o dia da semana na planilha, usa o mesmo formato do formulário (strftime('%A'))
+    dia_semana = df["dia_da_semana"] if "dia_da_semana" in df else pd.Series(None, index=df.index, dtype=object)
+    registros["dia_semana"] = dia_semana.where(dia_semana.notna(), df["data"].map(lambda d: d.strftime('%A')))
+    observacoes = df["observacoes"] if "observacoes" in df else pd.Series(None, index=df.index, dtype=object)
+    registros["observacoes"] = observacoes.astype(object).where(observacoes.notna(), None)
+    registros["tipo_venda"] = "feira" # Define o tipo para vendas do ETL
+    registros["produto_id"] = produto_id
+    return registros.to_dict("records")
+
+def upsert_vendas_feira(sess: Session, df: pd.DataFrame, produto_id: int) -> Tuple[int, int]:
+    """
+    Grava as vendas de 'feira' do DataFrame com um INSERT ... ON CONFLICT DO UPDATE
+    por lote, usando a chave única (data, produto_id, tipo_venda='feira').
+    Não faz commit. Retorna (inseridos, atualizados).
+    """
+    total_linhas = int(df["data"].notna().sum())
+    registros = _registros_de_feira(df, produto_id)
+    insert = insert_do_dialeto(sess.get_bind().dialect.name)
+    tabela = Venda.__table__
+
+    registros_inseridos = 0
+    for inicio in range(0, len(registros), TAMANHO_LOTE):
+        lote = registros[inicio:inicio + TAMANHO_LOTE]
+        datas = [r["data"] for r in lote]
+
+        # Uma consulta por lote só para separar inseridos de atualizados
+        existentes = sess.exec(
+            select(Venda.data).where(
+                Venda.produto_id == produto_id,
+                Venda.tipo_venda == 'feira',
+                Venda.data.in_(datas),
+            )
+        ).all()
+        registros_inseridos += len(lote) - len(existentes)
+
+        stmt = insert(tabela).values(lote)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.data, tabela.c.produto_id, tabela.c.tipo_venda],
+            index_where=tabela.c.tipo_venda == 'feira',
+            set_={campo: stmt.excluded[campo] for campo in CAMPOS_ATUALIZADOS},
+        )
+        sess.execute(stmt)
+
+    # O insert em lote não passa pelos eventos do ORM: atualiza o resumo e o cache aqui
+    datas = [r["data"] for r in registros]
+    resumo.recalcular_meses(sess.connection(), {(d.year, d.month) for d in datas})
+    cache.marcar_meses_alterados(sess, datas)
+
+    return registros_inseridos, total_linhas - registros_inseridos
+
+def load(csv_path: Path = MASTER_CSV):
     # Inicializa o banco (cria tabelas se não existirem)
-    init_db()
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL environment variable is not set.")
+    init_engine(database_url)
+    create_db_and_tables()
+    create_missing_indexes()  # o upsert depende do índice único das vendas de feira
+    engine = get_engine()
 
     # Busca o ID do produto "Chopp Pilsen 50L"
     pilsen_id = None
@@ -24,68 +103,18 @@ def load():
             return # Aborta a carga se o produto não for encontrado
 
     # Lê o CSV mestre com parse de datas
-    df = pd.read_csv(MASTER_CSV, parse_dates=["data"])
+    df = pd.read_csv(csv_path, parse_dates=["data"])
     # Converte para datetime.date
     df["data"] = pd.to_datetime(df["data"], errors="coerce").dt.date
 
     # --- Lógica de Upsert: Atualiza ou Insere ---
     # O ETL legado do sheets trata apenas de vendas de 'feira'.
     # A chave para uma venda única do ETL é (data, produto_id, tipo_venda='feira')
-    registros_atualizados = 0
-    registros_inseridos = 0
-
     with Session(engine) as sess:
-        for _, row in df.iterrows():
-            data_venda = row["data"]
-            if pd.isna(data_venda):
-                continue
-
-            # Procura por uma venda de 'feira' existente para a mesma data e produto
-            venda_existente = sess.exec(
-                select(Venda).where(
-                    Venda.data == data_venda, 
-                    Venda.produto_id == pilsen_id,
-                    Venda.tipo_venda == 'feira' # Chave para vendas do ETL
-                )
-            ).first()
-
-            if venda_existente:
-                # Se existe, atualiza os campos
-                venda_existente.dia_semana = row.get("dia_da_semana")
-                venda_existente.total = row.get("total", 0.0)
-                venda_existente.cartao = row.get("cartao", 0.0)
-                venda_existente.dinheiro = row.get("dinheiro", 0.0)
-                venda_existente.pix = row.get("pix", 0.0)
-                venda_existente.custo_func = row.get("custo_func", 0.0)
-                venda_existente.custo_copos = row.get("custo_copos", 0.0)
-                venda_existente.custo_boleto = row.get("custo_boleto", 0.0)
-                venda_existente.lucro = row.get("lucro", 0.0)
-                venda_existente.observacoes = row.get("observacoes")
-                sess.add(venda_existente)
-                registros_atualizados += 1
-            else:
-                # Se não existe, cria uma nova venda do tipo 'feira'
-                nova_venda = Venda(
-                    data=data_venda,
-                    dia_semana=row.get("dia_da_semana"),
-                    tipo_venda='feira', # Define o tipo para vendas do ETL
-                    total=row.get("total", 0.0),
-                    cartao=row.get("cartao", 0.0),
-                    dinheiro=row.get("dinheiro", 0.0),
-                    pix=row.get("pix", 0.0),
-                    custo_func=row.get("custo_func", 0.0),
-                    custo_copos=row.get("custo_copos", 0.0),
-                    custo_boleto=row.get("custo_boleto", 0.0),
-                    lucro=row.get("lucro", 0.0),
-                    observacoes=row.get("observacoes"),
-                    produto_id=pilsen_id
-                )
-                sess.add(nova_venda)
-                registros_inseridos += 1
-        
+        registros_inseridos, registros_atualizados = upsert_vendas_feira(sess, df, pilsen_id)
         sess.commit()
 
     print(f"ETL concluído. Registros de 'feira' inseridos: {registros_inseridos}. Registros atualizados: {registros_atualizados}.")
 
 if __name__ == "__main__":
-    load()
\ No newline at end of file
+    load()
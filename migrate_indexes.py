@@ -0,0 +1,26 @@
+import os
+from dotenv import load_dotenv
+from app.database import init_engine, create_missing_indexes
+from app import models  # importa os modelos para registrar no metadata
+
+# Cria no banco existente os índices declarados em app/models.py.
+# Pode ser executado mais de uma vez: índices já existentes são ignorados.
+
+def migrate_indexes() -> list:
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL environment variable is not set.")
+
+    init_engine(database_url)
+    criados = create_missing_indexes()
+    if criados:
+        print("Índices criados:")
+        for nome in criados:
+            print(f" - {nome}")
+    else:
+        print("Nenhum índice pendente.")
+    return criados
+
+if __name__ == "__main__":
+    migrate_indexes()
@@ -0,0 +1,43 @@
+import os
+import sys
+from dotenv import load_dotenv
+from sqlmodel import Session
+from app.database import init_engine, get_engine, create_db_and_tables
+from app.estoque import reconciliar_saldos, reconstruir_custo_medio
+from app.resumo import reconstruir_resumo_mensal
+
+# Reconstrói o saldo materializado de estoque e o custo médio dos barris a
+# partir do razão de movimentos, refaz o resumo mensal de vendas e mostra as
+# divergências de saldo encontradas.
+# Uso: python reconcile.py [--dry-run]
+
+def reconcile(corrigir: bool = True) -> int:
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL environment variable is not set.")
+
+    init_engine(database_url)
+    create_db_and_tables()
+
+    with Session(get_engine()) as session:
+        divergencias = reconciliar_saldos(session, corrigir=corrigir)
+        if corrigir:
+            produtos = reconstruir_custo_medio(session)
+            print(f"Custo médio reconstruído para {produtos} produto(s).")
+            meses = reconstruir_resumo_mensal(session)
+            print(f"Resumo mensal reconstruído para {meses} mês(es).")
+
+    if not divergencias:
+        print("Saldos de estoque conferem com o razão de movimentos.")
+        return 0
+
+    print(f"{len(divergencias)} produto(s) com divergência no saldo:")
+    for d in divergencias:
+        registrado = "sem saldo" if d["quantidade_registrada"] is None else f"{d['quantidade_registrada']:.4f}"
+        print(f" - {d['produto']} (ID: {d['produto_id']}): registrado {registrado}, razão {d['quantidade_razao']:.4f} barris")
+    print("Saldos corrigidos." if corrigir else "Nada foi alterado (--dry-run).")
+    return len(divergencias)
+
+if __name__ == "__main__":
+    reconcile(corrigir="--dry-run" not in sys.argv[1:])
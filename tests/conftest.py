@@ -10,6 +10,13 @@ from app.main import app
 from app.database import init_engine, get_engine, get_session
 from app import models  # importa os modelos para registrar no metadata
 
+@pytest.fixture(autouse=True)
+def limpar_cache_relatorios():
+    # O cache é global ao processo; cada teste começa sem relatórios guardados
+    from app.cache import cache_relatorios
+    cache_relatorios.limpar()
+    yield
+
 @pytest.fixture(scope="session")
 def test_db_url():
     # Cria um arquivo temporário para o banco SQLite
@@ -40,3 +47,13 @@ def client(session):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+@pytest.fixture
+def isolated_session():
+    # Banco SQLite em memória, novo a cada teste, para consultas que dependem
+    # exatamente das linhas inseridas
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
@@ -0,0 +1,142 @@
+import pytest
+from datetime import date
+from unittest.mock import patch
+from sqlalchemy import event
+from sqlmodel import Session
+from app.cache import CacheRelatorios, cache_relatorios, marcar_meses_alterados
+from app.main import get_report_data, get_lucro_por_produto, get_relatorio_anual
+from app.models import Produto, Venda, MovimentoEstoque
+
+JULHO = (date(2025, 7, 1), date(2025, 8, 1))
+AGOSTO = (date(2025, 8, 1), date(2025, 9, 1))
+ANO = (date(2025, 1, 1), date(2026, 1, 1))
+
+# --- Estrutura do cache ---
+
+def test_lru_descarta_o_menos_usado():
+    cache = CacheRelatorios(max_itens=2, ttl_segundos=60)
+    cache.gravar(("relatorio", *JULHO, None), "julho", cache.geracao)
+    cache.gravar(("relatorio", *AGOSTO, None), "agosto", cache.geracao)
+    cache.obter(("relatorio", *JULHO, None))
+    cache.gravar(("relatorio", *ANO, None), "ano", cache.geracao)
+
+    assert cache.obter(("relatorio", *AGOSTO, None)) == (False, None)
+    assert cache.obter(("relatorio", *JULHO, None)) == (True, "julho")
+
+def test_ttl_expira_entradas():
+    cache = CacheRelatorios(max_itens=10, ttl_segundos=60)
+    with patch("app.cache.time.monotonic", return_value=1000.0):
+        cache.gravar(("relatorio", *JULHO, None), "julho", cache.geracao)
+    with patch("app.cache.time.monotonic", return_value=1061.0):
+        assert cache.obter(("relatorio", *JULHO, None)) == (False, None)
+
+def test_invalida_somente_periodos_que_cruzam_o_mes():
+    cache = CacheRelatorios(max_itens=10, ttl_segundos=60)
+    for funcao in ("relatorio", "dias_movimento"):
+        for periodo in (JULHO, AGOSTO, ANO):
+            cache.gravar((funcao, *periodo, None), "valor", cache.geracao)
+
+    assert cache.invalidar_meses({(2025, 8)}) == 4  # agosto e ano, nas duas funções
+    assert cache.obter(("relatorio", *JULHO, None))[0]
+    assert cache.obter(("dias_movimento", *JULHO, None))[0]
+    assert not cache.obter(("relatorio", *AGOSTO, None))[0]
+    assert not cache.obter(("relatorio", *ANO, None))[0]
+
+def test_valor_calculado_durante_invalidacao_nao_e_gravado():
+    cache = CacheRelatorios(max_itens=10, ttl_segundos=60)
+    geracao = cache.geracao
+    cache.invalidar_meses({(2025, 7)})
+    cache.gravar(("relatorio", *JULHO, None), "desatualizado", geracao)
+    assert cache.obter(("relatorio", *JULHO, None)) == (False, None)
+
+def test_estatisticas_de_acertos_e_falhas():
+    cache = CacheRelatorios(max_itens=10, ttl_segundos=60)
+    cache.obter(("relatorio", *JULHO, None))
+    cache.gravar(("relatorio", *JULHO, None), "julho", cache.geracao)
+    cache.obter(("relatorio", *JULHO, None))
+    cache.obter(("relatorio", *JULHO, None))
+
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["acertos"], estatisticas["falhas"]) == (2, 1)
+    assert estatisticas["taxa_acerto"] == pytest.approx(2 / 3, abs=1e-4)
+
+# --- Integração com os relatórios e as gravações ---
+
+@pytest.fixture
+def banco_com_vendas(isolated_session: Session):
+    isolated_session.add(Produto(id=1, nome="Chopp Pilsen 50L", preco_venda_litro=20.0,
+                                 preco_venda_barril_fechado=500.0, volume_litros=50))
+    isolated_session.add(Venda(data=date(2025, 7, 5), produto_id=1, tipo_venda="feira", total=100.0,
+                               dia_semana="Saturday", lucro=100.0))
+    isolated_session.commit()
+    return isolated_session
+
+def _contar_consultas(session: Session, funcao):
+    consultas = []
+    registrar = lambda *args, **kwargs: consultas.append(args[2])
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        resultado = funcao()
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+    return resultado, len(consultas)
+
+def test_relatorio_repetido_nao_consulta_o_banco(banco_com_vendas: Session):
+    primeiro, consultas = _contar_consultas(banco_com_vendas, lambda: get_report_data(*JULHO, banco_com_vendas))
+    assert consultas > 0
+    segundo, consultas = _contar_consultas(banco_com_vendas, lambda: get_report_data(*JULHO, banco_com_vendas))
+    assert consultas == 0
+    assert segundo == primeiro
+    assert cache_relatorios.estatisticas()["acertos"] == 1
+
+def test_venda_gravada_invalida_apenas_o_mes_afetado(banco_com_vendas: Session):
+    get_report_data(*JULHO, banco_com_vendas)
+    get_report_data(*AGOSTO, banco_com_vendas)
+
+    banco_com_vendas.add(Venda(data=date(2025, 7, 6), produto_id=1, tipo_venda="feira", total=50.0,
+                               dia_semana="Sunday", lucro=50.0))
+    banco_com_vendas.commit()
+
+    assert get_report_data(*JULHO, banco_com_vendas)["receita_bruta"] == 150.0
+    _, consultas = _contar_consultas(banco_com_vendas, lambda: get_report_data(*AGOSTO, banco_com_vendas))
+    assert consultas == 0
+
+def test_relatorio_anual_e_invalidado_por_vendas_do_ano_anterior(banco_com_vendas: Session):
+    assert get_relatorio_anual(2025, banco_com_vendas)["ano_anterior"] is None
+    _, consultas = _contar_consultas(banco_com_vendas, lambda: get_relatorio_anual(2025, banco_com_vendas))
+    assert consultas == 0
+
+    banco_com_vendas.add(Venda(data=date(2024, 7, 6), produto_id=1, tipo_venda="feira", total=80.0,
+                               dia_semana="Saturday", lucro=80.0))
+    banco_com_vendas.commit()
+
+    assert get_relatorio_anual(2025, banco_com_vendas)["ano_anterior"]["receita_bruta"] == 80.0
+
+def test_rollback_nao_invalida(banco_com_vendas: Session):
+    get_report_data(*JULHO, banco_com_vendas)
+    banco_com_vendas.add(MovimentoEstoque(produto_id=1, tipo_movimento="entrada", quantidade=1,
+                                          data_movimento=date(2025, 7, 1)))
+    banco_com_vendas.flush()
+    banco_com_vendas.rollback()
+
+    _, consultas = _contar_consultas(banco_com_vendas, lambda: get_report_data(*JULHO, banco_com_vendas))
+    assert consultas == 0
+
+def test_escrita_fora_do_orm_invalida_no_commit(banco_com_vendas: Session):
+    get_report_data(*JULHO, banco_com_vendas)
+    marcar_meses_alterados(banco_com_vendas, [date(2025, 7, 20)])
+    banco_com_vendas.commit()
+    assert cache_relatorios.estatisticas()["itens"] == 0
+
+def test_produto_alterado_invalida_lucro_por_produto(banco_com_vendas: Session):
+    get_lucro_por_produto(*JULHO, banco_com_vendas)
+    get_report_data(*JULHO, banco_com_vendas)
+
+    produto = banco_com_vendas.get(Produto, 1)
+    produto.nome = "Chopp Pilsen Premium"
+    banco_com_vendas.add(produto)
+    banco_com_vendas.commit()
+
+    assert get_lucro_por_produto(*JULHO, banco_com_vendas)[0].nome == "Chopp Pilsen Premium"
+    assert cache_relatorios.estatisticas()["itens"] == 2
@@ -0,0 +1,48 @@
+import math
+import pandas as pd
+from hypothesis import given, settings, strategies as st
+from etl.clean_data import parse_num, parse_num_vetorizado
+
+# --- Equivalência entre parse_num (referência) e a versão vetorizada ---
+
+def _formato_brasileiro(valor: float) -> str:
+    """1234.5 -> '1.234,50'"""
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+celulas = st.one_of(
+    st.none(),
+    st.just(float("nan")),
+    st.booleans(),
+    st.integers(min_value=-10**12, max_value=10**12),
+    st.floats(allow_nan=True, allow_infinity=True),
+    st.floats(min_value=-1e9, max_value=1e9, allow_nan=False).map(_formato_brasileiro),
+    st.floats(min_value=-1e9, max_value=1e9, allow_nan=False).map(lambda v: f"  {v:.2f} ".replace(".", ",")),
+    st.floats(allow_nan=False, allow_infinity=False).map(repr),
+    st.sampled_from(["", " ", "-", "R$ 10", "abc", "1_000", "nan", "inf", "-Infinity", "1e3", ",5", "12,", "1.2.3"]),
+    st.text(max_size=12),
+)
+
+def _iguais(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+def _comparar(valores):
+    serie = pd.Series(valores, dtype=object)
+    esperado = [parse_num(v) for v in valores]
+    obtido = parse_num_vetorizado(serie).tolist()
+    assert all(_iguais(e, o) for e, o in zip(esperado, obtido)), list(zip(valores, esperado, obtido))
+
+@settings(max_examples=300, deadline=None)
+@given(st.lists(celulas, min_size=1, max_size=40))
+def test_vetorizado_igual_a_parse_num_em_colunas_mistas(valores):
+    _comparar(valores)
+
+@settings(max_examples=100, deadline=None)
+@given(st.lists(st.one_of(st.none(), st.floats(allow_infinity=False)), min_size=1, max_size=40))
+def test_vetorizado_igual_a_parse_num_em_colunas_float(valores):
+    serie = pd.Series(valores, dtype=float)
+    esperado = [parse_num(v) for v in serie]
+    assert parse_num_vetorizado(serie).tolist() == esperado
+
+def test_formatos_da_planilha():
+    serie = pd.Series(["1.234,56", 1500.0, float("nan"), None, "  300,00 ", "abc", 7], dtype=object)
+    assert parse_num_vetorizado(serie).tolist() == [1234.56, 1500.0, 0.0, 0.0, 300.0, 0.0, 7.0]
@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.comandos import RoteadorComandos, argumento_ano, argumento_mes, argumento_mes_ano
+from app.main import app, get_current_username, roteador
+from app.metricas import Histograma
+
+def _roteador_de_teste():
+    r = RoteadorComandos()
+
+    @r.comando("relatorio", argumentos=[argumento_mes_ano()], ajuda="do mês")
+    def relatorio(contexto, mes_ano):
+        return f"mensal {mes_ano[0]}/{mes_ano[1]}"
+
+    @r.comando("relatorio anual", argumentos=[argumento_ano()])
+    def relatorio_anual(contexto, ano):
+        return f"anual {ano}"
+
+    @r.comando("melhores dias", argumentos=[argumento_mes(), argumento_ano()])
+    def melhores_dias(contexto, mes, ano):
+        return f"dias {mes}/{ano}"
+
+    @r.comando("quebra", mensagem_erro="Falhou")
+    def quebra(contexto):
+        raise RuntimeError("sem banco")
+
+    return r
+
+def test_comando_mais_longo_vence():
+    r = _roteador_de_teste()
+    assert r.despachar("relatorio anual 2024", None) == "anual 2024"
+    assert r.despachar("Relatório maio 2025", None) == "mensal 5/2025"
+    assert r.despachar("melhores dias 7 2025", None) == "dias 7/2025"
+
+def test_comando_desconhecido_e_formato_invalido():
+    r = _roteador_de_teste()
+    assert r.despachar("melhores", None).startswith("Comando não reconhecido")
+    assert r.despachar("", None).startswith("Comando não reconhecido")
+    assert r.despachar("melhores dias 13 2025", None) == "Formato inválido. Use: melhores dias <mês> <ano>"
+    assert r.despachar("relatorio anual", None) == "Formato inválido. Use: relatorio anual <ano>"
+
+    estatisticas = r.estatisticas()
+    assert estatisticas["desconhecidos"] == 2
+    assert estatisticas["comandos"]["melhores dias"]["invalidos"] == 1
+    assert estatisticas["comandos"]["relatorio anual"]["invalidos"] == 1
+
+def test_erros_e_latencia_por_comando():
+    r = _roteador_de_teste()
+    assert r.despachar("quebra", None) == "Falhou: sem banco"
+    r.despachar("relatorio anual 2024", None)
+    r.despachar("relatorio anual 2025", None)
+
+    estatisticas = r.estatisticas()["comandos"]
+    assert estatisticas["quebra"]["erros"] == 1
+    assert estatisticas["quebra"]["quantidade"] == 1
+    assert estatisticas["relatorio anual"]["quantidade"] == 2
+    assert estatisticas["relatorio"]["quantidade"] == 0
+
+def test_ajuda_gerada_pelo_registro():
+    r = _roteador_de_teste()
+    assert r.ajuda().splitlines()[:3] == [
+        "Comandos disponíveis:",
+        "1. `relatorio <mês> <ano>` - do mês",
+        "2. `relatorio anual <ano>`",
+    ]
+
+def test_histograma():
+    h = Histograma(limites_ms=(10, 100))
+    for duracao in (1, 5, 50, 500):
+        h.observar(duracao)
+    dados = h.como_dict()
+    assert dados["intervalos"] == {"<= 10 ms": 2, "<= 100 ms": 1, "> 100 ms": 1}
+    assert dados["max_ms"] == 500
+    assert dados["p50_ms"] == 10
+    assert h.percentil(95) == 500
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_webhook_ajuda_e_estatisticas(mock_validate, client: TestClient):
+    response = client.post("/whatsapp/webhook", data={"Body": "ajuda"})
+    assert response.status_code == 200
+    for comando in ("relatorio anual &lt;ano&gt;", "comparar &lt;m1&gt; &lt;a1&gt; &lt;m2&gt; &lt;a2&gt;", "relatorio barril"):
+        assert comando in response.text
+
+    response = client.post("/whatsapp/webhook", data={"Body": "comparar 13 2025 1 2025"})
+    assert "Formato inválido. Use: comparar &lt;m1&gt; &lt;a1&gt; &lt;m2&gt; &lt;a2&gt;" in response.text
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    estatisticas = client.get("/debug/comandos").json()
+    assert estatisticas["comandos"]["ajuda"]["quantidade"] >= 1
+    assert estatisticas["comandos"]["comparar"]["invalidos"] >= 1
+    assert set(estatisticas["comandos"]) == {c.nome for c in roteador.comandos}
+
+def test_despachar_pode_propagar_o_erro_do_comando():
+    r = _roteador_de_teste()
+    with pytest.raises(RuntimeError, match="sem banco"):
+        r.despachar("quebra", None, propagar_erros=True)
+    assert r.comandos[-1].erros == 1
+    assert r.argumentos_validos("relatorio anual 2024")
+    assert not r.argumentos_validos("relatorio anual abc")
+    assert not r.argumentos_validos("desconhecido")
@@ -0,0 +1,28 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+ATRASO_RELATORIO = 0.3
+WEBHOOKS_SIMULTANEOS = 6
+
+def _relatorio_lento(inicio, fim, db, tipo_venda=None):
+    time.sleep(ATRASO_RELATORIO)  # consulta bloqueante, como um relatório anual pesado
+    return None
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_webhooks_simultaneos_nao_sao_serializados(mock_validate, client: TestClient):
+    with patch("app.main.get_report_data", side_effect=_relatorio_lento):
+        def enviar(_):
+            return client.post("/whatsapp/webhook", data={"Body": "relatorio julho 2019"})
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WEBHOOKS_SIMULTANEOS) as executor:
+            respostas = list(executor.map(enviar, range(WEBHOOKS_SIMULTANEOS)))
+        decorrido = time.perf_counter() - inicio
+
+    assert all(r.status_code == 200 for r in respostas)
+    assert all("Nenhum registro de vendas encontrado para 7/2019" in r.text for r in respostas)
+    # Em série levaria WEBHOOKS_SIMULTANEOS * ATRASO_RELATORIO (1,8s); no threadpool,
+    # os relatórios lentos rodam juntos e o event loop segue livre
+    assert decorrido < WEBHOOKS_SIMULTANEOS * ATRASO_RELATORIO / 2
@@ -0,0 +1,186 @@
+import random
+import pytest
+from datetime import date, timedelta
+from sqlmodel import Session
+from app.logic import calcular_relatorio_geral, calcular_ranking_dias, calcular_lucro_por_produto
+from app.consultas import calcular_relatorio_geral_sql, calcular_lucro_por_produto_sql, calcular_ranking_dias_sql, mapa_dias_por_mes, serie_temporal
+from app.models import Venda, Produto
+
+# --- Paridade entre o cálculo em Python (referência) e a agregação SQL ---
+
+INICIO = date(2025, 1, 1)
+FIM = date(2026, 1, 1)
+
+def _referencia(vendas, inicio=INICIO, fim=FIM, tipo_venda=None):
+    """Aplica o mesmo filtro da consulta e calcula pela função pura."""
+    selecionadas = [
+        v for v in vendas
+        if inicio <= v.data < fim and (not tipo_venda or v.tipo_venda == tipo_venda)
+    ]
+    return calcular_relatorio_geral(selecionadas)
+
+def _gravar(session: Session, vendas):
+    # Cópias desacopladas para a referência não depender da sessão
+    copias = [Venda(**v.model_dump()) for v in vendas]
+    session.add(Produto(id=1, nome="Chopp Pilsen 50L", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.add_all(vendas)
+    session.commit()
+    return copias
+
+def _vendas_aleatorias(semente: int, quantidade: int):
+    rng = random.Random(semente)
+    vendas = []
+    dias_com_feira = set()
+    for _ in range(quantidade):
+        tipo = rng.choice(["feira", "feira", "barril_festas", "boleto"])
+        data = INICIO + timedelta(days=rng.randrange(400))  # inclui datas fora do período
+        if tipo == "feira" and data in dias_com_feira:
+            tipo = "barril_festas"  # uma venda de feira por dia e produto
+        if tipo == "feira":
+            dias_com_feira.add(data)
+        opcional = lambda: rng.choice([None, round(rng.uniform(0, 300), 2)])
+        vendas.append(Venda(
+            data=data, produto_id=1, tipo_venda=tipo, dia_semana=data.strftime('%A'),
+            total=0.0 if tipo == "boleto" else opcional(),
+            custo_func=opcional(), custo_copos=opcional(),
+            custo_boleto=opcional() if tipo == "boleto" else None,
+            lucro=0.0,
+        ))
+    return vendas
+
+@pytest.mark.parametrize("semente", range(5))
+@pytest.mark.parametrize("tipo_venda", [None, "feira", "barril_festas", "boleto"])
+def test_paridade_relatorio_dados_aleatorios(isolated_session, semente, tipo_venda):
+    vendas = _gravar(isolated_session, _vendas_aleatorias(semente, 200))
+
+    esperado = _referencia(vendas, tipo_venda=tipo_venda)
+    obtido = calcular_relatorio_geral_sql(isolated_session, INICIO, FIM, tipo_venda)
+
+    assert obtido == esperado
+
+def test_paridade_relatorio_periodo_vazio(isolated_session):
+    _gravar(isolated_session, _vendas_aleatorias(0, 20))
+    assert calcular_relatorio_geral_sql(isolated_session, date(2030, 1, 1), date(2030, 2, 1)) is None
+    assert _referencia([], date(2030, 1, 1), date(2030, 2, 1)) is None
+
+def test_paridade_relatorio_somente_boleto(isolated_session):
+    """Mês só com boleto: há relatório, mas sem receita, média ou dias registrados."""
+    vendas = _gravar(isolated_session, [
+        Venda(data=date(2025, 3, 10), produto_id=1, tipo_venda="boleto", total=0.0,
+              custo_boleto=80.0, dia_semana="Monday", lucro=-80.0),
+    ])
+    obtido = calcular_relatorio_geral_sql(isolated_session, date(2025, 3, 1), date(2025, 4, 1))
+
+    assert obtido == _referencia(vendas, date(2025, 3, 1), date(2025, 4, 1))
+    assert obtido["receita_bruta"] == 0.0
+    assert obtido["gasto_boleto"] == 80.0
+    assert obtido["dias_registrados"] == 0
+
+def test_paridade_relatorio_valores_nulos_e_dias_repetidos(isolated_session):
+    """Campos nulos contam como zero e vários registros no mesmo dia contam um dia só."""
+    vendas = _gravar(isolated_session, [
+        Venda(data=date(2025, 7, 1), produto_id=1, tipo_venda="feira", total=150.0,
+              custo_func=20, custo_copos=None, dia_semana="Tuesday", lucro=130.0),
+        Venda(data=date(2025, 7, 1), produto_id=1, tipo_venda="barril_festas", total=None,
+              dia_semana="Tuesday", lucro=0.0),
+        Venda(data=date(2025, 7, 2), produto_id=1, tipo_venda="feira", total=250.0,
+              custo_func=20, custo_copos=10, dia_semana="Wednesday", lucro=220.0),
+        Venda(data=date(2025, 7, 3), produto_id=1, tipo_venda="boleto", total=0.0,
+              custo_boleto=5.0, dia_semana="Thursday", lucro=-5.0),
+    ])
+    obtido = calcular_relatorio_geral_sql(isolated_session, date(2025, 7, 1), date(2025, 8, 1))
+
+    assert obtido == _referencia(vendas, date(2025, 7, 1), date(2025, 8, 1))
+    assert obtido["dias_registrados"] == 2
+    assert obtido["media_vendas"] == round(400.0 / 3, 2)
+
+# --- Séries temporais ---
+
+def _inicio_da_semana(dia: date) -> date:
+    return dia - timedelta(days=dia.weekday())
+
+@pytest.mark.parametrize("intervalo, inicio_do_periodo", [
+    ("dia", lambda d: d),
+    ("semana", _inicio_da_semana),
+    ("mes", lambda d: d.replace(day=1)),
+])
+def test_paridade_serie_temporal(isolated_session, intervalo, inicio_do_periodo):
+    vendas = _gravar(isolated_session, _vendas_aleatorias(7, 300))
+    serie = serie_temporal(isolated_session, INICIO, FIM, intervalo)
+
+    periodos = sorted({inicio_do_periodo(v.data) for v in vendas if INICIO <= v.data < FIM})
+    assert serie["periodo"] == [p.isoformat() for p in periodos]
+    for i, periodo in enumerate(periodos):
+        esperado = calcular_relatorio_geral([v for v in vendas if INICIO <= v.data < FIM and inicio_do_periodo(v.data) == periodo])
+        assert serie["receita_bruta"][i] == esperado["receita_bruta"]
+        assert serie["receita_liquida"][i] == esperado["receita_liquida"]
+        assert serie["gasto_boleto"][i] == esperado["gasto_boleto"]
+
+def test_serie_separada_por_tipo_de_venda(isolated_session):
+    _gravar(isolated_session, [
+        Venda(data=date(2025, 7, 5), produto_id=1, tipo_venda="feira", total=1000.0,
+              custo_func=200.0, dia_semana="Saturday", lucro=800.0),
+        Venda(data=date(2025, 7, 6), produto_id=1, tipo_venda="barril_festas", total=500.0,
+              dia_semana="Sunday", lucro=200.0),
+        Venda(data=date(2025, 7, 10), produto_id=1, tipo_venda="boleto", total=0.0,
+              custo_boleto=350.0, dia_semana="Thursday", lucro=-350.0),
+    ])
+    serie = serie_temporal(isolated_session, date(2025, 7, 1), date(2025, 8, 1), "semana", por="tipo_venda")
+
+    assert serie["periodo"] == ["2025-06-30", "2025-06-30", "2025-07-07"]
+    assert serie["tipo_venda"] == ["barril_festas", "feira", "boleto"]
+    assert serie["receita_liquida"] == [500.0, 800.0, -350.0]
+    assert serie["lucro"] == [200.0, 800.0, -350.0]
+    assert serie["vendas"] == [1, 1, 1]
+
+# --- Dias da semana ---
+
+@pytest.mark.parametrize("semente", range(3))
+def test_paridade_ranking_dias(isolated_session, semente):
+    vendas = _gravar(isolated_session, _vendas_aleatorias(semente, 200))
+    for venda in vendas:
+        venda.dia_semana = None  # como nas linhas do ETL: o ranking não depende do texto
+
+    obtido = calcular_ranking_dias_sql(isolated_session, INICIO, FIM)
+    esperado = calcular_ranking_dias([v for v in vendas if INICIO <= v.data < FIM])
+    assert obtido == esperado
+
+def test_mapa_dias_por_mes(isolated_session):
+    _gravar(isolated_session, [
+        Venda(data=date(2025, 1, 4), produto_id=1, tipo_venda="feira", total=1000.0, dia_semana="Saturday", lucro=0.0),
+        Venda(data=date(2025, 1, 11), produto_id=1, tipo_venda="feira", total=500.0, dia_semana="Saturday", lucro=0.0),
+        Venda(data=date(2025, 3, 2), produto_id=1, tipo_venda="feira", total=700.0, dia_semana="Sunday", lucro=0.0),
+        Venda(data=date(2025, 3, 10), produto_id=1, tipo_venda="boleto", total=0.0, dia_semana="Monday", lucro=-80.0),
+    ])
+    mapa = mapa_dias_por_mes(isolated_session, date(2025, 1, 1), date(2025, 4, 1))
+
+    assert mapa["meses"] == ["2025-01", "2025-02", "2025-03"]
+    assert mapa["dias_semana"][5] == "Sábado"
+    assert mapa["total"][5] == [1500.0, 0.0, 0.0]
+    assert mapa["dias"][5] == [2, 0, 0]
+    assert mapa["total"][6] == [0.0, 0.0, 700.0]
+    assert mapa["total"][0] == [0.0, 0.0, 0.0]  # boleto não conta
+    assert mapa_dias_por_mes(isolated_session, date(2030, 1, 1), date(2031, 1, 1)) is None
+
+# --- Lucro por produto ---
+
+@pytest.mark.parametrize("semente", range(3))
+def test_paridade_lucro_por_produto(isolated_session, semente):
+    rng = random.Random(semente)
+    vendas = _vendas_aleatorias(semente, 200)
+    for venda in vendas:
+        venda.lucro = round(rng.uniform(-100, 500), 2)
+        venda.quantidade_barris_vendidos = rng.choice([None, rng.randint(1, 8) / 4])
+        if venda.tipo_venda == "barril_festas":
+            venda.custo_total_venda = round(rng.uniform(100, 600), 2)
+    vendas = _gravar(isolated_session, vendas)
+    produto = isolated_session.get(Produto, 1)
+
+    obtido = calcular_lucro_por_produto_sql(isolated_session, INICIO, FIM)
+    esperado = calcular_lucro_por_produto([v for v in vendas if INICIO <= v.data < FIM], [produto])
+    assert len(obtido) == len(esperado) == 1
+    for campo in ("lucro", "receita", "barris_vendidos", "litros", "custo_total_venda"):
+        assert getattr(obtido[0], campo) == pytest.approx(getattr(esperado[0], campo))
+    assert (obtido[0].produto_id, obtido[0].nome, obtido[0].vendas) == (esperado[0].produto_id, esperado[0].nome, esperado[0].vendas)
+    assert calcular_lucro_por_produto_sql(isolated_session, date(2030, 1, 1), date(2031, 1, 1)) is None
@@ -0,0 +1,44 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from app.datas import interpretar_mes_ano, mes_ano_rapido
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("5 2025", (5, 2025)),
+    ("05/2025", (5, 2025)),
+    ("12-2024", (12, 2024)),
+    ("1.2026", (1, 2026)),
+    ("2025-05", (5, 2025)),
+    ("maio 2025", (5, 2025)),
+    ("Maio 2025", (5, 2025)),
+    ("março 2025", (3, 2025)),
+    ("marco 2025", (3, 2025)),
+    ("mar 2025", (3, 2025)),
+    ("set. 2024", (9, 2024)),
+    ("fev/2025", (2, 2025)),
+    ("dezembro de 2023", (12, 2023)),
+    ("  julho   2025 ", (7, 2025)),
+])
+def test_formatos_reconhecidos_sem_dateparser(texto, esperado):
+    with patch("dateparser.parse") as mock_parse:
+        assert interpretar_mes_ano(texto) == esperado
+    mock_parse.assert_not_called()
+
+@pytest.mark.parametrize("texto", ["13 2025", "0/2025", "maiô", "semana passada", "2025", "", "junhox 2025"])
+def test_formatos_desconhecidos_nao_passam_pelo_parser_rapido(texto):
+    assert mes_ano_rapido(texto) is None
+
+def test_fallback_para_dateparser():
+    with patch("dateparser.parse", return_value=datetime(2025, 4, 1)) as mock_parse:
+        assert interpretar_mes_ano("mês passado") == (4, 2025)
+    mock_parse.assert_called_once_with("mês passado", languages=['pt'])
+
+    with patch("dateparser.parse", return_value=None):
+        assert interpretar_mes_ano("qualquer coisa") is None
+
+def test_parser_rapido_usa_cache():
+    mes_ano_rapido.cache_clear()
+    mes_ano_rapido("agosto 2025")
+    mes_ano_rapido("agosto 2025")
+    info = mes_ano_rapido.cache_info()
+    assert info.hits == 1 and info.misses == 1
@@ -0,0 +1,187 @@
+import pytest
+from datetime import date
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from app import estoque
+from app.main import app, get_current_username, _get_estoque_logic
+from app.estoque import reconciliar_saldos, obter_custo_medio_barril, reconstruir_custo_medio
+from app.models import Produto, MovimentoEstoque, SaldoEstoque, CustoMedioProduto, Venda
+
+@pytest.fixture
+def produto(isolated_session: Session) -> Produto:
+    produto = Produto(nome="Chopp Pilsen 50L", preco_venda_litro=20.0,
+                      preco_venda_barril_fechado=500.0, volume_litros=50)
+    isolated_session.add(produto)
+    isolated_session.commit()
+    return produto
+
+def _movimento(produto_id: int, tipo: str, quantidade: float, custo_unitario=None) -> MovimentoEstoque:
+    return MovimentoEstoque(produto_id=produto_id, tipo_movimento=tipo, quantidade=quantidade,
+                            custo_unitario=custo_unitario, data_movimento=date(2025, 7, 1))
+
+def test_produto_novo_nasce_com_saldo_zerado(isolated_session: Session, produto: Produto):
+    saldo = isolated_session.get(SaldoEstoque, produto.id)
+    assert saldo is not None
+    assert saldo.quantidade_barris == 0.0
+
+def test_saldo_acompanha_cada_movimento(isolated_session: Session, produto: Produto):
+    isolated_session.add(_movimento(produto.id, "entrada", 10))
+    isolated_session.commit()
+    isolated_session.add_all([
+        _movimento(produto.id, "saida_manual", 1),
+        _movimento(produto.id, "saida_venda", 0.5),
+        _movimento(produto.id, "saida_venda_barril", 2),
+    ])
+    isolated_session.commit()
+
+    saldo = isolated_session.get(SaldoEstoque, produto.id)
+    assert saldo.quantidade_barris == 6.5
+    assert saldo.volume_litros_total == 325.0
+    assert reconciliar_saldos(isolated_session, corrigir=False) == []
+
+def test_saldo_desfaz_movimento_removido_ou_alterado(isolated_session: Session, produto: Produto):
+    entrada = _movimento(produto.id, "entrada", 10)
+    saida = _movimento(produto.id, "saida_manual", 3)
+    isolated_session.add_all([entrada, saida])
+    isolated_session.commit()
+
+    entrada.quantidade = 8
+    isolated_session.delete(saida)
+    isolated_session.commit()
+
+    assert isolated_session.get(SaldoEstoque, produto.id).quantidade_barris == 8.0
+    assert reconciliar_saldos(isolated_session, corrigir=False) == []
+
+def test_reconciliar_reporta_e_corrige_divergencias(isolated_session: Session, produto: Produto):
+    isolated_session.add(_movimento(produto.id, "entrada", 4))
+    isolated_session.commit()
+
+    # Simula um saldo que divergiu do razão
+    saldo = isolated_session.get(SaldoEstoque, produto.id)
+    saldo.quantidade_barris = 1.0
+    isolated_session.add(saldo)
+    isolated_session.commit()
+
+    divergencias = reconciliar_saldos(isolated_session, corrigir=False)
+    assert len(divergencias) == 1
+    assert divergencias[0]["quantidade_registrada"] == 1.0
+    assert divergencias[0]["quantidade_razao"] == 4.0
+    assert isolated_session.get(SaldoEstoque, produto.id).quantidade_barris == 1.0  # dry-run
+
+    assert len(reconciliar_saldos(isolated_session)) == 1
+    isolated_session.expire_all()
+    assert isolated_session.get(SaldoEstoque, produto.id).quantidade_barris == 4.0
+    assert reconciliar_saldos(isolated_session) == []
+
+def test_estoque_sem_saldo_materializado_usa_o_razao(isolated_session: Session, produto: Produto):
+    """Produtos de antes do SaldoEstoque continuam com o estoque correto até a reconciliação."""
+    isolated_session.add(_movimento(produto.id, "entrada", 3))
+    isolated_session.commit()
+    isolated_session.delete(isolated_session.get(SaldoEstoque, produto.id))
+    isolated_session.commit()
+
+    assert _get_estoque_logic(isolated_session)[produto.nome]["quantidade_barris"] == 3.0
+
+    reconciliar_saldos(isolated_session)
+    assert isolated_session.get(SaldoEstoque, produto.id).quantidade_barris == 3.0
+
+def test_primeiro_saldo_gravado_em_paralelo_nao_falha(isolated_session: Session, produto: Produto, monkeypatch):
+    """Outra transação cria o saldo entre o UPDATE sem linhas e o INSERT: soma o delta à linha dela."""
+    isolated_session.delete(isolated_session.get(SaldoEstoque, produto.id))
+    isolated_session.commit()
+
+    saldo_pelo_razao = estoque._saldo_pelo_razao
+    def concorrente(conn, produto_id):
+        conn.execute(insert(SaldoEstoque.__table__).values(produto_id=produto_id, quantidade_barris=5.0, volume_litros_total=250.0))
+        return saldo_pelo_razao(conn, produto_id)
+    monkeypatch.setattr(estoque, "_saldo_pelo_razao", concorrente)
+
+    isolated_session.add(_movimento(produto.id, "entrada", 3))
+    isolated_session.commit()
+
+    saldo = isolated_session.get(SaldoEstoque, produto.id)
+    assert (saldo.quantidade_barris, saldo.volume_litros_total) == (8.0, 400.0)
+
+def test_endpoints_de_estoque_atualizam_o_saldo(client: TestClient, session: Session):
+    produto = Produto(id=101, nome="Chopp Saldo", preco_venda_litro=20.0,
+                      preco_venda_barril_fechado=500.0, volume_litros=30)
+    session.add(produto)
+    session.commit()
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    dados = {"produto_id": produto.id, "data_movimento": "2019-03-01"}
+    client.post("/estoque/entrada", data={**dados, "quantidade": 5, "custo_unitario": 300.0})
+    client.post("/estoque/saida_manual", data={**dados, "quantidade": 2})
+    client.post("/registrar_venda", data={
+        "produto_id": produto.id, "data": "2019-03-02", "tipo_venda": "barril_festas",
+        "quantidade_barris_vendidos": 1,
+    })
+
+    saldo = session.exec(select(SaldoEstoque).where(SaldoEstoque.produto_id == produto.id)).one()
+    assert saldo.quantidade_barris == 2.0
+    assert saldo.volume_litros_total == 60.0
+
+    venda = session.exec(select(Venda).where(Venda.produto_id == produto.id)).one()
+    assert venda.custo_total_venda == 300.0
+    assert venda.lucro == 200.0
+
+# --- Custo médio ponderado do barril ---
+
+def _custo_medio_por_varredura(entradas):
+    """Cálculo original de register_venda, usado como referência."""
+    total_custo = sum(q * c for q, c in entradas if c is not None)
+    total_quantidade = sum(q for q, _ in entradas)
+    return total_custo / total_quantidade if total_quantidade > 0 else 0.0
+
+def test_custo_medio_acumula_cada_entrada(isolated_session: Session, produto: Produto):
+    assert obter_custo_medio_barril(isolated_session, produto.id) == 0.0
+
+    entradas = [(4, 300.0), (2, 360.0), (1, None), (3, 310.0)]
+    for quantidade, custo in entradas:
+        isolated_session.add(_movimento(produto.id, "entrada", quantidade, custo))
+        isolated_session.commit()
+    # Saídas não mudam o custo médio
+    isolated_session.add(_movimento(produto.id, "saida_venda_barril", 2, 999.0))
+    isolated_session.commit()
+
+    acumulado = isolated_session.get(CustoMedioProduto, produto.id)
+    assert acumulado.quantidade_acumulada == 10
+    assert acumulado.custo_acumulado == 4 * 300.0 + 2 * 360.0 + 3 * 310.0
+    assert obter_custo_medio_barril(isolated_session, produto.id) == pytest.approx(_custo_medio_por_varredura(entradas))
+
+def test_custo_medio_sem_acumulado_e_reconstruido_pelo_razao(isolated_session: Session, produto: Produto):
+    isolated_session.add_all([
+        _movimento(produto.id, "entrada", 2, 300.0),
+        _movimento(produto.id, "entrada", 2, 400.0),
+    ])
+    isolated_session.commit()
+    isolated_session.delete(isolated_session.get(CustoMedioProduto, produto.id))
+    isolated_session.commit()
+
+    assert obter_custo_medio_barril(isolated_session, produto.id) == 350.0
+
+    # Corrompe o acumulado e reconstrói tudo a partir do razão
+    acumulado = isolated_session.get(CustoMedioProduto, produto.id)
+    acumulado.custo_acumulado = 0.0
+    isolated_session.add(acumulado)
+    isolated_session.commit()
+
+    assert reconstruir_custo_medio(isolated_session) == 1
+    assert obter_custo_medio_barril(isolated_session, produto.id) == 350.0
+
+def test_primeiro_custo_medio_gravado_em_paralelo_nao_falha(isolated_session: Session, produto: Produto, monkeypatch):
+    """Outra transação cria o acumulado entre o UPDATE sem linhas e o INSERT: soma a entrada à linha dela."""
+    assert isolated_session.get(CustoMedioProduto, produto.id) is None  # produto ainda sem entradas
+
+    acumulados_pelo_razao = estoque._acumulados_pelo_razao
+    def concorrente(conn, produto_ids=None):
+        conn.execute(insert(CustoMedioProduto.__table__).values(produto_id=produto.id, quantidade_acumulada=2.0, custo_acumulado=600.0))
+        return acumulados_pelo_razao(conn, produto_ids)
+    monkeypatch.setattr(estoque, "_acumulados_pelo_razao", concorrente)
+
+    isolated_session.add(_movimento(produto.id, "entrada", 2, 400.0))
+    isolated_session.commit()
+
+    acumulado = isolated_session.get(CustoMedioProduto, produto.id)
+    assert (acumulado.quantidade_acumulada, acumulado.custo_acumulado) == (4.0, 1400.0)
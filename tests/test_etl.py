@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from datetime import date
+from sqlmodel import Session, select
+from etl import load_to_db
+from etl.load_to_db import upsert_vendas_feira
+from app.models import Venda, Produto
+from app.resumo import relatorio_do_resumo
+
+@pytest.fixture
+def produto_id(isolated_session: Session) -> int:
+    produto = Produto(nome="Chopp Pilsen 50L", preco_venda_litro=20.0,
+                      preco_venda_barril_fechado=500.0, volume_litros=50)
+    isolated_session.add(produto)
+    isolated_session.commit()
+    return produto.id
+
+def _master(linhas):
+    df = pd.DataFrame(linhas, columns=["data", "total", "cartao", "custo_func", "custo_copos", "lucro"])
+    df["data"] = pd.to_datetime(df["data"]).dt.date
+    return df
+
+def _vendas(session: Session):
+    return {v.data: v for v in session.exec(select(Venda).order_by(Venda.data)).all()}
+
+def test_upsert_insere_e_depois_atualiza(isolated_session: Session, produto_id: int, monkeypatch):
+    monkeypatch.setattr(load_to_db, "TAMANHO_LOTE", 2)  # força vários lotes
+
+    inseridos, atualizados = upsert_vendas_feira(isolated_session, _master([
+        ("2025-04-03", 1500.0, 500.0, 300.0, 50.0, 1150.0),
+        ("2025-04-04", 1200.0, 400.0, 300.0, 40.0, 860.0),
+        ("2025-04-05", 1800.0, None, 300.0, 60.0, 1440.0),
+    ]), produto_id)
+    isolated_session.commit()
+
+    assert (inseridos, atualizados) == (3, 0)
+    vendas = _vendas(isolated_session)
+    assert vendas[date(2025, 4, 5)].cartao == 0.0
+    assert vendas[date(2025, 4, 3)].dia_semana == "Thursday"
+    assert vendas[date(2025, 4, 3)].tipo_venda == "feira"
+
+    inseridos, atualizados = upsert_vendas_feira(isolated_session, _master([
+        ("2025-04-04", 1250.0, 400.0, 300.0, 40.0, 910.0),
+        ("2025-05-01", 1100.0, 300.0, 300.0, 30.0, 770.0),
+        ("2025-05-01", 1111.0, 300.0, 300.0, 30.0, 781.0),  # repetida na planilha: vale a última
+        (None, 999.0, 0.0, 0.0, 0.0, 999.0),                 # sem data: ignorada
+    ]), produto_id)
+    isolated_session.commit()
+
+    assert (inseridos, atualizados) == (1, 2)
+    isolated_session.expire_all()
+    vendas = _vendas(isolated_session)
+    assert len(vendas) == 4
+    assert vendas[date(2025, 4, 4)].total == 1250.0
+    assert vendas[date(2025, 5, 1)].total == 1111.0
+
+def test_upsert_nao_altera_outros_tipos_de_venda(isolated_session: Session, produto_id: int):
+    isolated_session.add(Venda(data=date(2025, 4, 3), produto_id=produto_id, tipo_venda="barril_festas",
+                               total=500.0, dia_semana="Thursday", lucro=200.0))
+    isolated_session.commit()
+
+    inseridos, atualizados = upsert_vendas_feira(isolated_session, _master([
+        ("2025-04-03", 1500.0, 500.0, 300.0, 50.0, 1150.0),
+    ]), produto_id)
+    isolated_session.commit()
+
+    assert (inseridos, atualizados) == (1, 0)
+    tipos = sorted(v.tipo_venda for v in isolated_session.exec(select(Venda)).all())
+    assert tipos == ["barril_festas", "feira"]
+
+def test_upsert_atualiza_o_resumo_mensal(isolated_session: Session, produto_id: int):
+    upsert_vendas_feira(isolated_session, _master([
+        ("2025-04-03", 1500.0, 500.0, 300.0, 50.0, 1150.0),
+        ("2025-04-04", 1200.0, 400.0, 300.0, 40.0, 860.0),
+    ]), produto_id)
+    isolated_session.commit()
+
+    relatorio = relatorio_do_resumo(isolated_session, date(2025, 4, 1), date(2025, 5, 1))
+    assert relatorio["receita_bruta"] == 2700.0
+    assert relatorio["dias_registrados"] == 2
@@ -0,0 +1,59 @@
+import io
+import json
+import sys
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app import exportacao
+from app.main import app, get_current_username
+from app.models import MovimentoEstoque, Produto, Venda
+
+@pytest.fixture
+def autenticado(client: TestClient, session: Session):
+    if session.get(Produto, 120) is None:
+        session.add(Produto(id=120, nome="Chopp Exportação", preco_venda_litro=20.0,
+                            preco_venda_barril_fechado=500.0, volume_litros=50))
+        for dia in range(1, 8):
+            session.add(Venda(data=date(2019, 11, dia), produto_id=120, tipo_venda="barril_festas",
+                              dia_semana="Friday", total=500.0, lucro=200.0, observacoes="evento, \"especial\""))
+        session.add(MovimentoEstoque(produto_id=120, tipo_movimento="entrada", quantidade=3,
+                                     custo_unitario=300.0, data_movimento=date(2019, 11, 1)))
+        session.commit()
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    yield client
+
+def test_exporta_vendas_em_csv_lote_a_lote(autenticado: TestClient, monkeypatch):
+    monkeypatch.setattr(exportacao, "TAMANHO_LOTE", 3)
+    partes = list(exportacao.exportar("vendas", "csv", date(2019, 11, 1), date(2019, 11, 8)))
+    assert len(partes) == 3  # cabeçalho + 3 linhas, 3 linhas, 1 linha
+
+    resposta = autenticado.get("/exportar/vendas", params={"inicio": "2019-11-02", "fim": "2019-11-05"})
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/csv")
+    assert 'filename="vendas_2019-11-02_2019-11-05.csv"' in resposta.headers["content-disposition"]
+    linhas = resposta.text.splitlines()
+    assert linhas[0].split(",")[:3] == ["id", "data", "dia_semana"]
+    assert [linha.split(",")[1] for linha in linhas[1:]] == ["2019-11-02", "2019-11-03", "2019-11-04"]
+    assert '"evento, ""especial"""' in linhas[1]
+
+def test_exporta_movimentos_em_ndjson(autenticado: TestClient):
+    resposta = autenticado.get("/exportar/movimentos", params={"formato": "ndjson", "inicio": "2019-11-01", "fim": "2019-11-02"})
+    registros = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert {"produto_id": 120, "tipo_movimento": "entrada", "quantidade": 3.0,
+            "custo_unitario": 300.0, "data_movimento": "2019-11-01"}.items() <= registros[-1].items()
+
+def test_exportacao_valida_tabela_e_formato(autenticado: TestClient, monkeypatch):
+    assert autenticado.get("/exportar/produtos").status_code == 404
+    assert autenticado.get("/exportar/vendas", params={"formato": "xlsx"}).status_code == 400
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)  # simula o pyarrow ausente
+    assert autenticado.get("/exportar/vendas", params={"formato": "parquet"}).status_code == 501
+
+def test_exporta_parquet_em_row_groups(autenticado: TestClient, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(exportacao, "TAMANHO_LOTE", 2)
+    resposta = autenticado.get("/exportar/vendas", params={"formato": "parquet", "inicio": "2019-11-01", "fim": "2019-11-08"})
+    arquivo = pq.ParquetFile(io.BytesIO(resposta.content))
+    assert arquivo.metadata.num_rows == 7
+    assert arquivo.metadata.num_row_groups == 4
+    assert arquivo.read(columns=["data"]).column("data").to_pylist()[0] == date(2019, 11, 1)
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.idempotencia import ArmazemMemoria, ArmazemSQLite
+
+def test_armazem_memoria_respeita_tamanho_e_ttl():
+    armazem = ArmazemMemoria(max_itens=2, ttl_segundos=60)
+    armazem.gravar("SM1", "<r>1</r>")
+    armazem.gravar("SM2", "<r>2</r>")
+    armazem.obter("SM1")  # SM1 passa a ser o mais recente
+    armazem.gravar("SM3", "<r>3</r>")
+    assert armazem.obter("SM2") is None
+    assert armazem.obter("SM1") == "<r>1</r>"
+    assert armazem.obter("SM3") == "<r>3</r>"
+
+    curto = ArmazemMemoria(ttl_segundos=0.05)
+    curto.gravar("SM1", "<r/>")
+    time.sleep(0.1)
+    assert curto.obter("SM1") is None
+
+def test_armazem_sqlite_compartilhado_entre_workers(tmp_path):
+    caminho = str(tmp_path / "respostas.db")
+    worker_a = ArmazemSQLite(caminho, max_itens=2, ttl_segundos=60)
+    worker_b = ArmazemSQLite(caminho, max_itens=2, ttl_segundos=60)
+
+    worker_a.gravar("SM1", "<r>1</r>")
+    assert worker_b.obter("SM1") == "<r>1</r>"
+
+    worker_b.gravar("SM2", "<r>2</r>")
+    worker_b.gravar("SM3", "<r>3</r>")
+    assert worker_a.obter("SM1") is None  # o mais antigo sai ao passar do limite
+    assert worker_a.obter("SM3") == "<r>3</r>"
+
+    curto = ArmazemSQLite(caminho, ttl_segundos=0.05)
+    curto.gravar("SM4", "<r>4</r>")
+    time.sleep(0.1)
+    assert worker_a.obter("SM4") is None
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_reenvio_do_twilio_nao_refaz_o_relatorio(mock_validate, client: TestClient):
+    dados = {"Body": "relatorio julho 2019", "MessageSid": "SMteste-reenvio"}
+    with patch("app.main.get_report_data", return_value=None) as mock_relatorio:
+        primeira = client.post("/whatsapp/webhook", data=dados)
+        segunda = client.post("/whatsapp/webhook", data=dados)
+        outra_mensagem = client.post("/whatsapp/webhook", data={**dados, "MessageSid": "SMteste-outra"})
+
+    assert primeira.status_code == segunda.status_code == 200
+    assert segunda.text == primeira.text
+    assert "Nenhum registro de vendas encontrado para 7/2019" in segunda.text
+    assert mock_relatorio.call_count == 2  # uma vez por MessageSid
+    assert outra_mensagem.text == primeira.text
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_reenvio_durante_o_processamento_espera_a_resposta_original(mock_validate, client: TestClient):
+    def relatorio_lento(inicio, fim, db, tipo_venda=None):
+        time.sleep(0.3)
+        return None
+
+    dados = {"Body": "relatorio julho 2019", "MessageSid": "SMteste-simultaneo"}
+    with patch("app.main.get_report_data", side_effect=relatorio_lento) as mock_relatorio:
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            respostas = list(executor.map(lambda _: client.post("/whatsapp/webhook", data=dados), range(3)))
+
+    assert mock_relatorio.call_count == 1
+    assert len({r.text for r in respostas}) == 1
@@ -0,0 +1,31 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+# Orçamento para `import app.main` em um processo novo (melhor de 3 rodadas)
+ORCAMENTO_MS = float(os.getenv("APP_IMPORT_BUDGET_MS", "1500"))
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=RAIZ, env=os.environ.copy(),
+                          capture_output=True, text=True, check=True)
+
+def _importtime_ms(modulo: str) -> float:
+    saida = _python("-X", "importtime", "-c", f"import {modulo}").stderr
+    encontrado = re.search(rf"\|\s+(\d+) \| {re.escape(modulo)}$", saida, re.MULTILINE)
+    return int(encontrado.group(1)) / 1000
+
+def test_app_main_nao_carrega_dependencias_pesadas():
+    codigo = "import sys, json, app.main; print(json.dumps([m for m in ('dateparser', 'twilio') if m in sys.modules]))"
+    carregados = json.loads(_python("-c", codigo).stdout.strip().splitlines()[-1])
+    assert carregados == []
+
+def test_importacao_do_app_dentro_do_orcamento():
+    tempo_ms = min(_importtime_ms("app.main") for _ in range(3))
+    assert tempo_ms <= ORCAMENTO_MS, (
+        f"import app.main levou {tempo_ms:.0f} ms (orçamento {ORCAMENTO_MS:.0f} ms). "
+        f"Veja os módulos mais pesados com: python benchmarks/bench_importtime.py"
+    )
@@ -0,0 +1,68 @@
+import pytest
+from datetime import date
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+from app.database import create_missing_indexes
+from app.main import app
+from app import models  # importa os modelos para registrar no metadata
+
+CONSULTAS = {
+    "relatorio": (
+        "SELECT sum(total) FROM venda WHERE data >= :inicio AND data < :fim AND tipo_venda = 'barril_festas'",
+        "ix_venda_data_tipo_venda",
+    ),
+    "lucro_por_produto": (
+        "SELECT sum(lucro) FROM venda WHERE produto_id = 1 AND data >= :inicio AND data < :fim",
+        "ix_venda_produto_id_data",
+    ),
+    "estoque": (
+        "SELECT sum(quantidade) FROM movimentoestoque WHERE produto_id = 1 AND tipo_movimento = 'entrada'",
+        "ix_movimentoestoque_produto_tipo_data",
+    ),
+}
+
+INDICES_DECLARADOS = [indice.name for tabela in SQLModel.metadata.sorted_tables for indice in tabela.indexes]
+
+def _plano(conn, sql: str) -> str:
+    linhas = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), {"inicio": date(2025, 1, 1), "fim": date(2025, 2, 1)})
+    return " | ".join(linha[-1] for linha in linhas)
+
+@pytest.fixture
+def banco_sem_indices(tmp_path):
+    """Banco com as tabelas criadas antes dos índices existirem nos modelos."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for indice in INDICES_DECLARADOS:
+            conn.execute(text(f"DROP INDEX {indice}"))
+    yield engine
+    engine.dispose()
+
+def test_planos_antes_e_depois_da_migracao(banco_sem_indices):
+    with banco_sem_indices.connect() as conn:
+        antes = {nome: _plano(conn, sql) for nome, (sql, _) in CONSULTAS.items()}
+
+    criados = create_missing_indexes(banco_sem_indices)
+
+    with banco_sem_indices.connect() as conn:
+        depois = {nome: _plano(conn, sql) for nome, (sql, _) in CONSULTAS.items()}
+
+    for nome, (_, indice) in CONSULTAS.items():
+        assert indice in criados
+        assert antes[nome].startswith("SCAN"), f"{nome}: {antes[nome]}"
+        assert f"USING INDEX {indice}" in depois[nome], f"{nome}: {antes[nome]} -> {depois[nome]}"
+
+def test_migracao_e_idempotente(banco_sem_indices):
+    assert sorted(create_missing_indexes(banco_sem_indices)) == sorted(INDICES_DECLARADOS)
+    assert create_missing_indexes(banco_sem_indices) == []
+
+def test_app_cria_os_indices_ao_subir(engine):
+    """Bancos anteriores ao índice único recebem o índice na subida do app."""
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS uq_venda_feira_data_produto"))
+
+    with TestClient(app):
+        pass
+
+    assert "uq_venda_feira_data_produto" in {indice["name"] for indice in inspect(engine).get_indexes("venda")}
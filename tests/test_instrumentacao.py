@@ -0,0 +1,85 @@
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app import instrumentacao
+from app.instrumentacao import metricas_http
+from app.main import app, get_current_username
+from app.metricas import Histograma
+
+@pytest.fixture
+def autenticado(client: TestClient):
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    yield client
+
+def test_histograma_no_formato_prometheus():
+    histograma = Histograma(limites_ms=(10, 100))
+    for valor in (5, 50, 500):
+        histograma.observar(valor)
+    linhas = histograma.prometheus("teste_ms", {"rota": "/x"})
+    assert linhas == [
+        'teste_ms_bucket{rota="/x",le="10"} 1',
+        'teste_ms_bucket{rota="/x",le="100"} 2',
+        'teste_ms_bucket{rota="/x",le="+Inf"} 3',
+        'teste_ms_sum{rota="/x"} 555.0',
+        'teste_ms_count{rota="/x"} 3',
+    ]
+
+def test_requisicao_registra_latencia_e_consultas(autenticado: TestClient):
+    metricas_http.limpar()
+    autenticado.get("/estoque")
+    autenticado.get("/estoque")
+
+    metricas = dict(metricas_http.rotas())[("GET", "/estoque")]
+    assert metricas.latencia.como_dict()["quantidade"] == 2
+    assert metricas.por_status == {200: 2}
+    assert metricas.consultas.como_dict()["quantidade"] == 2
+    assert metricas.consultas.percentil(50) >= 1  # ao menos uma consulta SQL por requisição
+
+def test_requisicao_lenta_vai_para_o_log(autenticado: TestClient, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentacao, "LIMITE_REQUISICAO_LENTA_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.requisicoes"):
+        autenticado.get("/estoque")
+    assert any("Requisição lenta: GET /estoque -> 200" in r.getMessage() for r in caplog.records)
+
+def test_metrics_no_formato_prometheus(autenticado: TestClient):
+    metricas_http.limpar()
+    autenticado.get("/estoque")
+    resposta = autenticado.get("/metrics")
+
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"].startswith("text/plain")
+    assert 'chopp_http_latencia_ms_bucket{metodo="GET",rota="/estoque",le="+Inf"} 1' in resposta.text
+    assert 'chopp_http_requisicoes_total{metodo="GET",rota="/estoque",status="200"} 1' in resposta.text
+    assert "chopp_pool_esgotamentos_total" in resposta.text
+    assert "# TYPE chopp_comando_latencia_ms histogram" in resposta.text
+
+def _familia(linha: str) -> str:
+    nome = linha.split("{")[0].split(" ")[0]
+    for sufixo in ("_bucket", "_sum", "_count"):
+        if nome.endswith(sufixo) and not nome.endswith("_total"):
+            return nome[: -len(sufixo)]
+    return nome
+
+def test_metrics_agrupa_as_amostras_de_cada_familia(autenticado: TestClient):
+    metricas_http.limpar()
+    autenticado.get("/estoque")
+    autenticado.get("/produtos")
+    texto = autenticado.get("/metrics").text
+
+    # Cada família: a linha TYPE e, logo em seguida, todas as suas amostras
+    familias, atual = [], None
+    for linha in texto.splitlines():
+        if linha.startswith("# TYPE "):
+            atual = linha.split()[2]
+            familias.append(atual)
+        else:
+            assert _familia(linha) == atual, f"{linha!r} fora do bloco de {atual}"
+    assert len(familias) == len(set(familias))
+    assert texto.count('chopp_http_latencia_ms_count{') == 2
+    assert texto.count('chopp_comando_erros_total{') >= 2
+
+    try:
+        from prometheus_client.parser import text_string_to_metric_families
+    except ImportError:
+        return
+    assert {familia.name for familia in text_string_to_metric_families(texto)} >= {"chopp_http_latencia_ms"}
@@ -1,6 +1,6 @@
 import pytest
 from datetime import date
-from app.logic import calcular_relatorio_geral, calcular_ranking_dias, calcular_lucro_por_produto
+from app.logic import calcular_relatorio_geral, calcular_ranking_dias, calcular_lucro_por_produto, LucroProduto
 from app.models import Venda, Produto
 
 # --- Dados de Teste ---
@@ -19,8 +19,8 @@ def vendas_de_exemplo():
 def produtos_de_exemplo():
     """Fornece uma lista de Produtos para usar nos testes."""
     return [
-        Produto(id=1, nome="Chopp Pilsen"),
-        Produto(id=2, nome="Chopp IPA"),
+        Produto(id=1, nome="Chopp Pilsen", volume_litros=50),
+        Produto(id=2, nome="Chopp IPA", volume_litros=30),
     ]
 
 # --- Testes da Lógica ---
@@ -47,10 +47,16 @@ def test_calcular_ranking_dias(vendas_de_exemplo):
     ranking = calcular_ranking_dias(vendas_de_exemplo)
     
     assert ranking is not None
-    assert len(ranking) == 3
-    assert ranking[0] == ("Wednesday", 250.0) # Dia mais forte
-    assert ranking[1] == ("Tuesday", 200.0) # 150 + 50
-    assert ranking[2] == ("Thursday", 0.0)
+    assert len(ranking) == 2 # Quinta só tem boleto, que não conta
+    assert ranking[0] == {"dia_semana": 2, "nome": "Quarta-feira", "total": 250.0, "vendas": 1, "dias": 1, "media_por_dia": 250.0}
+    assert ranking[1] == {"dia_semana": 1, "nome": "Terça-feira", "total": 200.0, "vendas": 2, "dias": 1, "media_por_dia": 200.0} # 150 + 50
+
+def test_calcular_ranking_dias_usa_a_data_e_nao_o_texto(vendas_de_exemplo):
+    """O dia da semana vem da data; o texto gravado (locale, ETL) é ignorado."""
+    vendas_de_exemplo[0].dia_semana = "terça"
+    vendas_de_exemplo[2].dia_semana = None
+    ranking = calcular_ranking_dias(vendas_de_exemplo)
+    assert [dia["nome"] for dia in ranking] == ["Quarta-feira", "Terça-feira"]
 
 def test_calcular_lucro_por_produto(vendas_de_exemplo, produtos_de_exemplo):
     """Testa o cálculo de lucro por produto."""
@@ -58,5 +64,22 @@ def test_calcular_lucro_por_produto(vendas_de_exemplo, produtos_de_exemplo):
 
     assert lucro is not None
     assert len(lucro) == 2
-    assert lucro[0] == ("Chopp Pilsen", 345.0) # 125 + 220
-    assert lucro[1] == ("Chopp IPA", 38.0)
+    assert [(item.nome, item.lucro) for item in lucro] == [("Chopp Pilsen", 345.0), ("Chopp IPA", 38.0)] # 125 + 220
+    assert lucro[0].receita == 400.0 # boleto é ignorado
+    assert lucro[0].vendas == 2
+    assert lucro[0].margem == pytest.approx(86.25)
+
+def test_calcular_lucro_por_produto_barris_e_litros(produtos_de_exemplo):
+    """Barris vendidos, litros e custo dos barris fechados somados por produto."""
+    vendas = [
+        Venda(data=date(2025, 7, 5), produto_id=1, tipo_venda="feira", total=1000.0, lucro=800.0,
+              quantidade_barris_vendidos=1.0, dia_semana="Saturday"),
+        Venda(data=date(2025, 7, 6), produto_id=1, tipo_venda="barril_festas", total=1000.0, lucro=440.0,
+              quantidade_barris_vendidos=2.0, custo_total_venda=560.0, dia_semana="Sunday"),
+        Venda(data=date(2025, 7, 6), produto_id=99, tipo_venda="feira", total=300.0, lucro=300.0,
+              quantidade_barris_vendidos=1.0, dia_semana="Sunday"), # produto inexistente
+    ]
+    assert calcular_lucro_por_produto(vendas, produtos_de_exemplo) == [
+        LucroProduto(produto_id=1, nome="Chopp Pilsen", lucro=1240.0, receita=2000.0, barris_vendidos=3.0,
+                     litros=150.0, custo_total_venda=560.0, vendas=2),
+    ]
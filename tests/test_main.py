@@ -1,11 +1,14 @@
 import pytest
-from datetime import date, datetime
+from datetime import date
 from unittest.mock import patch
 from fastapi.testclient import TestClient
-from sqlmodel import Session
-from app.models import Produto, Venda
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.main import app, get_current_username, _get_estoque_logic
+from app.models import Produto, Venda, MovimentoEstoque
 
-@patch("app.main.RequestValidator.validate", return_value=True)
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
 def test_get_report_data_calculo_correto(mock_validate, client: TestClient, session: Session):
     produto_teste = Produto(id=1, nome="Chopp Teste", preco_venda_litro=20.0,
                             preco_venda_barril_fechado=500.0, volume_litros=50)
@@ -19,19 +22,157 @@ def test_get_report_data_calculo_correto(mock_validate, client: TestClient, sess
     session.add_all(vendas)
     session.commit()
 
-    with patch("dateparser.parse") as mock_date:
-        mock_date.return_value = datetime(2025, 7, 15)
-        response = client.post("/whatsapp/webhook", data={"Body": "relatorio julho 2025"})
+    response = client.post("/whatsapp/webhook", data={"Body": "relatorio julho 2025"})
 
     assert response.status_code == 200
     assert "Receita bruta: R$ 400.00" in response.text
     assert "Dias registrados: 2" in response.text
 
-@patch("app.main.RequestValidator.validate", return_value=True)
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
 def test_webhook_relatorio_sem_dados(mock_validate, client: TestClient):
-    with patch("dateparser.parse") as mock_date:
-        mock_date.return_value = datetime(2025, 8, 15)
-        response = client.post("/whatsapp/webhook", data={"Body": "relatorio agosto 2025"})
+    response = client.post("/whatsapp/webhook", data={"Body": "relatorio agosto 2025"})
 
     assert response.status_code == 200
     assert "Nenhum registro de vendas encontrado para 8/2025" in response.text
+
+def test_estoque_uma_consulta_para_todos_os_produtos(isolated_session: Session):
+    for i in range(1, 6):
+        isolated_session.add(Produto(id=i, nome=f"Chopp {i}", preco_venda_litro=20.0,
+                                     preco_venda_barril_fechado=500.0, volume_litros=50))
+    movimentos = [
+        ("entrada", 10), ("saida_manual", 1), ("saida_venda", 0.5), ("saida_venda_barril", 2),
+    ]
+    for tipo, quantidade in movimentos:
+        isolated_session.add(MovimentoEstoque(produto_id=1, tipo_movimento=tipo, quantidade=quantidade,
+                                              data_movimento=date(2025, 7, 1)))
+    isolated_session.add(MovimentoEstoque(produto_id=2, tipo_movimento="entrada", quantidade=3,
+                                          data_movimento=date(2025, 7, 1)))
+    isolated_session.commit()
+
+    consultas = []
+    engine = isolated_session.get_bind()
+    registrar = lambda *args, **kwargs: consultas.append(args[2])
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        estoque = _get_estoque_logic(isolated_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+    assert len(consultas) == 1
+    assert estoque["Chopp 1"]["quantidade_barris"] == 6.5
+    assert estoque["Chopp 1"]["volume_litros_total"] == 325.0
+    assert estoque["Chopp 2"]["quantidade_barris"] == 3
+    assert estoque["Chopp 5"] == {
+        "quantidade_barris": 0.0, "volume_litros_total": 0.0,
+        "preco_venda_litro": 20.0, "preco_venda_barril_fechado": 500.0,
+    }
+
+def test_venda_de_feira_repetida_no_dia_e_recusada(client: TestClient, session: Session):
+    session.add(Produto(id=102, nome="Chopp Feira", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.commit()
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    dados = {"produto_id": 102, "data": "2019-04-06", "tipo_venda": "feira", "total": 400.0}
+    assert client.post("/registrar_venda", data=dados).status_code == 200
+    resposta = client.post("/registrar_venda", data=dados)
+
+    assert resposta.status_code == 409
+    assert session.exec(select(Venda).where(Venda.produto_id == 102)).all()[0].total == 400.0
+
+def test_outros_erros_de_integridade_nao_viram_venda_repetida(client: TestClient, session: Session):
+    session.add(Produto(id=103, nome="Chopp Integridade", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.commit()
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    dados = {"produto_id": 103, "data": "2019-04-13", "tipo_venda": "feira", "total": 400.0}
+    erro = IntegrityError("INSERT INTO venda ...", {}, Exception("NOT NULL constraint failed: venda.dia_semana"))
+    with patch.object(session, "commit", side_effect=erro), pytest.raises(IntegrityError):
+        client.post("/registrar_venda", data=dados)
+
+def test_series_em_formato_colunar(client: TestClient, session: Session):
+    session.add(Produto(id=130, nome="Chopp Série", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.add_all([
+        Venda(data=date(2019, 12, 6), produto_id=130, tipo_venda="feira", total=600.0, dia_semana="Friday", lucro=600.0),
+        Venda(data=date(2019, 12, 7), produto_id=130, tipo_venda="feira", total=900.0, dia_semana="Saturday", lucro=900.0),
+    ])
+    session.commit()
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    resposta = client.get("/series", params={"inicio": "2019-12-01", "fim": "2020-01-01", "intervalo": "mes", "por": "produto_id"})
+    assert resposta.status_code == 200
+    serie = resposta.json()
+    indice = serie["produto_id"].index(130)
+    assert serie["periodo"][indice] == "2019-12-01"
+    assert serie["receita_bruta"][indice] == 1500.0
+    assert len(serie["periodo"]) == len(serie["lucro"])
+
+    assert client.get("/series", params={"inicio": "2019-12-01", "fim": "2020-01-01", "intervalo": "hora"}).status_code == 400
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_webhook_melhores_dias_e_mapa(mock_validate, client: TestClient, session: Session):
+    session.add(Produto(id=131, nome="Chopp Dias", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.add_all([
+        Venda(data=date(2018, 6, 2), produto_id=131, tipo_venda="feira", total=1200.0, dia_semana="", lucro=0.0),
+        Venda(data=date(2018, 6, 9), produto_id=131, tipo_venda="feira", total=800.0, dia_semana="sábado", lucro=0.0),
+        Venda(data=date(2018, 6, 8), produto_id=131, tipo_venda="feira", total=700.0, dia_semana="Friday", lucro=0.0),
+    ])
+    session.commit()
+
+    resposta = client.post("/whatsapp/webhook", data={"Body": "melhores dias 6 2018"})
+    assert "1. Sábado: R$ 2000.00 (2 dia(s), média R$ 1000.00)" in resposta.text
+    assert "2. Sexta-feira: R$ 700.00" in resposta.text
+
+    mapa = client.post("/whatsapp/webhook", data={"Body": "mapa dias trimestre 2 2018"})
+    assert "2º trimestre de 2018" in mapa.text
+    assert "Sáb     -     -  2.0k" in mapa.text
+    assert "Melhor dia: Sábado (R$ 2000.00)" in mapa.text
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_webhook_relatorio_barril(mock_validate, client: TestClient, session: Session):
+    session.add(Produto(id=140, nome="Chopp Barril", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.add_all([
+        Venda(data=date(2018, 3, 3), produto_id=140, tipo_venda="feira", total=1000.0, dia_semana="Saturday",
+              lucro=800.0, quantidade_barris_vendidos=1.0),
+        Venda(data=date(2018, 3, 4), produto_id=140, tipo_venda="barril_festas", total=1000.0, dia_semana="Sunday",
+              lucro=440.0, quantidade_barris_vendidos=2.0, custo_total_venda=560.0),
+    ])
+    session.commit()
+
+    resposta = client.post("/whatsapp/webhook", data={"Body": "relatorio barril 3 2018"})
+    assert "- Chopp Barril:" in resposta.text
+    assert "Lucro: R$ 1240.00 (margem 62.0%)" in resposta.text
+    assert "Barris Vendidos: 3.00 (150.0 L)" in resposta.text
+    assert "Custo dos Barris Fechados: R$ 560.00" in resposta.text
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_relatorio_anual_comando_e_endpoint(mock_validate, client: TestClient, session: Session):
+    session.add(Produto(id=150, nome="Chopp Anual", preco_venda_litro=20.0,
+                        preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.add_all([
+        Venda(data=date(2016, 5, 7), produto_id=150, tipo_venda="feira", total=1000.0, custo_func=200.0,
+              dia_semana="Saturday", lucro=800.0),
+        Venda(data=date(2017, 5, 6), produto_id=150, tipo_venda="feira", total=1500.0, custo_func=200.0,
+              dia_semana="Saturday", lucro=1300.0),
+        Venda(data=date(2017, 8, 12), produto_id=150, tipo_venda="feira", total=500.0,
+              dia_semana="Saturday", lucro=500.0),
+    ])
+    session.commit()
+
+    resposta = client.post("/whatsapp/webhook", data={"Body": "relatorio anual 2017"})
+    assert "Receita bruta: R$ 2000.00" in resposta.text
+    assert "05: R$ 1500.00 / R$ 1300.00 (1)" in resposta.text
+    assert "08: R$ 500.00 / R$ 500.00 (1)" in resposta.text
+    assert "Receita bruta: +100.00%" in resposta.text
+    assert "Dias registrados: +1" in resposta.text
+
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    relatorio = client.get("/relatorio_anual/2017").json()
+    assert relatorio["total"]["receita_liquida"] == 1800.0
+    assert relatorio["meses"][4]["receita_liquida_ano_anterior"] == 800.0
+    assert relatorio["variacao"]["receita_liquida"] == {"absoluta": 1000.0, "percentual": 125.0}
+    assert client.get("/relatorio_anual/2015").status_code == 404
@@ -0,0 +1,57 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.main import app, get_current_username
+from app.models import Produto
+from app.paginas import Pagina
+
+@pytest.fixture
+def autenticado(client: TestClient):
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    yield client
+
+def test_formulario_com_etag_e_gzip(autenticado: TestClient):
+    resposta = autenticado.get("/", headers={"Accept-Encoding": "gzip"})
+    assert resposta.status_code == 200
+    assert resposta.headers["content-encoding"] == "gzip"
+    assert "<form" in resposta.text
+    etag = resposta.headers["etag"]
+
+    revalidacao = autenticado.get("/", headers={"If-None-Match": etag})
+    assert revalidacao.status_code == 304
+    assert revalidacao.content == b""
+    assert revalidacao.headers["etag"] == etag
+
+    sem_gzip = autenticado.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sem_gzip.headers
+    assert sem_gzip.text == resposta.text
+
+def test_pagina_recarrega_quando_o_arquivo_muda(tmp_path):
+    arquivo = tmp_path / "index.html"
+    arquivo.write_text("<h1>v1</h1>", encoding="utf-8")
+    pagina = Pagina(arquivo, recarregar=True)
+    etag_v1 = pagina.atual().etag
+
+    arquivo.write_text("<h1>v2</h1>", encoding="utf-8")
+    os.utime(arquivo, (1, 1))  # garante outra data de modificação
+    assert pagina.atual().conteudo == b"<h1>v2</h1>"
+    assert pagina.etag != etag_v1
+
+    fixa = Pagina(arquivo)
+    fixa.atual()
+    arquivo.write_text("<h1>v3</h1>", encoding="utf-8")
+    assert fixa.atual().conteudo == b"<h1>v2</h1>"  # sem recarregar, fica a versão lida na subida
+
+def test_produtos_respondem_304_ate_mudar(autenticado: TestClient, session: Session):
+    resposta = autenticado.get("/produtos")
+    assert resposta.status_code == 200
+    assert isinstance(resposta.json(), list)
+    etag = resposta.headers["etag"]
+    assert autenticado.get("/produtos", headers={"If-None-Match": etag}).status_code == 304
+
+    session.add(Produto(nome="Chopp Teste ETag", preco_venda_litro=20.0, preco_venda_barril_fechado=500.0, volume_litros=50))
+    session.commit()
+    depois = autenticado.get("/produtos", headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert "Chopp Teste ETag" in [p["nome"] for p in depois.json()]
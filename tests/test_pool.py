@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.pool import StaticPool, SingletonThreadPool
+from app.database import criar_engine, estatisticas_pool, opcoes_pool, PoolMedido
+from app.main import app, get_current_username
+
+def test_opcoes_do_pool_vem_do_ambiente(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "7.5")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "120")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+
+    opcoes = opcoes_pool("postgresql://u:s@host/db")
+    assert opcoes == {
+        "pool_pre_ping": False,
+        "pool_recycle": 120,
+        "poolclass": PoolMedido,
+        "pool_size": 3,
+        "max_overflow": 2,
+        "pool_timeout": 7.5,
+    }
+    # SQLite em memória não usa fila: só pre-ping e recycle
+    assert set(opcoes_pool("sqlite://")) == {"pool_pre_ping", "pool_recycle"}
+
+def test_pool_padrao_usa_pre_ping(monkeypatch, tmp_path):
+    for variavel in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_TIMEOUT", "DB_POOL_RECYCLE", "DB_POOL_PRE_PING"):
+        monkeypatch.delenv(variavel, raising=False)
+    engine = criar_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    assert isinstance(engine.pool, PoolMedido)
+    assert engine.pool._pre_ping is True
+    assert engine.pool._recycle == 1800
+    assert engine.pool.size() == 5
+    engine.dispose()
+
+    memoria = criar_engine("sqlite://")
+    assert isinstance(memoria.pool, (StaticPool, SingletonThreadPool))
+    memoria.dispose()
+
+def test_estatisticas_de_checkout_overflow_e_espera(monkeypatch, tmp_path):
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "0.2")
+    engine = criar_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    estatisticas_pool.zerar()
+
+    conexoes = [engine.connect() for _ in range(3)]
+    for conexao in conexoes:
+        conexao.execute(text("SELECT 1"))
+    dados = estatisticas_pool.como_dict(engine.pool)
+    assert dados["em_uso"] == 3
+    assert dados["overflow"] == 1
+    assert dados["checkouts"] == 3
+    assert dados["conexoes_abertas"] == 3
+
+    # Pool esgotado (2 + 1 de overflow): o quarto checkout espera o timeout
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    dados = estatisticas_pool.como_dict(engine.pool)
+    assert dados["esgotamentos"] == 1
+    assert dados["espera_max_ms"] >= 200
+
+    for conexao in conexoes:
+        conexao.close()
+    dados = estatisticas_pool.como_dict(engine.pool)
+    assert dados["em_uso"] == 0
+    assert dados["checkins"] == 3
+    engine.dispose()
+
+def test_endpoint_debug_pool(client):
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    resposta = client.get("/debug/pool")
+    assert resposta.status_code == 200
+    dados = resposta.json()
+    assert dados["pool"] == "PoolMedido"
+    assert {"em_uso", "overflow", "ociosas", "espera_media_ms", "espera_max_ms", "checkouts"} <= set(dados)
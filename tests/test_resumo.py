@@ -0,0 +1,140 @@
+import random
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event
+from sqlmodel import Session, select
+from app.logic import calcular_relatorio_geral
+from app.models import Venda, Produto, ResumoMensal
+from app.resumo import relatorio_do_resumo, relatorio_anual, reconstruir_resumo_mensal, eh_intervalo_mensal, TODOS_OS_TIPOS
+
+def _mes(ano: int, mes: int):
+    return date(ano, mes, 1), date(ano + (mes == 12), (mes % 12) + 1, 1)
+
+def _referencia(session: Session, inicio: date, fim: date, tipo_venda=None):
+    query = select(Venda).where(Venda.data >= inicio, Venda.data < fim)
+    if tipo_venda:
+        query = query.where(Venda.tipo_venda == tipo_venda)
+    return calcular_relatorio_geral(session.exec(query).all())
+
+@pytest.fixture
+def vendas_aleatorias(isolated_session: Session):
+    rng = random.Random(42)
+    isolated_session.add(Produto(id=1, nome="Chopp Pilsen 50L", preco_venda_litro=20.0,
+                                 preco_venda_barril_fechado=500.0, volume_litros=50))
+    dias_com_feira = set()
+    for _ in range(300):
+        tipo = rng.choice(["feira", "feira", "barril_festas", "boleto"])
+        data = date(2024, 11, 1) + timedelta(days=rng.randrange(450))
+        if tipo == "feira" and data in dias_com_feira:
+            tipo = "barril_festas"  # uma venda de feira por dia e produto
+        if tipo == "feira":
+            dias_com_feira.add(data)
+        isolated_session.add(Venda(
+            data=data, produto_id=1, tipo_venda=tipo, dia_semana=data.strftime('%A'),
+            total=0.0 if tipo == "boleto" else round(rng.uniform(50, 900), 2),
+            custo_func=rng.choice([None, 40.0, 60.0]), custo_copos=rng.choice([None, 7.5]),
+            custo_boleto=round(rng.uniform(10, 90), 2) if tipo == "boleto" else None,
+            lucro=0.0,
+        ))
+        # Commits em lotes para exercitar a atualização incremental do resumo
+        if rng.random() < 0.1:
+            isolated_session.commit()
+    isolated_session.commit()
+    return isolated_session
+
+def test_eh_intervalo_mensal():
+    assert eh_intervalo_mensal(date(2025, 1, 1), date(2026, 1, 1))
+    assert not eh_intervalo_mensal(date(2025, 1, 1), date(2025, 1, 15))
+    assert not eh_intervalo_mensal(date(2025, 2, 1), date(2025, 2, 1))
+
+@pytest.mark.parametrize("tipo_venda", [None, "feira", "barril_festas", "boleto"])
+def test_resumo_igual_ao_calculo_de_referencia(vendas_aleatorias: Session, tipo_venda):
+    for ano, mes in [(2024, 11), (2024, 12), (2025, 1), (2025, 6), (2026, 1), (2026, 5)]:
+        inicio, fim = _mes(ano, mes)
+        assert relatorio_do_resumo(vendas_aleatorias, inicio, fim, tipo_venda) == _referencia(vendas_aleatorias, inicio, fim, tipo_venda)
+
+    # Ano inteiro: 12 linhas somadas, inclusive dias distintos
+    inicio, fim = date(2025, 1, 1), date(2026, 1, 1)
+    assert relatorio_do_resumo(vendas_aleatorias, inicio, fim, tipo_venda) == _referencia(vendas_aleatorias, inicio, fim, tipo_venda)
+
+def test_resumo_tem_uma_linha_por_mes_para_o_ano(vendas_aleatorias: Session):
+    linhas = vendas_aleatorias.exec(
+        select(ResumoMensal).where(ResumoMensal.ano == 2025, ResumoMensal.tipo_venda == TODOS_OS_TIPOS)
+    ).all()
+    assert sorted(l.mes for l in linhas) == list(range(1, 13))
+
+def test_resumo_acompanha_alteracoes_e_remocoes(vendas_aleatorias: Session):
+    vendas = vendas_aleatorias.exec(select(Venda).where(Venda.data >= date(2025, 3, 1), Venda.data < date(2025, 4, 1))).all()
+    vendas[0].total = (vendas[0].total or 0.0) + 1000.0
+    vendas[1].data = date(2026, 3, 10)  # muda para um mês sem vendas
+    vendas_aleatorias.delete(vendas[2])
+    vendas_aleatorias.commit()
+
+    for ano, mes in [(2025, 3), (2026, 3)]:
+        inicio, fim = _mes(ano, mes)
+        assert relatorio_do_resumo(vendas_aleatorias, inicio, fim) == _referencia(vendas_aleatorias, inicio, fim)
+
+def test_resumo_agrega_so_os_meses_alterados(vendas_aleatorias: Session):
+    # Meses distantes no mesmo flush: os meses entre eles não são lidos
+    consultas = []
+    def capturar(conn, cursor, sql, parametros, contexto, executemany):
+        if "GROUP BY" in sql and "FROM venda" in sql:
+            consultas.append((sql, parametros))
+
+    primeira = vendas_aleatorias.exec(select(Venda).where(Venda.data < date(2024, 12, 1))).first()
+    ultima = vendas_aleatorias.exec(select(Venda).where(Venda.data >= date(2026, 1, 1))).first()
+    primeira.total = (primeira.total or 0.0) + 10.0
+    ultima.total = (ultima.total or 0.0) + 10.0
+    event.listen(vendas_aleatorias.get_bind(), "before_cursor_execute", capturar)
+    try:
+        vendas_aleatorias.commit()
+    finally:
+        event.remove(vendas_aleatorias.get_bind(), "before_cursor_execute", capturar)
+
+    limites = {str(valor) for _, parametros in consultas for valor in parametros if str(valor)[:2] == "20"}
+    assert consultas and limites == {"2024-11-01", "2024-12-01", "2026-01-01", "2026-02-01"}
+    for ano, mes in [(2024, 11), (2026, 1)]:
+        inicio, fim = _mes(ano, mes)
+        assert relatorio_do_resumo(vendas_aleatorias, inicio, fim) == _referencia(vendas_aleatorias, inicio, fim)
+
+def test_reconstruir_resumo_mensal(vendas_aleatorias: Session):
+    inicio, fim = date(2025, 1, 1), date(2026, 1, 1)
+    esperado = relatorio_do_resumo(vendas_aleatorias, inicio, fim)
+
+    for linha in vendas_aleatorias.exec(select(ResumoMensal)).all():
+        vendas_aleatorias.delete(linha)
+    vendas_aleatorias.commit()
+    assert relatorio_do_resumo(vendas_aleatorias, inicio, fim) is None
+
+    assert reconstruir_resumo_mensal(vendas_aleatorias) == 15  # nov/2024 a jan/2026
+    assert relatorio_do_resumo(vendas_aleatorias, inicio, fim) == esperado
+
+def test_relatorio_anual_igual_ao_calculo_de_referencia(vendas_aleatorias: Session):
+    relatorio = relatorio_anual(vendas_aleatorias, 2025)
+
+    total = _referencia(vendas_aleatorias, date(2025, 1, 1), date(2026, 1, 1))
+    for campo in ("receita_bruta", "receita_liquida", "dias_registrados"):
+        assert relatorio["total"][campo] == pytest.approx(total[campo])
+    assert [item["mes"] for item in relatorio["meses"]] == list(range(1, 13))
+    for item in relatorio["meses"]:
+        esperado = _referencia(vendas_aleatorias, *_mes(2025, item["mes"]))
+        assert item["receita_bruta"] == pytest.approx(esperado["receita_bruta"])
+        assert item["receita_liquida"] == pytest.approx(esperado["receita_liquida"])
+        assert item["gastos"] == pytest.approx(esperado["receita_bruta"] - esperado["receita_liquida"])
+        assert item["dias_registrados"] == esperado["dias_registrados"]
+
+    # 2024 só tem novembro e dezembro
+    anterior = _referencia(vendas_aleatorias, date(2024, 1, 1), date(2025, 1, 1))
+    assert relatorio["ano_anterior"]["receita_liquida"] == pytest.approx(anterior["receita_liquida"])
+    assert relatorio["meses"][0]["receita_liquida_ano_anterior"] is None
+    assert relatorio["meses"][10]["receita_liquida_ano_anterior"] == pytest.approx(
+        _referencia(vendas_aleatorias, *_mes(2024, 11))["receita_liquida"])
+    assert relatorio["variacao"]["dias_registrados"]["absoluta"] == total["dias_registrados"] - anterior["dias_registrados"]
+    assert relatorio["variacao"]["receita_bruta"]["percentual"] == pytest.approx(
+        (total["receita_bruta"] / anterior["receita_bruta"] - 1) * 100, abs=0.01)
+
+def test_relatorio_anual_sem_ano_anterior(vendas_aleatorias: Session):
+    relatorio = relatorio_anual(vendas_aleatorias, 2024)
+    assert relatorio["ano_anterior"] is None
+    assert relatorio["variacao"] is None
+    assert relatorio_anual(vendas_aleatorias, 2023) is None
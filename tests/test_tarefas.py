@@ -0,0 +1,135 @@
+import threading
+import time
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from app.main import _processar_comando
+from app.tarefas import EnviadorFalso, FilaRelatorios, Tarefa, fila_relatorios
+
+@pytest.fixture
+def fila():
+    fila = FilaRelatorios(enviador=EnviadorFalso(), workers=2, max_tentativas=3, atraso_base=0.01)
+    yield fila
+    fila.parar()
+
+def test_tarefa_gera_e_envia(fila):
+    fila.enfileirar(Tarefa("relatorio anual", lambda: "Relatório 2019", "whatsapp:+5511999990000"))
+    assert fila.aguardar(timeout=5)
+
+    assert fila.enviador.enviadas == [("whatsapp:+5511999990000", "Relatório 2019")]
+    estatisticas = fila.estatisticas()
+    assert estatisticas["concluidas"] == 1
+    assert estatisticas["pendentes"] == estatisticas["profundidade"] == 0
+    assert estatisticas["duracao"]["quantidade"] == 1
+
+def test_falha_e_tentada_de_novo(fila):
+    chamadas = []
+
+    def gerar_instavel():
+        chamadas.append(1)
+        if len(chamadas) < 3:
+            raise RuntimeError("banco indisponível")
+        return "ok"
+
+    fila.enfileirar(Tarefa("comparar", gerar_instavel, "whatsapp:+5511999990000"))
+    assert fila.aguardar(timeout=5)
+
+    assert len(chamadas) == 3
+    assert fila.enviador.enviadas == [("whatsapp:+5511999990000", "ok")]
+    estatisticas = fila.estatisticas()
+    assert estatisticas["novas_tentativas"] == 2
+    assert estatisticas["falhas"] == 0
+    assert estatisticas["concluidas"] == 1
+
+def test_falha_definitiva_apos_todas_as_tentativas(fila):
+    class EnviadorQuebrado:
+        def enviar(self, destinatario, texto):
+            raise ConnectionError("Twilio fora do ar")
+
+    fila.enviador = EnviadorQuebrado()
+    fila.enfileirar(Tarefa("comparar", lambda: "ok", "whatsapp:+5511999990000"))
+    assert fila.aguardar(timeout=5)
+
+    estatisticas = fila.estatisticas()
+    assert estatisticas["falhas"] == 1
+    assert estatisticas["novas_tentativas"] == 2
+    assert estatisticas["duracao"]["quantidade"] == 3
+
+def test_parar_cancela_as_novas_tentativas_agendadas():
+    fila = FilaRelatorios(enviador=EnviadorFalso(), workers=1, max_tentativas=3, atraso_base=60.0)
+    def gerar_quebrado():
+        raise RuntimeError("banco indisponível")
+    fila.enfileirar(Tarefa("comparar", gerar_quebrado, "whatsapp:+5511999990000"))
+    for _ in range(500):
+        if fila.estatisticas()["novas_tentativas"]:
+            break
+        time.sleep(0.01)
+
+    fila.parar()
+
+    # A tarefa que esperava a nova tentativa termina como falha, sem timer pendente
+    assert fila.aguardar(timeout=1)
+    estatisticas = fila.estatisticas()
+    assert (estatisticas["falhas"], estatisticas["pendentes"], estatisticas["em_execucao"]) == (1, 0, 0)
+    assert not [t for t in threading.enumerate() if isinstance(t, threading.Timer) and t.is_alive()]
+
+@patch("twilio.request_validator.RequestValidator.validate", return_value=True)
+def test_webhook_adia_relatorio_anual(mock_validate, client: TestClient, monkeypatch):
+    monkeypatch.setenv("RELATORIOS_EM_SEGUNDO_PLANO", "true")
+    enviador = EnviadorFalso()
+    monkeypatch.setattr(fila_relatorios, "enviador", enviador)
+    remetente = "whatsapp:+5511988887777"
+
+    with patch("app.main.get_report_data", return_value=None), patch("app.main.get_relatorio_anual", return_value=None):
+        resposta = client.post("/whatsapp/webhook", data={"Body": "relatorio anual 2019", "From": remetente})
+        assert "Gerando relatório" in resposta.text
+        assert fila_relatorios.aguardar(timeout=5)
+
+        # Comandos rápidos continuam respondidos na própria requisição
+        resposta_mensal = client.post("/whatsapp/webhook", data={"Body": "relatorio julho 2019", "From": remetente})
+
+    assert enviador.enviadas == [(remetente, "Nenhum registro para o ano 2019")]
+    assert "Nenhum registro de vendas encontrado para 7/2019" in resposta_mensal.text
+
+def test_relatorio_em_segundo_plano_que_falha_e_tentado_de_novo(engine, monkeypatch):
+    monkeypatch.setenv("RELATORIOS_EM_SEGUNDO_PLANO", "true")
+    monkeypatch.setattr(fila_relatorios, "enviador", EnviadorFalso())
+    monkeypatch.setattr(fila_relatorios, "atraso_base", 0.01)
+    remetente = "whatsapp:+5511977776666"
+    antes = fila_relatorios.estatisticas()
+
+    # Primeira tentativa com o banco fora do ar; a segunda gera o relatório
+    with patch("app.main.get_relatorio_anual", side_effect=[RuntimeError("banco indisponível"), None]):
+        resposta = _processar_comando("relatorio anual 2019", None, remetente)
+        assert "Gerando relatório" in str(resposta)
+        assert fila_relatorios.aguardar(timeout=5)
+
+    depois = fila_relatorios.estatisticas()
+    assert fila_relatorios.enviador.enviadas == [(remetente, "Nenhum registro para o ano 2019")]
+    assert depois["novas_tentativas"] - antes["novas_tentativas"] == 1
+    assert depois["concluidas"] - antes["concluidas"] == 1
+    assert depois["falhas"] == antes["falhas"]
+
+def test_relatorio_em_segundo_plano_avisa_a_falha_definitiva(engine, monkeypatch):
+    monkeypatch.setenv("RELATORIOS_EM_SEGUNDO_PLANO", "true")
+    monkeypatch.setattr(fila_relatorios, "enviador", EnviadorFalso())
+    monkeypatch.setattr(fila_relatorios, "atraso_base", 0.01)
+    remetente = "whatsapp:+5511977776666"
+    antes = fila_relatorios.estatisticas()
+
+    with patch("app.main.get_relatorio_anual", side_effect=RuntimeError("banco indisponível")):
+        _processar_comando("relatorio anual 2019", None, remetente)
+        assert fila_relatorios.aguardar(timeout=5)
+
+    assert fila_relatorios.estatisticas()["falhas"] - antes["falhas"] == 1
+    [(destinatario, texto)] = fila_relatorios.enviador.enviadas
+    assert destinatario == remetente and "Tente novamente mais tarde" in texto
+
+def test_argumentos_invalidos_sao_respondidos_na_hora(engine, monkeypatch):
+    monkeypatch.setenv("RELATORIOS_EM_SEGUNDO_PLANO", "true")
+    antes = fila_relatorios.estatisticas()
+
+    resposta = _processar_comando("relatorio anual abc", None, "whatsapp:+5511977776666")
+
+    assert "Formato inválido. Use: relatorio anual &lt;ano&gt;" in str(resposta)
+    assert fila_relatorios.estatisticas()["pendentes"] == antes["pendentes"]
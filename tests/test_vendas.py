@@ -0,0 +1,110 @@
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from app.main import app, get_current_username
+from app.models import MovimentoEstoque, Produto, SaldoEstoque, Venda
+from app.vendas import DadosVenda, ErroVenda, linhas_do_csv, montar_venda, venda_de_feira_duplicada
+
+@pytest.fixture
+def produto(client: TestClient, session: Session) -> Produto:
+    produto = session.get(Produto, 110)
+    if produto is None:
+        produto = Produto(id=110, nome="Chopp Lote", preco_venda_litro=20.0,
+                          preco_venda_barril_fechado=500.0, volume_litros=50)
+        session.add(produto)
+        session.add(MovimentoEstoque(produto_id=110, tipo_movimento="entrada", quantidade=10,
+                                     custo_unitario=300.0, data_movimento=date(2019, 8, 1)))
+        session.commit()
+    app.dependency_overrides[get_current_username] = lambda: "teste"
+    return produto
+
+def test_montar_venda_segue_as_regras_de_cada_tipo():
+    produto = Produto(id=1, nome="Chopp", preco_venda_litro=20.0, preco_venda_barril_fechado=500.0, volume_litros=50)
+
+    venda, movimento = montar_venda(DadosVenda(data=date(2019, 8, 3), produto_id=1, tipo_venda="feira",
+                                               total=1000.0, custo_func=200.0, custo_copos=30.0), produto)
+    assert venda.lucro == 770.0
+    assert movimento.tipo_movimento == "saida_venda" and movimento.quantidade == 1.0
+
+    venda, movimento = montar_venda(DadosVenda(data=date(2019, 8, 3), produto_id=1, tipo_venda="barril_festas",
+                                               quantidade_barris_vendidos=2), produto, custo_medio_barril=300.0)
+    assert (venda.total, venda.custo_total_venda, venda.lucro) == (1000.0, 600.0, 400.0)
+
+    venda, movimento = montar_venda(DadosVenda(data=date(2019, 8, 10), produto_id=1, tipo_venda="boleto",
+                                               custo_boleto=350.0), produto)
+    assert (venda.lucro, movimento) == (-350.0, None)
+
+    with pytest.raises(ErroVenda, match="obrigatório"):
+        montar_venda(DadosVenda(data=date(2019, 8, 3), produto_id=1, tipo_venda="feira"), produto)
+
+def test_lote_grava_tudo_em_uma_transacao(client: TestClient, session: Session, produto: Produto):
+    saldo_antes = session.get(SaldoEstoque, produto.id).quantidade_barris
+    resposta = client.post("/vendas/lote", json={"vendas": [
+        {"data": "2019-08-03", "produto_id": 110, "tipo_venda": "feira", "total": 1000.0, "custo_func": 200.0},
+        {"data": "2019-08-04", "produto_id": 110, "tipo_venda": "feira", "total": 500.0},
+        {"data": "2019-08-04", "produto_id": 110, "tipo_venda": "barril_festas", "quantidade_barris_vendidos": 2},
+        {"data": "2019-08-10", "produto_id": 110, "tipo_venda": "boleto", "custo_boleto": 350.0},
+    ]})
+
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["gravadas"] == 4
+    assert [r["lucro"] for r in corpo["resultados"]] == [800.0, 500.0, 400.0, -350.0]
+    assert all(r["ok"] and r["venda_id"] for r in corpo["resultados"])
+
+    session.expire_all()
+    assert session.get(SaldoEstoque, produto.id).quantidade_barris == pytest.approx(saldo_antes - 1.5 - 2)
+
+def test_lote_com_erro_nao_grava_nada(client: TestClient, session: Session, produto: Produto):
+    resposta = client.post("/vendas/lote", json=[
+        {"data": "2019-09-07", "produto_id": 110, "tipo_venda": "feira", "total": 900.0},
+        {"data": "2019-09-07", "produto_id": 110, "tipo_venda": "feira", "total": 100.0},  # repetida no lote
+        {"data": "2019-09-08", "produto_id": 999, "tipo_venda": "feira", "total": 100.0},
+        {"data": "2019-09-08", "produto_id": 110, "tipo_venda": "feira"},
+        {"data": "ontem", "produto_id": 110, "tipo_venda": "boleto"},
+    ])
+
+    assert resposta.status_code == 422
+    resultados = resposta.json()["resultados"]
+    assert [r["ok"] for r in resultados] == [True, False, False, False, False]
+    assert "Já existe uma venda de feira" in resultados[1]["erro"]
+    assert resultados[2]["erro"] == "Produto não encontrado."
+    assert "obrigatório" in resultados[3]["erro"]
+    assert resultados[4]["erro"].startswith("data:")
+    vendas = session.exec(select(Venda).where(Venda.produto_id == 110, Venda.data >= date(2019, 9, 1))).all()
+    assert vendas == []
+
+def test_lote_em_csv(client: TestClient, session: Session, produto: Produto):
+    csv = (
+        "data,produto_id,tipo_venda,total,cartao,custo_func\n"
+        "2019-10-05,110,feira,\"1.250,50\",,100\n"  # aspas: vírgula decimal dentro do campo
+        "2019-10-06,110,feira,800,400,\n"
+    )
+    linhas = linhas_do_csv(csv)
+    assert linhas[0]["total"] == "1250.50"
+    assert linhas[1]["custo_func"] is None
+
+    resposta = client.post("/vendas/lote", content=csv, headers={"Content-Type": "text/csv"})
+    assert resposta.status_code == 200
+    assert resposta.json()["gravadas"] == 2
+    venda = session.exec(select(Venda).where(Venda.produto_id == 110, Venda.data == date(2019, 10, 5))).one()
+    assert (venda.total, venda.lucro, venda.dia_semana) == (1250.5, 1150.5, "Saturday")
+
+def test_so_o_indice_das_feiras_conta_como_venda_repetida(isolated_session: Session):
+    isolated_session.add(Produto(id=1, nome="Chopp", preco_venda_litro=20.0, preco_venda_barril_fechado=500.0, volume_litros=50))
+    isolated_session.add(Venda(data=date(2025, 7, 5), produto_id=1, tipo_venda="feira", total=100.0, dia_semana="Saturday", lucro=100.0))
+    isolated_session.commit()
+
+    def erro_ao_gravar(venda: Venda) -> IntegrityError:
+        isolated_session.add(venda)
+        with pytest.raises(IntegrityError) as erro:
+            isolated_session.commit()
+        isolated_session.rollback()
+        return erro.value
+
+    repetida = Venda(data=date(2025, 7, 5), produto_id=1, tipo_venda="feira", total=50.0, dia_semana="Saturday", lucro=50.0)
+    sem_dia_semana = Venda(data=date(2025, 7, 6), produto_id=1, tipo_venda="feira", total=50.0, dia_semana=None, lucro=50.0)
+    assert venda_de_feira_duplicada(erro_ao_gravar(repetida))
+    assert not venda_de_feira_duplicada(erro_ao_gravar(sem_dia_semana))